@@ -1,8 +1,13 @@
 from .section_writer import generate_section
-from .structure_writer import generate_book_structure
+from .structure_writer import generate_book_structure, stream_book_structure
 from .title_writer import generate_book_title
-from .character_writer import generate_characters
+from .character_writer import generate_characters, is_fallback_characters
 from .plot_writer import generate_plot_structure
-from .novel_structure_writer import generate_novel_structure
+from .novel_structure_writer import generate_novel_structure, stream_novel_structure
 from .novel_section_writer import generate_novel_section
 from .character_arc_tracker import update_character_arcs
+from .chapter_brief_writer import generate_chapter_briefs
+from .seam_smoother import smooth_seam
+from .summary_writer import generate_summary
+from .schemas import parse_json_output
+from .prompts import PROMPTS, prompt_versions
@@ -0,0 +1,94 @@
+"""
+Agent to plan the hand-off between chapters, so chapters can be written independently
+"""
+
+import json
+from ..inference import GenerationStatistics
+from .prompts import register_prompt
+
+EXAMPLE_BRIEF = {
+    "Chapter title": {
+        "start_state": "Situation, place and time the chapter opens with",
+        "end_state": "What has happened and changed by the end of the chapter",
+        "positions": {"Character_Name": "Where the character is and what they know at the end"},
+    }
+}
+
+BRIEF_PROMPT = register_prompt(
+    "chapter_briefs",
+    version=2,
+    system=f"""
+    You are a novel editor planning the continuity between chapters written by different authors at the same time.
+    Write in the given language. For every chapter, in order, write a compact hand-off brief. The start state of a chapter
+    must follow from the end state of the chapter before it.
+
+    Return ONLY a VALID JSON object with the chapter titles as keys, following this structure:
+    {json.dumps(EXAMPLE_BRIEF, ensure_ascii=False)}
+
+    Keep each state to one or two sentences. Use double quotes and no trailing commas.
+    """,
+    user="""
+    Write the hand-off briefs of the chapters of this novel:
+
+    Language: {language}
+    Genre: {genre}
+    Narrative style: {narrative_style}
+
+    <characters>{characters}</characters>
+    <plot_structure>{plot_structure}</plot_structure>
+    <chapters>{chapters}</chapters>
+    """,
+)
+
+
+def generate_chapter_briefs(
+    chapters: str,
+    characters: str,
+    plot_structure: str,
+    genre: str,
+    narrative_style: str,
+    model: str,
+    groq_provider,
+    language: str = "English",
+):
+    """
+    Generate a compact hand-off brief for every chapter boundary in one call:
+    the situation a chapter opens with, where it leaves the story and where
+    each character is at its end.
+    Returns generation statistics and the briefs in JSON format:
+    {"Chapter title": {"start_state": "...", "end_state": "...", "positions": {"Name": "..."}}}
+    """
+    completion_params = {
+        "model": model,
+        "messages": BRIEF_PROMPT.messages(
+            language=language,
+            genre=genre,
+            narrative_style=narrative_style,
+            characters=characters,
+            plot_structure=plot_structure,
+            chapters=chapters,
+        ),
+        "temperature": 0.4,
+        "max_tokens": 4000,
+        "top_p": 1,
+        "stream": False,
+        "response_format": {"type": "json_object"},
+        "stop": None,
+    }
+
+    if "deepseek" in model.lower():
+        completion_params["reasoning_format"] = "hidden"
+
+    completion = groq_provider.chat.completions.create(**completion_params)
+
+    usage = completion.usage
+    statistics = GenerationStatistics(
+        input_time=usage.prompt_time,
+        output_time=usage.completion_time,
+        input_tokens=usage.prompt_tokens,
+        output_tokens=usage.completion_tokens,
+        total_time=usage.total_time,
+        model_name=model,
+    )
+
+    return statistics, completion.choices[0].message.content
@@ -2,205 +2,139 @@
 Agent to track and maintain character arcs throughout the novel
 """
 
-import time
-import random
 import json
-from ..inference import GenerationStatistics
+import logging
 
-def update_character_arcs(
-    characters: str,
-    current_plot_point: str,
-    completed_sections: str,
-    character_goals: str,
-    model: str,
-    groq_provider,
-    narrative_arc: str = "auto",
-    language: str = "English"
-):
-    """Updates character development based on story progression"""
-    
-    # Add language instruction to system prompt
-    language_instruction = f"Generate all character arc updates in {language}."
-    
-    # First try to parse the input characters to ensure we have valid JSON
-    try:
-        characters_data = json.loads(characters)
-    except json.JSONDecodeError:
-        print(f"Warning: Input characters JSON is not valid, attempting to continue with original string")
-        characters_data = {}
-    
-    # Create a simplified example response format
-    example_format = {
-        "Character_Name": {
-            "emotional_growth": "Description of how the character has grown emotionally",
-            "relationship_changes": "Description of how the character's relationships have changed",
-            "progress_toward_goals": "Description of progress toward character goals",
-            "alignment_with_narrative_arc": "Description of how the character fits into the story arc"
-        }
+from ..inference import GenerationCancelled, GenerationStatistics, StreamNotice, stream_with_checkpoints
+from .prompts import register_prompt
+from .schemas import CharacterArcPatch, parse_json_output
+
+logger = logging.getLogger(__name__)
+
+# Answer when the arcs could not be updated: no changes
+NO_CHANGES = "{}"
+# Requests of an update whose output cannot be repaired
+JSON_ATTEMPTS = 2
+
+# A simplified example response format
+EXAMPLE_ARC_PATCH = {
+    "Character_Name": {
+        "emotional_growth": "How the character has grown emotionally, if it changed",
+        "relationship_changes": "How the character's relationships have changed, if they did",
+        "progress_toward_goals": "Progress toward character goals, if any",
+        "alignment_with_narrative_arc": "How the character now fits into the story arc, if it changed"
     }
-    
-    example_json = json.dumps(example_format, indent=2, ensure_ascii=False)
-    
-    SYSTEM_PROMPT = f"""
+}
+
+ARC_PROMPT = register_prompt(
+    "character_arcs",
+    version=2,
+    system=f"""
     You are an expert in character development and narrative arcs.
-    
-    {language_instruction}
-    
+    Generate all character arc updates in the given language.
+
     Track how characters evolve through a story, analyzing:
     1. Emotional growth or deterioration
     2. Relationship changes
     3. Progress toward or away from their goals
     4. Alignment with the narrative arc
-    
-    Return a VALID JSON object with character updates using this exact structure:
-    {example_json}
-    
-    IMPORTANT: 
-    - Make sure your response is valid JSON
-    - Use double quotes for all keys and string values
-    - Do not include any trailing commas
-    - Do not include any special characters or formatting that would break JSON syntax
-    """
-    
-    USER_PROMPT = f"""
-    Update these character profiles based on story progress:
-    
-    <characters>{characters}</characters>
-    <character_goals>{character_goals}</character_goals>
-    <current_plot_point>{current_plot_point}</current_plot_point>
-    <completed_sections>{completed_sections}</completed_sections>
-    <narrative_arc>{narrative_arc}</narrative_arc>
-    
+
     Analyze how each character is developing in relation to:
     1. Their initial goals and motivations
     2. Their relationships with other characters
     3. Their emotional and psychological state
     4. The overall narrative arc of the story
-    
-    Return the updated character information in VALID JSON format.
+
+    Return ONLY what changed, as a VALID JSON object using this structure:
+    {json.dumps(EXAMPLE_ARC_PATCH, ensure_ascii=False)}
+
+    IMPORTANT:
+    - Leave out characters whose arc did not change, and fields that did not change
+    - Set a field to null to remove it
+    - Return {{}} if nothing changed
+    - Make sure your response is valid JSON
+    - Use double quotes for all keys and string values
+    - Do not include any trailing commas
+    """,
+    user="""
+    Report how these characters changed with the latest story progress:
+
+    Language: {language}
+    <narrative_arc>{narrative_arc}</narrative_arc>
+    <character_goals>{character_goals}</character_goals>
+
+    <characters>{characters}</characters>
+    <completed_sections>{completed_sections}</completed_sections>
+    <current_plot_point>{current_plot_point}</current_plot_point>
+    """,
+)
+
+def update_character_arcs(
+    characters: str,
+    current_plot_point: str,
+    completed_sections: str,
+    character_goals: str,
+    model: str,
+    groq_provider,
+    narrative_arc: str = "auto",
+    language: str = "English"
+):
+    """
+    Updates character development based on story progression.
+    Returns generation statistics and a JSON merge patch (RFC 7386) with
+    only the arc fields that changed, for only the characters that changed:
+    {"Name": {"emotional_growth": "...", "obsolete_field": null}}
     """
-    
-    # Rate limit handling with exponential backoff
-    max_retries = 5
-    base_delay = 1  # Start with a 1-second delay
-    
-    for attempt in range(max_retries):
+
+    messages = ARC_PROMPT.messages(
+        language=language,
+        narrative_arc=narrative_arc,
+        character_goals=character_goals,
+        characters=characters,
+        completed_sections=completed_sections,
+        current_plot_point=current_plot_point,
+    )
+
+    stream_params = {
+        "model": model,
+        "messages": messages,
+        "temperature": 0.5,
+        "max_tokens": 1500,
+        "top_p": 1,
+        # Streamed for the shared retry and resume path; JSON mode does not stream
+        "stream": True,
+        "stop": None,
+    }
+
+    # Add reasoning_format if using DeepSeek model
+    if "deepseek" in model.lower():
+        stream_params["reasoning_format"] = "hidden"
+
+    statistics = GenerationStatistics(model_name=model)
+    # Rate limits and dropped connections are retried by stream_with_checkpoints;
+    # output that cannot be repaired locally is requested once more
+    for attempt in range(JSON_ATTEMPTS):
+        response_content = ""
         try:
-            # Create completion parameters dictionary
-            completion_params = {
-                "model": model,
-                "messages": [
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": USER_PROMPT},
-                ],
-                "temperature": 0.5,
-                "max_tokens": 4000,
-                "top_p": 1,
-                "stream": False,
-                "response_format": {"type": "json_object"},
-                "stop": None,
-            }
-            
-            # Add reasoning_format if using DeepSeek model
-            if "deepseek" in model.lower():
-                completion_params["reasoning_format"] = "hidden"
-            
-            completion = groq_provider.chat.completions.create(**completion_params)
-            
-            # Attempt to parse the JSON response to verify it's valid
-            response_content = completion.choices[0].message.content
-            json.loads(response_content)  # This will raise an exception if the JSON is invalid
-            
-            # If we got here, the JSON is valid
-            usage = completion.usage
-            statistics = GenerationStatistics(
-                input_time=usage.prompt_time,
-                output_time=usage.completion_time,
-                input_tokens=usage.prompt_tokens,
-                output_tokens=usage.completion_tokens,
-                total_time=usage.total_time,
-                model_name=model,
-            )
-            
-            return statistics, response_content
-            
-        except json.JSONDecodeError as json_error:
-            print(f"JSON decode error on attempt {attempt+1}: {json_error}")
-            # If this was our last retry, handle it differently
-            if attempt == max_retries - 1:
-                # Instead of failing completely, return the original characters with a minimal update
-                if isinstance(characters_data, dict):
-                    # Add a note about the error
-                    for char_name in characters_data:
-                        if isinstance(characters_data[char_name], dict):
-                            characters_data[char_name]["update_status"] = f"Error: Failed to update character (JSON validation error)"
-                    return GenerationStatistics(
-                        input_time=0, 
-                        output_time=0, 
-                        input_tokens=0, 
-                        output_tokens=0, 
-                        total_time=0, 
-                        model_name=model
-                    ), json.dumps(characters_data, ensure_ascii=False)
-                else:
-                    # Return the original if we couldn't even parse it
-                    return GenerationStatistics(
-                        input_time=0, 
-                        output_time=0, 
-                        input_tokens=0, 
-                        output_tokens=0, 
-                        total_time=0, 
-                        model_name=model
-                    ), characters
-        
+            for chunk in stream_with_checkpoints(groq_provider, stream_params, model):
+                if isinstance(chunk, GenerationStatistics):
+                    statistics.add(chunk)
+                elif isinstance(chunk, StreamNotice):
+                    logger.info(f"Character arc update: {chunk}")
+                elif chunk:
+                    response_content += chunk
+        except GenerationCancelled:
+            raise
         except Exception as e:
-            error_message = str(e)
-            
-            # Check if it's a rate limit error (429)
-            if "429" in error_message:
-                # Extract retry-after if available
-                retry_after = None
-                if hasattr(e, 'headers') and 'retry-after' in e.headers:
-                    retry_after = int(e.headers['retry-after'])
-                
-                # Calculate wait time with exponential backoff
-                if retry_after:
-                    wait_time = retry_after
-                else:
-                    # Exponential backoff with jitter
-                    wait_time = (2 ** attempt) * base_delay + random.uniform(0, 1)
-                
-                print(f"Rate limit reached. Waiting {wait_time:.1f} seconds to retry...")
-                
-                # Wait before retrying
-                time.sleep(wait_time)
-                
-                # Continue to next retry attempt
-                continue
-            
-            # If it's not a rate limit error or we've exceeded max retries
-            if attempt == max_retries - 1:
-                print(f"Error updating character arcs after {max_retries} attempts: {error_message}")
-                # Return the original characters with minimal modifications
-                if isinstance(characters_data, dict):
-                    # Add a note about the error
-                    for char_name in characters_data:
-                        if isinstance(characters_data[char_name], dict):
-                            characters_data[char_name]["update_status"] = f"Error: {error_message}"
-                    return GenerationStatistics(
-                        input_time=0, 
-                        output_time=0, 
-                        input_tokens=0, 
-                        output_tokens=0, 
-                        total_time=0, 
-                        model_name=model
-                    ), json.dumps(characters_data, ensure_ascii=False)
-                else:
-                    return GenerationStatistics(
-                        input_time=0, 
-                        output_time=0, 
-                        input_tokens=0, 
-                        output_tokens=0, 
-                        total_time=0, 
-                        model_name=model
-                    ), characters 
\ No newline at end of file
+            logger.warning(f"Error updating character arcs: {e}")
+            # Keep the arcs as they are
+            return statistics, NO_CHANGES
+
+        try:
+            arc_patch = parse_json_output(response_content, CharacterArcPatch)
+            return statistics, json.dumps(arc_patch, ensure_ascii=False)
+        except ValueError as e:
+            logger.warning(f"Invalid character arc update on attempt {attempt + 1}: {e}")
+
+    # Keep the arcs as they are
+    return statistics, NO_CHANGES
@@ -4,86 +4,92 @@ Agent to generate character profiles for the novel
 
 import json
 from ..inference import GenerationStatistics
+from .prompts import register_prompt
+from .schemas import Characters, parse_json_output
 
-def generate_characters(
-    prompt: str, 
-    additional_instructions: str,
-    number_of_characters: int, 
-    model: str, 
-    groq_provider,
-    language: str = "English"
-):
-    """
-    Generate detailed character profiles based on the novel concept.
-    Returns character profiles in JSON format and generation statistics.
-    """
-    
-    # Add language instruction to the system prompt
-    language_instruction = f"Generate all character descriptions in {language}."
-    
-    # Create a clear example of the expected JSON structure
-    example_character = {
-        "Character_Name": {
-            "role": "Protagonist/Antagonist/Supporting",
-            "personality": "Key personality traits",
-            "appearance": "Physical description",
-            "speaking_style": "Vocal patterns and language use",
-            "motivations": "What drives this character",
-            "conflicts": "Internal and external struggles",
-            "backstory": "Relevant history and background"
-        }
+# A clear example of the expected JSON structure
+EXAMPLE_CHARACTER = {
+    "Character_Name": {
+        "role": "Protagonist/Antagonist/Supporting",
+        "personality": "Key personality traits",
+        "appearance": "Physical description",
+        "speaking_style": "Vocal patterns and language use",
+        "motivations": "What drives this character",
+        "conflicts": "Internal and external struggles",
+        "backstory": "Relevant history and background"
     }
-    
-    # Convert example to JSON string with proper formatting
-    example_json = json.dumps(example_character, indent=2, ensure_ascii=False)
-    
-    SYSTEM_PROMPT = f"""
-    You are an expert character designer. Create {number_of_characters} detailed fictional characters in VALID JSON format.
-    
-    {language_instruction}
-    
+}
+
+CHARACTERS_PROMPT = register_prompt(
+    "characters",
+    version=2,
+    system=f"""
+    You are an expert character designer. Create the given number of detailed fictional characters in VALID JSON format.
+    Generate all character descriptions in the given language.
+
     Return ONLY a JSON object with character names as keys and their details as nested objects.
     Follow this exact structure:
-    
-    {example_json}
-    
+
+    {json.dumps(EXAMPLE_CHARACTER, ensure_ascii=False)}
+
     IMPORTANT:
     - Ensure all JSON is properly formatted with double quotes for keys and string values
     - Do not include any explanatory text outside the JSON structure
     - Do not include any trailing commas
-    - Create exactly {number_of_characters} characters
-    
+    - Create exactly the number of characters asked for
+
     Make each character:
     1. Psychologically complex with realistic strengths and flaws
     2. Have distinct personality, appearance, and speaking style
     3. Possess clear motivations, conflicts, and backstory
     4. Fit the genre and tone of the story concept
-    """
 
-    USER_PROMPT = f"""
-    Create {number_of_characters} detailed and complex character profiles in VALID JSON format for a novel with the following concept:
+    Your response must be valid JSON that can be parsed programmatically.
+    Include only the JSON object, no additional text.
+    """,
+    user="""
+    Create detailed and complex character profiles in VALID JSON format for a novel with the following concept:
+
+    Language: {language}
+    Number of characters: {number_of_characters}
 
-    <concept>{prompt}</concept>
+    <concept>{concept}</concept>
 
     <additional_instructions>{additional_instructions}</additional_instructions>
-    
-    Your response must be valid JSON that I can parse programmatically. 
-    Include only the JSON object, no additional text.
-    """
+    """,
+)
+
+# Role of the placeholder characters returned when no output could be decoded
+FALLBACK_ROLE = "Please edit this character"
+
 
+def is_fallback_characters(characters):
+    """Whether `characters` are the placeholders of generate_characters rather than generated ones"""
+    return any(isinstance(profile, dict) and profile.get("role") == FALLBACK_ROLE for profile in characters.values())
+
+
+def generate_characters(
+    prompt: str, 
+    additional_instructions: str,
+    number_of_characters: int, 
+    model: str, 
+    groq_provider,
+    language: str = "English"
+):
+    """
+    Generate detailed character profiles based on the novel concept.
+    Returns character profiles in JSON format and generation statistics.
+    """
+    
     # Create completion parameters dictionary
     completion_params = {
         "model": model,
-        "messages": [
-            {
-                "role": "system",
-                "content": SYSTEM_PROMPT,
-            },
-            {
-                "role": "user",
-                "content": USER_PROMPT,
-            },
-        ],
+        "messages": CHARACTERS_PROMPT.messages(
+            language=language,
+            number_of_characters=number_of_characters,
+            concept=prompt,
+            additional_instructions=additional_instructions,
+        ),
         "temperature": 0.7,
         "max_tokens": 4000,
         "top_p": 1,
@@ -102,9 +108,10 @@ def generate_characters(
         try:
             completion = groq_provider.chat.completions.create(**completion_params)
             
-            # Verify the response is valid JSON
+            # Repair the response locally; only unrecoverable output is requested again
             response_content = completion.choices[0].message.content
-            json.loads(response_content)  # This will throw an error if invalid JSON
+            characters = parse_json_output(response_content, Characters)
+            response_content = json.dumps(characters, ensure_ascii=False)
             
             usage = completion.usage
             statistics = GenerationStatistics(
@@ -118,13 +125,13 @@ def generate_characters(
 
             return statistics, response_content
             
-        except json.JSONDecodeError:
+        except ValueError:
             if attempt == max_retries - 1:
                 # If all retries fail, create a basic JSON structure manually
                 fallback_characters = {}
                 for i in range(1, number_of_characters+1):
                     fallback_characters[f"Character {i}"] = {
-                        "role": "Please edit this character",
+                        "role": FALLBACK_ROLE,
                         "personality": "Generated character had invalid JSON format",
                         "appearance": "Please add description",
                         "speaking_style": "Please add speaking style",
@@ -0,0 +1,51 @@
+"""
+Registry of versioned prompt templates with a fixed prefix the provider can cache
+"""
+
+import re
+import textwrap
+
+PROMPTS = {}
+
+
+def minify(text):
+    """`text` without indentation, trailing spaces or repeated blank lines"""
+    lines = [line.strip() for line in textwrap.dedent(text).strip().splitlines()]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+class PromptTemplate:
+    """
+    The messages of one agent call. The system message holds only fixed
+    instructions, so it is byte-identical for every call of the agent; the
+    user message starts with its own fixed text and ends with the per-call
+    data, filled in with str.format. Calls of an agent then share the
+    longest possible prefix, which providers cache. Bump `version` when the
+    text changes: stored sections are keyed by the version of the template
+    they were written with (see section_key).
+    """
+
+    def __init__(self, name, version, system, user):
+        self.name = name
+        self.version = version
+        self.system = minify(system)
+        self.user = minify(user)
+
+    def messages(self, **values):
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user.format(**values).rstrip()},
+        ]
+
+
+def register_prompt(name, version, system, user):
+    """Add a template to the registry and return it"""
+    if name in PROMPTS:
+        raise ValueError(f"Prompt '{name}' is already registered")
+    template = PROMPTS[name] = PromptTemplate(name, version, system, user)
+    return template
+
+
+def prompt_versions():
+    """The version of every registered template, by name"""
+    return {name: template.version for name, template in sorted(PROMPTS.items())}
@@ -0,0 +1,168 @@
+"""
+Schemas of the JSON the planning agents return
+"""
+
+import json
+from typing import Any, Dict, Optional, Union
+
+from pydantic import BaseModel, ConfigDict, RootModel, ValidationError, field_validator, model_validator
+
+from ..tools.json_repair import repair_json
+
+
+def _to_text(value):
+    """Models sometimes answer a text field with a list or an object"""
+    if isinstance(value, list):
+        return ", ".join(_to_text(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class _NonEmptyRoot(RootModel):
+    @model_validator(mode="after")
+    def check_not_empty(self):
+        if not self.root:
+            raise ValueError("the object is empty")
+        return self
+
+
+class BookStructure(_NonEmptyRoot):
+    """{"Section title": "description" | {nested sections...}}"""
+
+    root: Dict[str, Union[str, "BookStructure"]]
+
+
+class CharacterProfile(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    role: Optional[str] = None
+    personality: Optional[str] = None
+    appearance: Optional[str] = None
+    speaking_style: Optional[str] = None
+    motivations: Optional[str] = None
+    conflicts: Optional[str] = None
+    backstory: Optional[str] = None
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def join_text(cls, value):
+        return _to_text(value)
+
+
+class Characters(_NonEmptyRoot):
+    """{"Character name": profile}"""
+
+    root: Dict[str, CharacterProfile]
+
+
+class PlotStructure(_NonEmptyRoot):
+    """{"Plot_Point_1": "what happens" | {details...}}"""
+
+    root: Dict[str, Union[str, Dict[str, Any]]]
+
+
+class NovelSection(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    description: str
+    dramaturgy_level: int = 5
+    setting_focus: bool = False
+    character_focus: bool = False
+    scenes: Optional[Dict[str, "NovelSection"]] = None
+
+    @field_validator("description", mode="before")
+    @classmethod
+    def join_text(cls, value):
+        return _to_text(value)
+
+    @field_validator("dramaturgy_level", mode="before")
+    @classmethod
+    def clamp_level(cls, value):
+        try:
+            return min(max(round(float(value)), 1), 10)
+        except (TypeError, ValueError):
+            return 5
+
+
+class NovelStructure(_NonEmptyRoot):
+    """
+    {"Chapter title": section} where sections may nest scenes. Stray
+    metadata values are left for the pipeline to filter out.
+    """
+
+    root: Dict[str, Union[NovelSection, Any]]
+
+    @model_validator(mode="after")
+    def check_has_chapters(self):
+        if not any(isinstance(value, NovelSection) for value in self.root.values()):
+            raise ValueError("no chapter has a description")
+        return self
+
+
+class CharacterArc(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    emotional_growth: Optional[str] = None
+    relationship_changes: Optional[str] = None
+    progress_toward_goals: Optional[str] = None
+    alignment_with_narrative_arc: Optional[str] = None
+
+    @field_validator("*", mode="before")
+    @classmethod
+    def join_text(cls, value):
+        return _to_text(value)
+
+
+class CharacterArcPatch(RootModel):
+    """{"Character name": changed arc fields}; empty when nothing changed"""
+
+    root: Dict[str, Optional[CharacterArc]]
+
+
+class ChapterBrief(BaseModel):
+    model_config = ConfigDict(extra="allow")
+
+    start_state: str = ""
+    end_state: str = ""
+    positions: Union[Dict[str, str], str] = ""
+
+    @field_validator("start_state", "end_state", mode="before")
+    @classmethod
+    def join_text(cls, value):
+        return "" if value is None else _to_text(value)
+
+    @field_validator("positions", mode="before")
+    @classmethod
+    def join_positions(cls, value):
+        if isinstance(value, dict):
+            return {str(name): _to_text(position) or "" for name, position in value.items()}
+        return "" if value is None else _to_text(value)
+
+
+class ChapterBriefs(_NonEmptyRoot):
+    """{"Chapter title": hand-off brief}"""
+
+    root: Dict[str, ChapterBrief]
+
+
+def parse_json_output(content, schema=None):
+    """
+    Parse the JSON output of an agent, repairing it locally where possible,
+    and validate it against `schema`. Returns plain JSON data; fields the
+    schema coerced (e.g. a dramaturgy level given as a string) are
+    normalised. Raises ValueError if the output cannot be recovered, which
+    is the only case worth another request.
+    """
+    data = repair_json(content)
+    if schema is None:
+        return data
+    return validate_output(data, schema)
+
+
+def validate_output(data, schema):
+    """`data` validated against `schema` and normalised; ValueError if it does not match"""
+    try:
+        return schema.model_validate(data).model_dump(mode="json", exclude_unset=True)
+    except ValidationError as e:
+        raise ValueError(f"The output does not match the expected format: {e}") from e
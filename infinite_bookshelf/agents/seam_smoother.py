@@ -0,0 +1,58 @@
+"""
+Agent to smooth the transition between two chapters written independently
+"""
+
+from ..inference import GenerationStatistics
+from .prompts import register_prompt
+
+SEAM_PROMPT = register_prompt(
+    "seam",
+    version=2,
+    system="You are a fiction editor. Two chapters were written separately. Lightly rewrite the opening of the second so it flows from the ending of the first: fix contradictions in time, place and who is present, and smooth the transition. Keep its events, voice and length. Write in the given language. Output only the rewritten opening.",
+    user="""
+    Rewrite the opening so it flows from the previous ending:
+
+    Language: {language}
+
+    <previous_ending>{previous_ending}</previous_ending>
+
+    <opening>{opening}</opening>
+    """,
+)
+
+
+def smooth_seam(
+    previous_ending: str,
+    opening: str,
+    model: str,
+    groq_provider,
+    language: str = "English",
+):
+    """
+    Rewrite the opening of a chapter so it follows on from the ending of the
+    chapter before, keeping its events, voice and length.
+    Returns generation statistics and the rewritten opening.
+    """
+    completion_params = {
+        "model": model,
+        "messages": SEAM_PROMPT.messages(language=language, previous_ending=previous_ending, opening=opening),
+        "temperature": 0.3,
+        "max_tokens": max(200, len(opening) // 2),
+        "top_p": 1,
+        "stream": False,
+        "stop": None,
+    }
+
+    completion = groq_provider.chat.completions.create(**completion_params)
+
+    usage = completion.usage
+    statistics = GenerationStatistics(
+        input_time=usage.prompt_time,
+        output_time=usage.completion_time,
+        input_tokens=usage.prompt_tokens,
+        output_tokens=usage.completion_tokens,
+        total_time=usage.total_time,
+        model_name=model,
+    )
+
+    return statistics, completion.choices[0].message.content.strip()
@@ -2,7 +2,28 @@
 Agent to generate novel section content
 """
 
-from ..inference import GenerationStatistics
+from ..inference import stream_with_checkpoints
+from .prompts import register_prompt
+
+SECTION_PROMPT = register_prompt(
+    "book_section",
+    version=2,
+    system="You are an expert fiction writer. Generate compelling narrative content for the section provided. Follow the tone, character behaviors, and plot context. Focus on engaging dialogue, vivid descriptions, and natural character development. Write immersive, emotionally resonant content that advances the plot while developing characters. Balance dialogue, action, and description.",
+    user="""
+    Generate engaging narrative content for the section below:
+
+    <tone>{tone}</tone>
+
+    <additional_instructions>{additional_instructions}</additional_instructions>
+
+    <plot_context>{plot_context}</plot_context>
+
+    <characters>{characters}</characters>
+
+    <section_title>{section_title}</section_title>
+    {length_instruction}
+    """,
+)
 
 
 def generate_section(
@@ -12,54 +33,30 @@ def generate_section(
     tone: str,
     additional_instructions: str, 
     model: str, 
-    groq_provider
+    groq_provider,
+    cancel_token=None,
+    continue_from="",
+    target_words: int = 0,
+    max_tokens: int = 8000,
 ):
-    stream = groq_provider.chat.completions.create(
+    length_instruction = f"The section should be about {target_words} words long." if target_words else ""
+    stream_params = dict(
         model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": "You are an expert fiction writer. Generate compelling narrative content for the section provided. Follow the tone, character behaviors, and plot context. Focus on engaging dialogue, vivid descriptions, and natural character development.",
-            },
-            {
-                "role": "user",
-                "content": f"""Generate engaging narrative content for the following section:
-
-<section_title>{prompt}</section_title>
-
-<plot_context>{plot_context}</plot_context>
-                
-<characters>{characters}</characters>
-
-<tone>{tone}</tone>
-
-<additional_instructions>{additional_instructions}</additional_instructions>
-
-Write immersive, emotionally resonant content that advances the plot while developing characters. Balance dialogue, action, and description.
-""",
-            },
-        ],
+        messages=SECTION_PROMPT.messages(
+            tone=tone,
+            additional_instructions=additional_instructions,
+            plot_context=plot_context,
+            characters=characters,
+            section_title=prompt,
+            length_instruction=length_instruction,
+        ),
         temperature=0.7,  # Higher for creative fiction
-        max_tokens=8000,
+        max_tokens=max_tokens,
         top_p=1,
         stream=True,
         stop=None,
     )
 
-    for chunk in stream:
-        tokens = chunk.choices[0].delta.content
-        if tokens:
-            yield tokens
-        if x_groq := chunk.x_groq:
-            if not x_groq.usage:
-                continue
-            usage = x_groq.usage
-            statistics_to_return = GenerationStatistics(
-                input_time=usage.prompt_time,
-                output_time=usage.completion_time,
-                input_tokens=usage.prompt_tokens,
-                output_tokens=usage.completion_tokens,
-                total_time=usage.total_time,
-                model_name=model,
-            )
-            yield statistics_to_return
+    yield from stream_with_checkpoints(
+        groq_provider, stream_params, model, cancel_token=cancel_token, initial_text=continue_from
+    )
@@ -2,7 +2,41 @@
 Agent to generate book structure
 """
 
-from ..inference import GenerationStatistics
+from ..inference import GenerationStatistics, stream_with_checkpoints
+from .prompts import register_prompt
+
+
+STRUCTURE_PROMPT = register_prompt(
+    "book_structure",
+    version=2,
+    system="""
+    Write a comprehensive structure for a book, omitting introduction and conclusion sections (foreword, author's note, summary). Make clear titles and descriptions that have no overlap with other sections. It is very important that you use the subject and additional instructions you are given to write the book.
+
+    Write in JSON format:
+
+    {"Title of section goes here":"Description of section goes here",
+    "Title of section goes here":{"Title of section goes here":"Description of section goes here","Title of section goes here":"Description of section goes here","Title of section goes here":"Description of section goes here"}}
+    """,
+    user="""
+    Write the structure of a book on the following subject:
+
+    <subject>{subject}</subject>
+
+    <additional_instructions>{additional_instructions}</additional_instructions>
+
+    {scope}
+    """,
+)
+LONG_SCOPE = "The book is long (>300 pages)."
+SHORT_SCOPE = "Only provide up to one level of depth for nested sections."
+
+
+def build_structure_messages(prompt: str, additional_instructions: str, long: bool = False):
+    return STRUCTURE_PROMPT.messages(
+        scope=LONG_SCOPE if long else SHORT_SCOPE,
+        subject=prompt,
+        additional_instructions=additional_instructions,
+    )
 
 
 def generate_book_structure(
@@ -16,23 +50,9 @@ def generate_book_structure(
     Returns book structure content as well as total tokens and total time for generation.
     """
 
-    if long:
-        USER_PROMPT = f"Write a comprehensive structure, omiting introduction and conclusion sections (forward, author's note, summary), for a long (>300 page) book. It is very important that use the following subject and additional instructions to write the book. \n\n<subject>{prompt}</subject>\n\n<additional_instructions>{additional_instructions}</additional_instructions>"
-    else:
-        USER_PROMPT = f"Write a comprehensive structure, omiting introduction and conclusion sections (forward, author's note, summary), for a book. Only provide up to one level of depth for nested sections. Make clear titles and descriptions that have no overlap with other sections. It is very important that use the following subject and additional instructions to write the book. \n\n<subject>{prompt}</subject>\n\n<additional_instructions>{additional_instructions}</additional_instructions>"
-
     completion = groq_provider.chat.completions.create(
         model=model,
-        messages=[
-            {
-                "role": "system",
-                "content": 'Write in JSON format:\n\n{"Title of section goes here":"Description of section goes here",\n"Title of section goes here":{"Title of section goes here":"Description of section goes here","Title of section goes here":"Description of section goes here","Title of section goes here":"Description of section goes here"}}',
-            },
-            {
-                "role": "user",
-                "content": USER_PROMPT,
-            },
-        ],
+        messages=build_structure_messages(prompt, additional_instructions, long),
         temperature=0.3,
         max_tokens=8000,
         top_p=1,
@@ -52,3 +72,29 @@ def generate_book_structure(
     )
 
     return statistics_to_return, completion.choices[0].message.content
+
+
+def stream_book_structure(
+    prompt: str,
+    additional_instructions: str,
+    model: str,
+    groq_provider,
+    long: bool = False,
+    cancel_token=None,
+):
+    """
+    Streams the book structure JSON as str tokens, with GenerationStatistics
+    at the end, so top-level sections can be used before the whole
+    structure is written. JSON mode is not used as it does not stream.
+    """
+    stream_params = dict(
+        model=model,
+        messages=build_structure_messages(prompt, additional_instructions, long),
+        temperature=0.3,
+        max_tokens=8000,
+        top_p=1,
+        stream=True,
+        stop=None,
+    )
+
+    yield from stream_with_checkpoints(groq_provider, stream_params, model, cancel_token=cancel_token)
@@ -0,0 +1,57 @@
+"""
+Agent to summarize story text for the prompts of later sections
+"""
+
+from ..inference import GenerationStatistics
+from .prompts import register_prompt
+
+SUMMARY_PROMPT = register_prompt(
+    "summary",
+    version=2,
+    system="You summarize fiction for a writer continuing the story. Keep the plot events, character decisions and changes, open conflicts and important details. Leave out style and description. Write plain prose without a heading, in the given language and within the given number of words.",
+    user="""
+    Summarize the following:
+
+    Language: {language}
+    Maximum words: {max_words}
+
+    <text>{text}</text>
+    """,
+)
+
+
+def generate_summary(
+    text: str,
+    max_words: int,
+    model: str,
+    groq_provider,
+    language: str = "English",
+):
+    """
+    Summarize a novel section, or the summaries of a chapter or of earlier
+    chapters, in at most `max_words` words.
+    Returns generation statistics and the summary.
+    """
+    completion_params = {
+        "model": model,
+        "messages": SUMMARY_PROMPT.messages(language=language, max_words=max_words, text=text),
+        "temperature": 0.2,
+        "max_tokens": max_words * 2,
+        "top_p": 1,
+        "stream": False,
+        "stop": None,
+    }
+
+    completion = groq_provider.chat.completions.create(**completion_params)
+
+    usage = completion.usage
+    statistics = GenerationStatistics(
+        input_time=usage.prompt_time,
+        output_time=usage.completion_time,
+        input_tokens=usage.prompt_tokens,
+        output_tokens=usage.completion_tokens,
+        total_time=usage.total_time,
+        model_name=model,
+    )
+
+    return statistics, completion.choices[0].message.content.strip()
@@ -3,6 +3,14 @@ Agent to generate book title
 """
 
 from ..inference import GenerationStatistics
+from .prompts import register_prompt
+
+TITLE_PROMPT = register_prompt(
+    "book_title",
+    version=1,
+    system="You are an expert book title creator. Generate a compelling, intriguing title that captures the essence of a novel concept. Return only the title, nothing else.",
+    user="Create a captivating title for a novel with this concept: {concept}",
+)
 
 
 def generate_book_title(prompt: str, model: str, groq_provider):
@@ -11,16 +19,7 @@ def generate_book_title(prompt: str, model: str, groq_provider):
     """
     completion_params = {
         "model": model,
-        "messages": [
-            {
-                "role": "system",
-                "content": "You are an expert book title creator. Generate a compelling, intriguing title that captures the essence of a novel concept.",
-            },
-            {
-                "role": "user",
-                "content": f"Create a captivating title for a novel with this concept: {prompt}\n\nReturn only the title, nothing else.",
-            },
-        ],
+        "messages": TITLE_PROMPT.messages(concept=prompt),
         "temperature": 0.8,
         "max_tokens": 50,
         "top_p": 1,
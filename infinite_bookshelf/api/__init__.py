@@ -0,0 +1 @@
+from .server import BookshelfAPI, BookshelfRequestHandler, create_server
@@ -0,0 +1,55 @@
+"""
+Run the HTTP API:
+
+    python -m infinite_bookshelf.api --port 8000
+"""
+
+import argparse
+import logging
+
+from dotenv import load_dotenv
+
+from ..inference import RateLimitedProvider, groq_limiter
+from ..taskqueue import TaskQueue
+from .server import create_server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m infinite_bookshelf.api",
+        description="Serve book and novel generation over HTTP with server-sent event streaming.",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--tpm", type=int, default=None, help="Tokens per minute budget for jobs run by this process (default: 6000)")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    load_dotenv()
+
+    # With BOOKSHELF_QUEUE_DB set, jobs go to the queue workers instead
+    queue = TaskQueue.from_env()
+    groq_provider = None
+    if queue is None:
+        from groq import Groq
+
+        if args.tpm:
+            groq_limiter.set_limit(args.tpm)
+        groq_provider = RateLimitedProvider(Groq())
+
+    server = create_server(args.host, args.port, groq_provider=groq_provider, queue=queue)
+    print(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+HTTP API to start generation jobs and stream their progress as server-sent events
+"""
+
+import json
+import logging
+import re
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from ..cli import build_tasks
+from ..jobs import job_store, start_job
+from ..taskqueue import get_queued_job
+
+logger = logging.getLogger(__name__)
+
+JOB_PATH = re.compile(r"^/jobs/(?P<job_id>\w+)(?:/(?P<action>events|markdown|pdf))?$")
+
+
+class BookshelfAPI:
+    """
+    Starts and looks up jobs for the request handler. Jobs run on threads
+    of this process, or on the task queue workers when a queue is given.
+    """
+
+    def __init__(self, groq_provider=None, queue=None, heartbeat_interval=15):
+        self.groq_provider = groq_provider
+        self.queue = queue
+        self.heartbeat_interval = heartbeat_interval
+
+    def start(self, request):
+        """
+        Start a job from a request body shaped like one row of a CLI config
+        file. Raises ValueError for invalid requests.
+        """
+        if not isinstance(request, dict):
+            raise ValueError("Request body must be a JSON object")
+        # Only the CLI reads local files; requests send the seed itself
+        if "seed_file" in request:
+            raise ValueError("seed_file is not accepted, send the seed text as seed_content")
+        task = build_tasks([request], "book")[0]
+        if self.queue:
+            job_id = self.queue.enqueue(task["pipeline_name"], task["pipeline"].__name__, task["params"])
+            return get_queued_job(self.queue, job_id)
+        return start_job(task["pipeline_name"], task["pipeline"], self.groq_provider, **task["params"])
+
+    def get(self, job_id):
+        if self.queue:
+            return get_queued_job(self.queue, job_id)
+        return job_store.get(job_id)
+
+
+class BookshelfRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST   /jobs               start a job, body: {"pipeline": "novel", "concept_text": ...}
+    GET    /jobs/<id>          job state as JSON
+    GET    /jobs/<id>/events   tokens, statistics and status as server-sent events
+    GET    /jobs/<id>/markdown the book as markdown
+    GET    /jobs/<id>/pdf      the book as PDF
+    DELETE /jobs/<id>          cancel the job
+    """
+
+    server_version = "InfiniteBookshelf/1.0"
+    protocol_version = "HTTP/1.1"
+
+    @property
+    def api(self):
+        return self.server.api
+
+    def log_message(self, format, *args):
+        logger.info("%s - %s", self.address_string(), format % args)
+
+    # Routing
+
+    def do_POST(self):
+        if urlparse(self.path).path.rstrip("/") != "/jobs":
+            return self.send_json({"error": "Not found"}, HTTPStatus.NOT_FOUND)
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            job = self.api.start(request)
+        except (ValueError, TypeError) as e:
+            return self.send_json({"error": str(e)}, HTTPStatus.BAD_REQUEST)
+        self.send_json(self.job_summary(job), HTTPStatus.ACCEPTED, location=f"/jobs/{job.id}")
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        job, action = self.route(url.path)
+        if job is None:
+            return
+        job.refresh()
+        job.touch()
+
+        if action is None:
+            self.send_json(job.snapshot())
+        elif action == "events":
+            self.stream_events(job, self.event_offset(url))
+        elif not job.title:
+            self.send_json({"error": "The book has no content yet"}, HTTPStatus.CONFLICT)
+        elif action == "markdown":
+            self.send_body(job.get_markdown_content().encode("utf-8"), "text/markdown; charset=utf-8")
+        elif action == "pdf":
+            # Imported lazily: weasyprint needs system libraries the rest of the API does not
+            from ..tools import create_pdf_file
+
+            self.send_body(create_pdf_file(job.get_markdown_content()).getvalue(), "application/pdf")
+
+    def do_DELETE(self):
+        job, action = self.route(urlparse(self.path).path)
+        if job is None:
+            return
+        if action is not None:
+            return self.send_json({"error": "Not found"}, HTTPStatus.NOT_FOUND)
+        job.cancel()
+        self.send_json(self.job_summary(job), HTTPStatus.ACCEPTED)
+
+    def route(self, path):
+        match = JOB_PATH.match(path.rstrip("/"))
+        job = self.api.get(match["job_id"]) if match else None
+        if job is None:
+            self.send_json({"error": "Not found"}, HTTPStatus.NOT_FOUND)
+            return None, None
+        return job, match["action"]
+
+    # Responses
+
+    def job_summary(self, job):
+        return {
+            "id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "links": {
+                "self": f"/jobs/{job.id}",
+                "events": f"/jobs/{job.id}/events",
+                "markdown": f"/jobs/{job.id}/markdown",
+                "pdf": f"/jobs/{job.id}/pdf",
+            },
+        }
+
+    def send_body(self, body, content_type, status=HTTPStatus.OK, location=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if location:
+            self.send_header("Location", location)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, data, status=HTTPStatus.OK, location=None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_body(body, "application/json; charset=utf-8", status, location)
+
+    def event_offset(self, url):
+        """
+        Where a stream starts: after the Last-Event-ID a reconnecting
+        EventSource sends, or at ?offset=, or at the beginning.
+        """
+        last_event_id = self.headers.get("Last-Event-ID")
+        if last_event_id and last_event_id.isdigit():
+            return int(last_event_id) + 1
+        offset = parse_qs(url.query).get("offset", ["0"])[0]
+        return int(offset) if offset.isdigit() else 0
+
+    def stream_events(self, job, offset):
+        """
+        Stream job events as they happen. Each SSE message carries the event
+        sequence number as its id, so clients can resume after a disconnect.
+        The stream ends once the job is finished and all events were sent.
+        """
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("X-Accel-Buffering", "no")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        last_write = time.time()
+        try:
+            while True:
+                events = job.wait_for_events(offset, timeout=self.api.heartbeat_interval)
+                job.touch()
+                for event in events:
+                    data = json.dumps(
+                        {k: v for k, v in event.items() if k not in ("seq", "type")},
+                        ensure_ascii=False,
+                    )
+                    self.wfile.write(f"id: {event['seq']}\nevent: {event['type']}\ndata: {data}\n\n".encode("utf-8"))
+                offset += len(events)
+
+                if events:
+                    last_write = time.time()
+                elif time.time() - last_write >= self.api.heartbeat_interval:
+                    # Comment line that keeps proxies from closing an idle stream
+                    self.wfile.write(b": keep-alive\n\n")
+                    last_write = time.time()
+                self.wfile.flush()
+
+                if job.is_finished and offset >= len(job.events_since(0)):
+                    break
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away; the job keeps running
+            pass
+
+
+def create_server(host="127.0.0.1", port=8000, groq_provider=None, queue=None):
+    """Returns a threading HTTP server serving the API; call serve_forever() on it"""
+    server = ThreadingHTTPServer((host, port), BookshelfRequestHandler)
+    server.daemon_threads = True
+    server.api = BookshelfAPI(groq_provider=groq_provider, queue=queue)
+    return server
@@ -0,0 +1,292 @@
+"""
+Headless command line interface for batch book and novel generation
+
+Usage:
+    python -m infinite_bookshelf topics.jsonl --output-dir books --concurrency 4
+    python -m infinite_bookshelf --pipeline novel --topic "A heist on a generation ship"
+    python -m infinite_bookshelf topics.jsonl --estimate
+
+Each row of a CSV or JSONL config file describes one book. The "pipeline"
+field picks "book", "advanced" or "novel" (default: --pipeline) and the
+remaining fields are passed to the pipeline, e.g. "topic" and
+"additional_instructions" for books or "concept_text", "genre", "tone" for
+novels. An optional "name" field sets the output directory name, and
+"seed_file" reads the seed content of an advanced book from a text,
+markdown, PDF or HTML file.
+"""
+
+import argparse
+import csv
+import inspect
+import json
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from .inference import RateLimitedProvider, groq_limiter
+from .jobs import Job, run_job, attach_journal, load_journal, COMPLETED, describe_estimate, estimate_run, format_duration
+from .jobs.metrics import limiter_wait
+from .pipelines import PIPELINES
+from .pipelines.seed import load_seed_file, seed_passages
+
+logger = logging.getLogger(__name__)
+
+# Fields every pipeline requires, used to validate config rows early
+REQUIRED_FIELDS = {
+    "book": ["topic"],
+    "advanced": ["topic"],
+    "novel": ["concept_text", "genre", "narrative_style", "tone"],
+}
+
+
+def load_config(path):
+    """Returns the rows of a CSV or JSONL config file as dicts"""
+    with open(path, encoding="utf-8") as config_file:
+        if path.lower().endswith(".csv"):
+            return [dict(row) for row in csv.DictReader(config_file)]
+        return [json.loads(line) for line in config_file if line.strip()]
+
+
+def coerce_params(pipeline, row):
+    """
+    Convert string values (from CSV) to the types of the pipeline's
+    keyword defaults and reject fields the pipeline does not accept.
+    """
+    parameters = inspect.signature(pipeline).parameters
+    params = {}
+    for key, value in row.items():
+        if key not in parameters or key in ("job", "groq_provider"):
+            raise ValueError(f"Unknown field '{key}' for pipeline {pipeline.__name__}")
+        default = parameters[key].default
+        if isinstance(value, str):
+            if isinstance(default, bool):
+                value = value.strip().lower() in ("1", "true", "yes", "y")
+            elif isinstance(default, int):
+                value = int(value)
+        params[key] = value
+    return params
+
+
+def slugify(text, max_length=60):
+    slug = re.sub(r"[^\w\-]+", "-", text.lower()).strip("-")
+    return slug[:max_length] or "book"
+
+
+def build_tasks(rows, default_pipeline):
+    tasks = []
+    for index, row in enumerate(rows):
+        row = {key: value for key, value in row.items() if value not in (None, "")}
+        pipeline_name = row.pop("pipeline", default_pipeline)
+        if pipeline_name not in PIPELINES:
+            raise ValueError(f"Row {index + 1}: unknown pipeline '{pipeline_name}'")
+        name = row.pop("name", None)
+        if seed_file := row.pop("seed_file", None):
+            try:
+                with open(seed_file, "rb") as seed:
+                    passages = load_seed_file(seed, seed_file)
+            except OSError as e:
+                raise ValueError(f"Row {index + 1}: cannot read seed file: {e}") from e
+            row["seed_content"] = seed_passages(row.get("seed_content", "")) + passages
+
+        missing = [field for field in REQUIRED_FIELDS[pipeline_name] if field not in row]
+        if missing:
+            raise ValueError(f"Row {index + 1}: missing fields {', '.join(missing)}")
+
+        pipeline, preset = PIPELINES[pipeline_name]
+        params = {**preset, **coerce_params(pipeline, row)}
+        label = name or params.get("topic") or params.get("concept_text")
+        tasks.append(
+            {
+                "name": f"{index + 1:03d}-{slugify(label)}",
+                "pipeline_name": pipeline_name,
+                "pipeline": pipeline,
+                "params": params,
+            }
+        )
+    return tasks
+
+
+def job_statistics(job, wall_time):
+    """Per-book statistics written next to the outputs"""
+    statistics = job.statistics
+    return {
+        "id": job.id,
+        "pipeline": job.kind,
+        "status": job.status,
+        "error": job.error,
+        "title": job.title,
+        "sections": len(job.contents),
+        "reused_sections": len(job.reused_sections),
+        "regenerated_sections": len(job.completed_sections) - len(job.reused_sections),
+        "words": sum(len(text.split()) for text in job.contents.values()),
+        "input_tokens": statistics.input_tokens,
+        "output_tokens": statistics.output_tokens,
+        "input_time": statistics.input_time,
+        "output_time": statistics.output_time,
+        "inference_time": statistics.total_time,
+        "output_speed": statistics.get_output_speed(),
+        "wall_time": wall_time,
+        # Estimated prompt tokens per agent and prompt part, and how many were trimmed to fit
+        "context_usage": job.data.get("context_usage", {}),
+        # Passages in the seed index, its build time and the time spent retrieving from it
+        "seed_retrieval": job.data.get("seed_retrieval", {}),
+        # Planning agents whose result was reused from a similar earlier request
+        "plan_cache": job.data.get("plan_cache", {}),
+        "params": job.params,
+    }
+
+
+def write_outputs(job, output_dir, wall_time, pdf=False):
+    os.makedirs(output_dir, exist_ok=True)
+    markdown_content = job.get_markdown_content()
+
+    if job.title:
+        with open(os.path.join(output_dir, "book.md"), "w", encoding="utf-8") as markdown_file:
+            markdown_file.write(markdown_content)
+
+        if pdf:
+            # Imported lazily: weasyprint needs system libraries markdown output does not
+            from .tools import create_pdf_file
+
+            with open(os.path.join(output_dir, "book.pdf"), "wb") as pdf_file:
+                pdf_file.write(create_pdf_file(markdown_content).getvalue())
+
+    with open(os.path.join(output_dir, "stats.json"), "w", encoding="utf-8") as stats_file:
+        json.dump(job_statistics(job, wall_time), stats_file, indent=2, ensure_ascii=False)
+
+
+def prepare_job(task, output_root, resume=False):
+    """
+    Create the job of a task, journaled next to its outputs. With `resume`,
+    a journal left by an earlier run of the same task is continued instead.
+    """
+    path = os.path.join(output_root, task["name"], "journal.jsonl")
+    if resume:
+        job = load_journal(path)
+        if job is not None and job.params == task["params"]:
+            return job
+        if job is not None:
+            logger.warning(f"{task['name']}: settings changed since the journaled run, starting over")
+
+    if os.path.exists(path):
+        os.remove(path)
+    job = Job(task["pipeline_name"], params=task["params"])
+    attach_journal(job, path)
+    return job
+
+
+def generate_one(task, job, groq_provider, output_root, pdf=False):
+    started = time.time()
+    if job.status == COMPLETED:
+        logger.info(f"Skipping {task['name']}, already completed")
+    else:
+        logger.info(f"Starting {task['name']} ({task['pipeline_name']})")
+        job.reset_cancel_token()
+        run_job(job, task["pipeline"], groq_provider, **task["params"])
+    wall_time = time.time() - started
+    write_outputs(job, os.path.join(output_root, task["name"]), wall_time, pdf=pdf)
+    return task, job, wall_time
+
+
+def print_estimates(tasks, concurrency):
+    """
+    Print the estimate of every book and of the whole batch, whose books
+    share the token rate limiter
+    """
+    estimates = [estimate_run(task["pipeline_name"], task["params"]) for task in tasks]
+    for task, estimate in zip(tasks, estimates):
+        print(f"{task['name']}: {describe_estimate(estimate)}")
+    tokens = sum(estimate["tokens"] for estimate in estimates)
+    generation = sum(estimate["seconds"] - estimate["limiter_wait"] for estimate in estimates) / max(1, concurrency)
+    wait = limiter_wait(tokens, generation)
+    print(
+        f"Total: {sum(estimate['calls'] for estimate in estimates)} API calls, {tokens:,} tokens, "
+        f"about {format_duration(generation + wait)} at concurrency {concurrency}"
+        + (f" ({format_duration(wait)} waiting for the rate limit)" if wait >= 1 else "")
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m infinite_bookshelf",
+        description="Generate books and novels without the streamlit UI.",
+    )
+    parser.add_argument("config", nargs="?", help="CSV or JSONL file with one book per row")
+    parser.add_argument("--topic", help="Generate a single book from this topic or novel concept")
+    parser.add_argument("--pipeline", choices=sorted(PIPELINES), default="book", help="Default pipeline for rows without one")
+    parser.add_argument("--output-dir", default="output", help="Directory for the generated books")
+    parser.add_argument("--concurrency", type=int, default=2, help="Number of books generated at the same time")
+    parser.add_argument("--tpm", type=int, default=None, help="Tokens per minute budget shared by all books (default: 6000)")
+    parser.add_argument("--pdf", action="store_true", help="Also write a PDF of each book")
+    parser.add_argument("--resume", action="store_true", help="Continue interrupted books from their journal instead of starting over")
+    parser.add_argument("--estimate", action="store_true", help="Print the expected tokens, calls and time of each book and exit")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args(argv)
+    if not args.config and not args.topic:
+        parser.error("provide a config file or --topic")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    load_dotenv()
+
+    if args.config:
+        rows = load_config(args.config)
+    else:
+        field = "concept_text" if args.pipeline == "novel" else "topic"
+        rows = [{field: args.topic}]
+
+    try:
+        tasks = build_tasks(rows, args.pipeline)
+    except ValueError as e:
+        print(f"Invalid config: {e}", file=sys.stderr)
+        return 2
+
+    if args.tpm:
+        groq_limiter.set_limit(args.tpm)
+    if args.estimate:
+        print_estimates(tasks, max(1, args.concurrency))
+        return 0
+
+    # Imported here so `--help` works without the groq package configured
+    from groq import Groq
+
+    groq_provider = RateLimitedProvider(Groq())
+
+    jobs = [prepare_job(task, args.output_dir, args.resume) for task in tasks]
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as executor:
+        futures = [
+            executor.submit(generate_one, task, job, groq_provider, args.output_dir, args.pdf)
+            for task, job in zip(tasks, jobs)
+        ]
+        try:
+            for future in as_completed(futures):
+                task, job, wall_time = future.result()
+                if job.status != COMPLETED:
+                    failures += 1
+                print(
+                    f"{task['name']}: {job.status} in {wall_time:.1f}s "
+                    f"({job.statistics.output_tokens} output tokens, "
+                    f"{len(job.reused_sections)} of {len(job.completed_sections)} sections reused)"
+                    + (f" - {job.error}" if job.error else "")
+                )
+        except KeyboardInterrupt:
+            print("Cancelling generation...", file=sys.stderr)
+            for job in jobs:
+                job.cancel()
+            for future in futures:
+                future.cancel()
+            return 130
+
+    return 1 if failures else 0
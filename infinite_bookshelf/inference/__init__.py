@@ -1,4 +1,16 @@
 from .stats import GenerationStatistics
 from .rate_limiter import groq_limiter
+from .cancellation import CancellationToken, GenerationCancelled
+from .streaming import StreamNotice, stream_with_checkpoints
+from .limited_provider import RateLimitedProvider, estimate_tokens
 
-__all__ = ['GenerationStatistics', 'groq_limiter']
+__all__ = [
+    'GenerationStatistics',
+    'groq_limiter',
+    'CancellationToken',
+    'GenerationCancelled',
+    'StreamNotice',
+    'stream_with_checkpoints',
+    'RateLimitedProvider',
+    'estimate_tokens',
+]
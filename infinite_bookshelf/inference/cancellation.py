@@ -0,0 +1,76 @@
+"""
+Cancellation token shared by a generation run and every agent call it makes
+"""
+
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class GenerationCancelled(Exception):
+    """Raised inside an agent when its generation run has been cancelled"""
+
+
+class CancellationToken:
+    """
+    Thread-safe cancellation flag. Agents register cleanup callbacks
+    (closing HTTP streams, releasing limiter reservations) which run once
+    when the token is cancelled, from whichever thread cancels it.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._next_id = 0
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Cancel the run and invoke all registered cleanup callbacks"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Error running cancellation callback: {e}")
+
+    def register(self, callback):
+        """
+        Register a cleanup callback. Returns a function that unregisters it.
+        If the token is already cancelled the callback runs immediately.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                callback_id = self._next_id
+                self._next_id += 1
+                self._callbacks[callback_id] = callback
+
+                def unregister():
+                    with self._lock:
+                        self._callbacks.pop(callback_id, None)
+
+                return unregister
+
+        callback()
+        return lambda: None
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise GenerationCancelled("Generation was cancelled")
+
+    def wait(self, seconds):
+        """
+        Sleep for up to `seconds`, waking early on cancellation.
+        Returns True if the token was cancelled.
+        """
+        return self._event.wait(seconds)
@@ -0,0 +1,99 @@
+"""
+Groq client wrapper that routes every chat completion through the token rate limiter
+"""
+
+import threading
+from types import SimpleNamespace
+
+from .rate_limiter import groq_limiter
+from .streaming import get_retry_after, is_rate_limit_error
+
+
+def estimate_tokens(text):
+    """Rough token count of a text: 1 token ≈ 4 characters"""
+    return len(text or "") // 4
+
+
+def estimate_request_tokens(params):
+    """
+    Rough token estimate for a request: 1 token ≈ 4 characters of input,
+    plus the full max_tokens budget for output.
+    """
+    input_tokens = sum(estimate_tokens(message.get("content")) for message in params.get("messages", []))
+    return input_tokens + (params.get("max_tokens") or 0)
+
+
+class LimitedStream:
+    """
+    Iterates a completion stream and settles the limiter reservation
+    with the actual usage reported in the final chunk. A stream closed
+    before its usage arrived (cancelled or failed) releases the
+    reservation instead, so the shared budget does not shrink.
+    """
+
+    def __init__(self, stream, limiter, reserved_tokens):
+        self.stream = stream
+        self.limiter = limiter
+        self.reserved_tokens = reserved_tokens
+        self.settled = False
+        self.lock = threading.Lock()
+
+    def settle(self, used_tokens):
+        """Correct the reservation once, with the tokens actually used"""
+        with self.lock:
+            if self.settled:
+                return
+            self.settled = True
+        self.limiter.record_usage(used_tokens - self.reserved_tokens)
+
+    def __iter__(self):
+        for chunk in self.stream:
+            x_groq = getattr(chunk, "x_groq", None)
+            if x_groq and x_groq.usage:
+                usage = x_groq.usage
+                self.settle(usage.prompt_tokens + usage.completion_tokens)
+            yield chunk
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            # Usage of an unfinished stream is unknown: give the reservation back
+            self.settle(0)
+
+
+class RateLimitedProvider:
+    """
+    Drop-in replacement for a Groq client passed as `groq_provider` to the
+    agents. Reserves estimated tokens with the shared limiter before each
+    call and corrects the reservation once real usage is known, so many
+    concurrent generations stay under one TPM budget. A rate limit error
+    pauses the limiter for its retry-after time; callers retry as usual.
+    """
+
+    def __init__(self, groq_provider, limiter=groq_limiter, max_wait_attempts=50):
+        self.groq_provider = groq_provider
+        self.limiter = limiter
+        self.max_wait_attempts = max_wait_attempts
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **params):
+        reserved_tokens = estimate_request_tokens(params)
+        self.limiter.request(reserved_tokens, max_retries=self.max_wait_attempts)
+
+        try:
+            result = self.groq_provider.chat.completions.create(**params)
+        except Exception as e:
+            # The request never ran, so nothing was consumed
+            self.limiter.release(reserved_tokens)
+            if is_rate_limit_error(e):
+                # Hold back every request sharing the limiter, not only this one's retry
+                self.limiter.handle_rate_limit_error(get_retry_after(e))
+            raise
+
+        if params.get("stream"):
+            return LimitedStream(result, self.limiter, reserved_tokens)
+
+        usage = result.usage
+        self.limiter.record_usage(usage.prompt_tokens + usage.completion_tokens - reserved_tokens)
+        return result
@@ -22,10 +22,17 @@ class GroqRateLimiter:
         self.token_queue = Queue()
         self.usage_window = timedelta(minutes=1)
         self.usage_history = []
-        self.lock = threading.Lock()
+        # Reentrant so a capacity check and its usage record can be made atomically
+        self.lock = threading.RLock()
         self.paused = False
         self.pause_until = None
         
+    def set_limit(self, tokens_per_minute, safety_margin=0.9):
+        """Change the tokens per minute budget, e.g. for a higher API tier"""
+        with self.lock:
+            self.tpm_limit = tokens_per_minute
+            self.effective_tpm_limit = int(tokens_per_minute * safety_margin)
+
     def check_available_capacity(self, requested_tokens):
         """
         Check if there's enough capacity for the requested tokens.
@@ -77,11 +84,28 @@ class GroqRateLimiter:
             # We have enough capacity
             return True, 0
     
+    def headroom(self):
+        """Tokens that can be requested right now without waiting"""
+        with self.lock:
+            current_time = datetime.now()
+            if self.paused and self.pause_until and current_time < self.pause_until:
+                return 0
+            tokens_used = sum(usage[1] for usage in self.usage_history if current_time - usage[0] < self.usage_window)
+            return max(0, self.effective_tpm_limit - tokens_used)
+
     def record_usage(self, tokens):
         """Record token usage"""
         with self.lock:
             self.usage_history.append((datetime.now(), tokens))
     
+    def release(self, tokens):
+        """
+        Return reserved but unused tokens to the window,
+        e.g. when a request is cancelled before it completes
+        """
+        if tokens > 0:
+            self.record_usage(-tokens)
+
     def handle_rate_limit_error(self, retry_after_seconds=None):
         """Handle a rate limit error by pausing all requests"""
         with self.lock:
@@ -96,12 +120,14 @@ class GroqRateLimiter:
         Wait if necessary, then record token usage.
         Returns time waited in seconds.
         """
+        waited = 0
         for attempt in range(max_retries):
-            can_proceed, wait_time = self.check_available_capacity(tokens)
-            
-            if can_proceed:
-                self.record_usage(tokens)
-                return 0
+            with self.lock:
+                can_proceed, wait_time = self.check_available_capacity(tokens)
+                
+                if can_proceed:
+                    self.record_usage(tokens)
+                    return waited
             
             # Need to wait
             if wait_time > 0:
@@ -112,6 +138,7 @@ class GroqRateLimiter:
                 
                 logger.info(f"Rate limit approaching. Waiting {wait_time:.2f}s before proceeding")
                 time.sleep(wait_time)
+                waited += wait_time
         
         # If we get here, we've failed to get capacity after max retries
         raise Exception(f"Failed to get API capacity after {max_retries} attempts")
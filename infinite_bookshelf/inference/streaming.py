@@ -0,0 +1,172 @@
+"""
+Streaming helpers that checkpoint partial output and resume after mid-stream failures
+"""
+
+import time
+import random
+
+from .stats import GenerationStatistics
+from .cancellation import GenerationCancelled
+
+
+class StreamNotice:
+    """
+    Out-of-band message about a stream (retries, waits, errors).
+    Yielded alongside str tokens and GenerationStatistics so callers can
+    surface it to the user without mixing it into the generated content.
+    """
+
+    def __init__(self, message, wait_time=0, attempt=0, error=None):
+        self.message = message
+        self.wait_time = wait_time
+        self.attempt = attempt
+        self.error = error
+
+    def __str__(self):
+        return self.message
+
+
+def is_rate_limit_error(error):
+    error_message = str(error)
+    return "429" in error_message or "rate_limit" in error_message.lower()
+
+
+def get_retry_after(error):
+    """
+    Returns the retry-after header of an API error in seconds, if present
+    """
+    headers = getattr(error, "headers", None)
+    if headers is None and getattr(error, "response", None) is not None:
+        headers = error.response.headers
+    if headers and "retry-after" in headers:
+        try:
+            return float(headers["retry-after"])
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def build_continuation_messages(messages, partial_text):
+    """
+    Append the partial output as an assistant prefix so the model continues
+    exactly where the interrupted stream stopped instead of starting over.
+    """
+    return list(messages) + [{"role": "assistant", "content": partial_text}]
+
+
+def stream_with_checkpoints(
+    groq_provider,
+    stream_params,
+    model,
+    max_retries=5,
+    base_delay=1,
+    cancel_token=None,
+    initial_text="",
+):
+    """
+    Stream a chat completion, yielding str tokens, GenerationStatistics and
+    StreamNotice objects. The text received so far is kept as a checkpoint;
+    when the stream fails it is resumed with a continuation request rather
+    than regenerated from scratch.
+
+    If a CancellationToken is given, cancelling it closes the open HTTP
+    stream and GenerationCancelled is raised to the consumer.
+
+    `initial_text` continues existing output (e.g. a section the user wants
+    extended); only the newly generated tokens are yielded, and only they
+    count against `max_tokens`.
+    """
+    partial_text = initial_text
+    max_tokens = stream_params.get("max_tokens")
+
+    for attempt in range(max_retries):
+        if cancel_token:
+            cancel_token.raise_if_cancelled()
+
+        params = dict(stream_params)
+        if partial_text:
+            params["messages"] = build_continuation_messages(
+                stream_params["messages"], partial_text
+            )
+            if max_tokens:
+                # Rough estimate: 1 token ≈ 4 characters
+                generated = len(partial_text) - len(initial_text)
+                params["max_tokens"] = max(256, max_tokens - generated // 4)
+
+        stream = None
+        unregister = None
+        try:
+            stream = groq_provider.chat.completions.create(**params)
+            if cancel_token:
+                unregister = cancel_token.register(stream.close)
+
+            for chunk in stream:
+                if cancel_token and cancel_token.cancelled:
+                    break
+                tokens = chunk.choices[0].delta.content
+                if tokens:
+                    partial_text += tokens
+                    yield tokens
+                if x_groq := chunk.x_groq:
+                    if not x_groq.usage:
+                        continue
+                    usage = x_groq.usage
+                    yield GenerationStatistics(
+                        input_time=usage.prompt_time,
+                        output_time=usage.completion_time,
+                        input_tokens=usage.prompt_tokens,
+                        output_tokens=usage.completion_tokens,
+                        total_time=usage.total_time,
+                        model_name=model,
+                    )
+
+            if cancel_token:
+                cancel_token.raise_if_cancelled()
+
+            # Successfully completed streaming
+            return
+
+        except GenerationCancelled:
+            raise
+
+        except Exception as e:
+            if cancel_token and cancel_token.cancelled:
+                # Closing the stream on cancel surfaces as a read error
+                raise GenerationCancelled("Generation was cancelled") from e
+
+            error_message = str(e)
+
+            if attempt == max_retries - 1:
+                yield StreamNotice(
+                    f"Error generating content: {error_message}",
+                    attempt=attempt + 1,
+                    error=error_message,
+                )
+                raise
+
+            if is_rate_limit_error(e):
+                retry_after = get_retry_after(e)
+                # Exponential backoff with jitter unless the API told us how long to wait
+                wait_time = retry_after or (2**attempt) * base_delay + random.uniform(0, 1)
+                message = f"Rate limit reached. Waiting {wait_time:.1f} seconds to retry..."
+            else:
+                wait_time = (2**attempt) * base_delay + random.uniform(0, 1)
+                message = f"Stream interrupted ({error_message}). Retrying in {wait_time:.1f} seconds..."
+
+            if partial_text:
+                message += f" Resuming after {len(partial_text)} characters."
+
+            yield StreamNotice(
+                message, wait_time=wait_time, attempt=attempt + 1, error=error_message
+            )
+            if cancel_token:
+                cancel_token.wait(wait_time)
+            else:
+                time.sleep(wait_time)
+
+        finally:
+            if unregister:
+                unregister()
+            if stream is not None:
+                # Also runs on GeneratorExit when the consumer stops iterating
+                stream.close()
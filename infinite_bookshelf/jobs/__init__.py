@@ -0,0 +1,5 @@
+from .job import Job, QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED
+from .store import JobStore, job_store
+from .worker import run_job, start_job, resume_job, run_on_job
+from .journal import attach_journal, load_journal, journal_path
+from .metrics import estimate_run, estimate_remaining, describe_estimate, format_duration, record_run_metrics
@@ -0,0 +1,260 @@
+"""
+Class to hold the state and event log of a single generation job
+"""
+
+import threading
+import time
+import uuid
+
+from ..inference import GenerationStatistics, CancellationToken
+from ..tools.markdown import render_markdown_book
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+
+class Job:
+    """
+    Progress of one book or novel generation run.
+
+    Pipelines write to the job from a worker thread; readers (streamlit
+    pages, the CLI) take snapshots or read the append-only event log.
+    Every change is recorded as an event so a reader can replay or follow
+    the run from any offset.
+    """
+
+    def __init__(self, kind, params=None, job_id=None, abandon_timeout=None):
+        self.id = job_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params or {}
+        self.status = QUEUED
+        self.stage = ""
+        self.title = ""
+        self.structure = {}
+        self.contents = {}
+        # Sections whose text is final, in completion order, the pipeline
+        # state saved with each and the state after the last of them
+        self.completed_sections = []
+        self.reused_sections = []
+        self.section_states = {}
+        self.checkpoint = None
+        self.data = {}
+        self.error = None
+        self.statistics = GenerationStatistics(model_name="combined")
+        self.events = []
+        self.cancel_token = CancellationToken()
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.last_polled = self.created_at
+        # Seconds without a reader after which the job counts as abandoned
+        self.abandon_timeout = abandon_timeout
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    # Writers
+
+    def emit(self, event_type, **data):
+        """Record an event and apply it to the job state"""
+        with self._changed:
+            event = {"seq": len(self.events), "type": event_type, "time": time.time(), **data}
+            self.events.append(event)
+            self._apply(event)
+            self.updated_at = event["time"]
+            for listener in self._listeners:
+                listener(event)
+            self._changed.notify_all()
+        return event
+
+    def subscribe(self, listener):
+        """
+        Call `listener(event)` for every event emitted from now on, in order.
+        Listeners run under the job lock and must not block.
+        Returns a function that unsubscribes the listener.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+        def unsubscribe():
+            with self._lock:
+                if listener in self._listeners:
+                    self._listeners.remove(listener)
+
+        return unsubscribe
+
+    def set_status(self, status, error=None):
+        self.emit("status", status=status, error=error)
+
+    def set_stage(self, stage):
+        self.emit("stage", stage=stage)
+
+    def set_title(self, title):
+        self.emit("title", title=title)
+
+    def set_structure(self, structure):
+        self.emit("structure", structure=structure)
+
+    def set_data(self, key, value):
+        self.emit("data", key=key, value=value)
+
+    def append_content(self, section_title, text):
+        self.emit("token", section=section_title, text=text)
+
+    def set_content(self, section_title, text):
+        self.emit("section", section=section_title, text=text)
+
+    def complete_section(self, section_title, text, state=None, reused=False):
+        """
+        Record the final text of a section, with the pipeline state needed
+        to continue after it, so an interrupted run can resume from here.
+        `reused` marks text taken from the section store instead of generated.
+        """
+        self.emit("section_done", section=section_title, text=text, state=state, reused=reused)
+
+    def update_section_state(self, section_title, state):
+        """Replace the pipeline state saved with a completed section"""
+        self.emit("section_state", section=section_title, state=state)
+
+    def add_statistics(self, statistics):
+        self.emit(
+            "statistics",
+            model_name=statistics.model_name,
+            input_time=statistics.input_time,
+            output_time=statistics.output_time,
+            input_tokens=statistics.input_tokens,
+            output_tokens=statistics.output_tokens,
+            total_time=statistics.total_time,
+        )
+
+    def notice(self, message):
+        self.emit("notice", message=str(message))
+
+    def _apply(self, event):
+        event_type = event["type"]
+        if event_type == "status":
+            self.status = event["status"]
+            self.error = event.get("error")
+        elif event_type == "stage":
+            self.stage = event["stage"]
+        elif event_type == "title":
+            self.title = event["title"]
+        elif event_type == "structure":
+            self.structure = event["structure"]
+        elif event_type == "data":
+            self.data[event["key"]] = event["value"]
+        elif event_type == "token":
+            self.contents[event["section"]] = self.contents.get(event["section"], "") + event["text"]
+        elif event_type == "section":
+            self.contents[event["section"]] = event["text"]
+        elif event_type == "section_done":
+            self.contents[event["section"]] = event["text"]
+            if event["section"] not in self.completed_sections:
+                self.completed_sections.append(event["section"])
+            if event.get("reused") and event["section"] not in self.reused_sections:
+                self.reused_sections.append(event["section"])
+            if event.get("state") is not None:
+                self._set_section_state(event["section"], event["state"])
+        elif event_type == "section_state":
+            self._set_section_state(event["section"], event["state"])
+        elif event_type == "statistics":
+            self.statistics.add(
+                GenerationStatistics(
+                    model_name=event["model_name"],
+                    input_time=event["input_time"],
+                    output_time=event["output_time"],
+                    input_tokens=event["input_tokens"],
+                    output_tokens=event["output_tokens"],
+                    total_time=event["total_time"],
+                )
+            )
+
+    def _set_section_state(self, section_title, state):
+        self.section_states[section_title] = state
+        # The checkpoint is the state to continue from: the latest section's
+        if self.completed_sections[-1:] == [section_title]:
+            self.checkpoint = state
+
+    def replay(self, events):
+        """Rebuild the job state from recorded events, e.g. a journal"""
+        with self._changed:
+            for event in events:
+                event = {**event, "seq": len(self.events)}
+                self.events.append(event)
+                self._apply(event)
+                self.updated_at = event["time"]
+            self._changed.notify_all()
+
+    def reset_cancel_token(self):
+        """Fresh token for running the job again after it was cancelled"""
+        self.cancel_token = CancellationToken()
+
+    # Readers
+
+    @property
+    def is_finished(self):
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def is_running(self):
+        return not self.is_finished
+
+    def refresh(self):
+        """
+        Bring the job state up to date. Jobs running in this process are
+        always current; jobs run elsewhere override this.
+        """
+
+    def touch(self):
+        """Mark the job as watched by a reader"""
+        self.last_polled = time.time()
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def events_since(self, offset=0):
+        with self._lock:
+            return self.events[offset:]
+
+    def wait_for_events(self, offset, timeout=None):
+        """
+        Block until there are events past `offset` or the job is finished.
+        Returns the new events.
+        """
+        with self._changed:
+            self._changed.wait_for(
+                lambda: len(self.events) > offset or self.is_finished, timeout
+            )
+            return self.events[offset:]
+
+    def wait(self, timeout=None):
+        """Block until the job is finished. Returns True if it finished."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.is_finished, timeout)
+
+    def snapshot(self):
+        """Consistent copy of the job state for rendering"""
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "stage": self.stage,
+                "title": self.title,
+                "structure": self.structure,
+                "contents": dict(self.contents),
+                "completed_sections": list(self.completed_sections),
+                "reused_sections": list(self.reused_sections),
+                "data": dict(self.data),
+                "error": self.error,
+                "statistics_text": str(self.statistics) if self.statistics.total_time else "",
+                "event_count": len(self.events),
+            }
+
+    def get_markdown_content(self):
+        with self._lock:
+            return render_markdown_book(self.title, self.structure, self.contents)
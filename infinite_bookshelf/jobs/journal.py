@@ -0,0 +1,114 @@
+"""
+Append-only journal of job events on disk, to resume interrupted generations
+"""
+
+import json
+import logging
+import os
+import time
+
+from .job import Job, FAILED, FINISHED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# Streamed tokens are not journaled: a section is only kept once its
+# "section_done" event is written, so the journal stays small.
+SKIPPED_EVENTS = ("token",)
+
+
+def journal_dir():
+    return os.getenv("BOOKSHELF_JOURNAL_DIR", os.path.join(".bookshelf", "journal"))
+
+
+def journal_path(job_id, directory=None):
+    return os.path.join(directory or journal_dir(), f"{job_id}.jsonl")
+
+
+class JournalWriter:
+    """
+    Job listener appending events to a JSON lines file. Every event is
+    flushed as it is written, so a crash loses at most the section that
+    was being streamed.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, record):
+        with open(self.path, "a", encoding="utf-8") as journal_file:
+            journal_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def __call__(self, event):
+        if event["type"] not in SKIPPED_EVENTS:
+            self.write({k: v for k, v in event.items() if k != "seq"})
+
+
+def attach_journal(job, path=None):
+    """
+    Journal the events of `job` from now on: structure, title, characters,
+    completed sections and the pipeline state saved with them.
+    Returns the journal path.
+    """
+    path = path or journal_path(job.id)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    writer = JournalWriter(path)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        writer.write({"type": "job", "time": time.time(), "id": job.id, "kind": job.kind, "params": job.params})
+        for event in job.events_since(0):
+            writer(event)
+    job.subscribe(writer)
+    return path
+
+
+def read_journal(path):
+    """
+    The records of a journal. A truncated last line, left by a crash in the
+    middle of a write, is skipped and cut from the file so the journal can
+    be continued; a corrupt line before it raises ValueError.
+    """
+    with open(path, encoding="utf-8") as journal_file:
+        lines = journal_file.readlines()
+    records = []
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            records.append(json.loads(line))
+        except json.JSONDecodeError as e:
+            if any(rest.strip() for rest in lines[number:]):
+                raise ValueError(f"{path}: line {number} is corrupt") from e
+            logger.warning(f"{path}: skipping the truncated last line")
+            with open(path, "r+", encoding="utf-8") as journal_file:
+                journal_file.truncate(len("".join(lines[:number - 1]).encode("utf-8")))
+    return records
+
+
+def load_journal(path, abandon_timeout=None):
+    """
+    Rebuild a job from its journal and keep journaling to it. A job whose
+    journal ends while it was running is marked failed as interrupted, so
+    it can be resumed. The status is only journaled once the journal is
+    older than `abandon_timeout`: before that the job may still be running
+    in another process, so it is only marked in memory. Returns None if the
+    journal does not exist.
+    """
+    if not os.path.exists(path):
+        return None
+
+    records = read_journal(path)
+    if not records or records[0]["type"] != "job":
+        raise ValueError(f"{path} is not a job journal")
+
+    header, events = records[0], records[1:]
+    job = Job(header["kind"], params=header["params"], job_id=header["id"], abandon_timeout=abandon_timeout)
+    job.created_at = header["time"]
+    job.replay(events)
+    interrupted = job.status not in FINISHED_STATUSES
+    abandoned = abandon_timeout is None or time.time() - os.path.getmtime(path) > abandon_timeout
+    if interrupted and not abandoned:
+        job.replay([{"type": "status", "time": time.time(), "status": FAILED, "error": "Generation was interrupted"}])
+
+    attach_journal(job, path)
+    if interrupted and abandoned:
+        job.set_status(FAILED, error="Generation was interrupted")
+    return job
@@ -0,0 +1,247 @@
+"""
+History of run metrics, and estimates of the tokens, calls and time of a run from it
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from ..inference import groq_limiter
+
+logger = logging.getLogger(__name__)
+
+# Most recent runs an estimate is based on
+HISTORY_RUNS = 50
+# Costs assumed until runs of a pipeline have been recorded
+DEFAULT_PROFILES = {
+    "book": {
+        "planning": {"calls": 2, "input_tokens": 1500, "output_tokens": 2500, "seconds": 8},
+        "section": {"calls": 1, "input_tokens": 700, "output_tokens": 2500, "seconds": 8},
+        "sections": 12,
+    },
+    "novel": {
+        "planning": {"calls": 4, "input_tokens": 5000, "output_tokens": 9000, "seconds": 30},
+        "section": {"calls": 2.5, "input_tokens": 5000, "output_tokens": 3000, "seconds": 15},
+        "sections": 15,
+    },
+}
+COST_FIELDS = ("calls", "input_tokens", "output_tokens", "seconds")
+# Events of the writing phase; statistics before the first are planning
+SECTION_EVENTS = ("section", "token", "section_done")
+
+_history_lock = threading.Lock()
+
+
+def history_path():
+    return os.getenv("BOOKSHELF_METRICS_HISTORY", os.path.join(".bookshelf", "metrics.jsonl"))
+
+
+def profile_name(kind):
+    """The default profile of a job kind ("book", "advanced_book", "novel", ...)"""
+    return "novel" if "novel" in kind else "book"
+
+
+def count_sections(kind, structure):
+    """Sections a structure has: every leaf of a book, every chapter and scene of a novel"""
+    count = 0
+    for content in structure.values():
+        if isinstance(content, dict):
+            count += count_sections(kind, content) + (profile_name(kind) == "novel")
+        else:
+            count += 1
+    return count
+
+
+def latest_run_events(job):
+    """The events of a job since it was last started, so a resumed job is measured without the downtime"""
+    events = job.events_since(0)
+    started = max((index for index, event in enumerate(events) if event["type"] == "status" and event["status"] == "running"), default=0)
+    return events[started:]
+
+
+def run_metrics(job):
+    """
+    Metrics of the latest run of a job, from its events: the calls, tokens
+    and seconds of planning and of writing, by model, and how many sections
+    it generated. None if the run made no calls.
+    """
+    events = latest_run_events(job)
+    planning = dict.fromkeys(COST_FIELDS, 0)
+    writing = dict.fromkeys(COST_FIELDS, 0)
+    models = {}
+    writing_started = None
+    for event in events:
+        if event["type"] in SECTION_EVENTS and writing_started is None:
+            writing_started = event["time"]
+        if event["type"] != "statistics":
+            continue
+        phase = planning if writing_started is None else writing
+        model = models.setdefault(event["model_name"], dict.fromkeys(COST_FIELDS, 0))
+        for totals in (phase, model):
+            totals["calls"] += 1
+            totals["input_tokens"] += event["input_tokens"]
+            totals["output_tokens"] += event["output_tokens"]
+        model["seconds"] += event["total_time"]
+    if not models:
+        return None
+
+    finished = events[-1]["time"]
+    planning["seconds"] = (writing_started or finished) - events[0]["time"]
+    writing["seconds"] = finished - writing_started if writing_started else 0
+    generated = [
+        event["section"] for event in events
+        if event["type"] == "section_done" and not event.get("reused")
+    ]
+    return {
+        "time": finished,
+        "kind": job.kind,
+        "section_model": job.params.get("section_model"),
+        "sections": len(job.completed_sections),
+        "generated_sections": len(set(generated)),
+        "words": sum(len(text.split()) for text in job.contents.values()),
+        "planning": planning,
+        "writing": writing,
+        "models": models,
+    }
+
+
+def record_run_metrics(job, path=None):
+    """Append the metrics of the latest run of a job to the history"""
+    metrics = run_metrics(job)
+    if metrics is None:
+        return None
+    path = path or history_path()
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _history_lock, open(path, "a", encoding="utf-8") as history_file:
+        history_file.write(json.dumps(metrics, ensure_ascii=False) + "\n")
+    return metrics
+
+
+def load_history(kind, path=None, section_model=None):
+    """
+    The most recent recorded runs of the same kind of job, preferring
+    those written with `section_model`; runs of the same profile (book or
+    novel) if there are none.
+    """
+    path = path or history_path()
+    try:
+        with open(path, encoding="utf-8") as history_file:
+            runs = [json.loads(line) for line in history_file if line.strip()]
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+    for matches in (
+        lambda run: run["kind"] == kind and run.get("section_model") == section_model,
+        lambda run: run["kind"] == kind,
+        lambda run: profile_name(run["kind"]) == profile_name(kind),
+    ):
+        selected = [run for run in runs if matches(run)]
+        if selected:
+            return selected[-HISTORY_RUNS:]
+    return []
+
+
+def cost_profile(kind, history):
+    """
+    Average planning costs, costs per generated section and number of
+    sections of the runs in `history`, with the defaults of the job kind
+    for what no run recorded.
+    """
+    profile = {**DEFAULT_PROFILES[profile_name(kind)]}
+    planned = [run for run in history if run["planning"]["calls"]]
+    if planned:
+        profile["planning"] = {field: sum(run["planning"][field] for run in planned) / len(planned) for field in COST_FIELDS}
+        profile["sections"] = sum(run["sections"] for run in planned) / len(planned)
+    written = [run for run in history if run["generated_sections"]]
+    if written:
+        sections = sum(run["generated_sections"] for run in written)
+        profile["section"] = {field: sum(run["writing"][field] for run in written) / sections for field in COST_FIELDS}
+    profile["runs"] = len(history)
+    return profile
+
+
+def limiter_wait(tokens, seconds, limiter=groq_limiter):
+    """
+    Seconds a run of `tokens` taking `seconds` of generation would wait on
+    the token rate limiter: beyond the headroom the limiter has now, tokens
+    go through at its tokens per minute.
+    """
+    limited_tokens = max(0, tokens - limiter.headroom())
+    return max(0.0, limited_tokens / limiter.effective_tpm_limit * 60 - seconds)
+
+
+def estimate_run(kind, params=None, history=None, limiter=groq_limiter):
+    """
+    Estimate the sections, API calls, tokens, generation time and rate
+    limiter waits of a run before it starts, from the recorded runs of the
+    same kind (see load_history) or defaults. A target length in
+    `params["target_words"]` sets the number of sections from the words
+    per section of earlier runs.
+    """
+    params = params or {}
+    if history is None:
+        history = load_history(kind, section_model=params.get("section_model"))
+    profile = cost_profile(kind, history)
+    sections = profile["sections"]
+    words = sum(run["words"] for run in history)
+    if params.get("target_words") and words:
+        sections = max(1, params["target_words"] / (words / sum(run["sections"] for run in history)))
+    return estimate_from_profile(profile, sections, limiter)
+
+
+def estimate_from_profile(profile, sections, limiter=groq_limiter, planning=True):
+    estimate = {
+        field: (profile["planning"][field] if planning else 0) + sections * profile["section"][field]
+        for field in COST_FIELDS
+    }
+    estimate["sections"] = round(sections)
+    estimate["calls"] = round(estimate["calls"])
+    estimate["tokens"] = round(estimate.pop("input_tokens") + estimate.pop("output_tokens"))
+    estimate["limiter_wait"] = limiter_wait(estimate["tokens"], estimate["seconds"], limiter)
+    estimate["seconds"] += estimate["limiter_wait"]
+    estimate["runs"] = profile["runs"]
+    return estimate
+
+
+def estimate_remaining(job, history=None, limiter=groq_limiter):
+    """
+    Seconds left in a running job: once its structure is known, from the
+    sections still to write, at the pace of the sections its latest run
+    has written so far, or of earlier runs until it has written two.
+    """
+    if history is None:
+        history = load_history(job.kind, section_model=job.params.get("section_model"))
+    profile = cost_profile(job.kind, history)
+    total = count_sections(job.kind, job.structure) if job.structure else round(profile["sections"])
+    remaining = max(0, total - len(job.completed_sections))
+    events = latest_run_events(job)
+    started = next((event["time"] for event in events if event["type"] in SECTION_EVENTS), None)
+    written = len({
+        event["section"] for event in events
+        if event["type"] == "section_done" and not event.get("reused")
+    })
+    if started is not None and written >= 2:
+        return remaining * (time.time() - started) / written
+    # Planning is only left if no run has written a section yet
+    planning = started is None and not job.completed_sections
+    estimate = estimate_from_profile(profile, remaining, limiter, planning=planning)
+    return estimate["seconds"]
+
+
+def format_duration(seconds):
+    """A duration as "45s", "12 min" or "1 h 20 min" """
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    minutes = round(seconds / 60)
+    return f"{minutes} min" if minutes < 60 else f"{minutes // 60} h {minutes % 60} min"
+
+
+def describe_estimate(estimate):
+    """One line describing an estimate for the pages and the CLI"""
+    basis = f"{estimate['runs']} earlier runs" if estimate["runs"] else "defaults, no runs recorded yet"
+    wait = f", {format_duration(estimate['limiter_wait'])} of it waiting for the rate limit" if estimate["limiter_wait"] >= 1 else ""
+    return (
+        f"About {estimate['sections']} sections, {estimate['calls']} API calls, "
+        f"{estimate['tokens']:,} tokens and {format_duration(estimate['seconds'])}{wait} (based on {basis})."
+    )
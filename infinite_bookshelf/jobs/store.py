@@ -0,0 +1,62 @@
+"""
+Process-wide registry of generation jobs shared by all streamlit sessions
+"""
+
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class JobStore:
+    """
+    Keeps jobs in memory so a page can reattach to a running job after a
+    rerun or reconnect. Finished jobs are dropped after `retention` seconds
+    and running jobs nobody has polled within their abandon timeout are
+    cancelled.
+    """
+
+    def __init__(self, retention=3600):
+        self.retention = retention
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def add(self, job):
+        self.reap()
+        with self.lock:
+            self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        if not job_id:
+            return None
+        self.reap()
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def remove(self, job_id):
+        with self.lock:
+            return self.jobs.pop(job_id, None)
+
+    def list(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    def reap(self):
+        """Cancel abandoned jobs and forget old finished ones"""
+        now = time.time()
+        with self.lock:
+            jobs = list(self.jobs.values())
+
+        for job in jobs:
+            if job.is_finished:
+                if now - job.updated_at > self.retention:
+                    self.remove(job.id)
+            elif job.abandon_timeout and now - job.last_polled > job.abandon_timeout:
+                logger.warning(f"Cancelling abandoned job {job.id}")
+                job.cancel()
+
+
+# Create a singleton instance
+job_store = JobStore()
@@ -0,0 +1,123 @@
+"""
+Functions to run generation pipelines on background worker threads
+"""
+
+import threading
+import logging
+import time
+import traceback
+
+from ..inference import GenerationCancelled
+from .job import Job, QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED
+from .store import job_store
+from .journal import attach_journal
+from .metrics import record_run_metrics
+
+logger = logging.getLogger(__name__)
+
+# Seconds a job run again waits for the threads of its last run to stop
+DRAIN_TIMEOUT = 30
+
+
+def run_job(job, pipeline, groq_provider, **params):
+    """
+    Run a pipeline for a job on the current thread, recording the outcome
+    in the job status instead of raising. The metrics of completed runs
+    are added to the history estimates are made from.
+    """
+    job.set_status(RUNNING)
+    try:
+        pipeline(job, groq_provider, **params)
+    except GenerationCancelled:
+        job.set_status(CANCELLED)
+    except Exception as e:
+        logger.error(f"Job {job.id} failed: {e}\n{traceback.format_exc()}")
+        # Task graphs, summarizers and arc trackers do not wait for their
+        # threads when closed; cancelling stops their calls to the API
+        job.cancel()
+        job.set_status(FAILED, error=str(e))
+    else:
+        job.set_status(CANCELLED if job.cancel_token.cancelled else COMPLETED)
+    if job.status == COMPLETED:
+        try:
+            record_run_metrics(job)
+        except OSError as e:
+            logger.warning(f"Could not record the metrics of job {job.id}: {e}")
+    return job
+
+
+def start_job(kind, pipeline, groq_provider, abandon_timeout=None, store=job_store, journal=False, **params):
+    """
+    Create a job, register it in the store and run the pipeline on a
+    daemon thread so it outlives the streamlit script run that started it.
+    With `journal`, its progress is journaled so it can be resumed.
+    """
+    job = Job(kind, params=params, abandon_timeout=abandon_timeout)
+    if journal:
+        attach_journal(job)
+    store.add(job)
+
+    thread = threading.Thread(
+        target=run_job,
+        args=(job, pipeline, groq_provider),
+        kwargs=params,
+        name=f"{kind}-job-{job.id}",
+        daemon=True,
+    )
+    thread.start()
+    return job
+
+
+def job_threads(job):
+    """
+    Threads still working for a job: the one running it and those of its
+    task graphs, summarizers and arc trackers, named after the job
+    """
+    current = threading.current_thread()
+    return [
+        thread for thread in threading.enumerate()
+        if thread is not current and (thread.name.startswith(f"{job.id}-") or thread.name.endswith(f"-job-{job.id}"))
+    ]
+
+
+def drain_job(job, timeout=DRAIN_TIMEOUT):
+    """Wait for the threads of the last run of a job to stop; False if some still run after `timeout`"""
+    deadline = time.monotonic() + timeout
+    for thread in job_threads(job):
+        thread.join(max(0, deadline - time.monotonic()))
+    return not job_threads(job)
+
+
+def run_on_job(job, function, groq_provider, store=job_store, **params):
+    """
+    Run `function(job, groq_provider, **params)` for a job that is not
+    running, on a daemon thread, e.g. to resume it or rewrite a section.
+    """
+    if job.is_running:
+        raise ValueError(f"Job {job.id} is still running")
+    # Threads of the last run read the token from the job, so they would
+    # carry on with a fresh one
+    if not drain_job(job):
+        raise ValueError(f"Job {job.id} is still stopping, try again in a moment")
+    job.reset_cancel_token()
+    job.set_status(QUEUED)
+    store.add(job)
+
+    thread = threading.Thread(
+        target=run_job,
+        args=(job, function, groq_provider),
+        kwargs=params,
+        name=f"{job.kind}-job-{job.id}",
+        daemon=True,
+    )
+    thread.start()
+    return job
+
+
+def resume_job(job, pipeline, groq_provider, store=job_store):
+    """
+    Run the pipeline again for a failed, cancelled or interrupted job.
+    Pipelines skip the stages and sections the job already completed, so
+    only what is missing is generated.
+    """
+    return run_on_job(job, pipeline, groq_provider, store=store, **job.params)
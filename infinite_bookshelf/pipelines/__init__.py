@@ -0,0 +1,9 @@
+from .book import run_book_pipeline, rewrite_book_section
+from .novel import run_novel_pipeline, rewrite_novel_section
+
+# Pipelines by name, with the fixed parameters each name implies
+PIPELINES = {
+    "book": (run_book_pipeline, {}),
+    "advanced": (run_book_pipeline, {"advanced": True}),
+    "novel": (run_novel_pipeline, {}),
+}
@@ -0,0 +1,175 @@
+"""
+Character arc tracking in the background, off the critical path of the novel sections
+"""
+
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ..agents import update_character_arcs
+from ..inference import GenerationCancelled
+from ..tools.entity_index import CharacterIndex
+from .common import merge_patch
+from .context import PromptContext, compact_characters, context_budget, keep_tail, record_context_usage
+from .section_store import get_section_store, section_key
+
+logger = logging.getLogger(__name__)
+
+# Sections that may be written before an arc update submitted after a
+# section is merged; 0 waits for it before the next section
+ARC_STALENESS = 1
+
+
+class ArcTracker:
+    """
+    Runs character arc updates on a background thread while the next
+    sections are written. Updates are cached in the section store by their
+    prompt; an update submitted twice, or made in an earlier run, is not
+    requested again.
+    """
+
+    def __init__(self, job, groq_provider, model, narrative_arc="auto", language="English"):
+        self.job = job
+        self.groq_provider = groq_provider
+        self.model = model
+        self.narrative_arc = narrative_arc
+        self.language = language
+        self.store = get_section_store()
+        # One worker, so updates are made in the order they were submitted
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{job.id}-arcs")
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def submit(self, prompt):
+        """Start an arc update from the fitted prompt parts; returns a future"""
+        key = section_key("arcs", template="character_arcs", prompt=prompt, model=self.model, narrative_arc=self.narrative_arc, language=self.language)
+        with self.lock:
+            future = self.futures.get(key)
+            if future is None:
+                future = self.futures[key] = self.executor.submit(self._update, key, prompt)
+        return future
+
+    def patch(self, prompt):
+        """The merge patch of an update, waiting for it if needed; {} if it failed"""
+        try:
+            return self.submit(prompt).result()
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"Error updating character arcs: {e}")
+            return {}
+
+    def _update(self, key, prompt):
+        if record := self.store.get(key):
+            return record["patch"]
+        self.job.cancel_token.raise_if_cancelled()
+        statistics, arc_patch = update_character_arcs(
+            characters=prompt["characters"],
+            current_plot_point=prompt["plot_point"],
+            completed_sections=prompt["completed_sections"],
+            character_goals=prompt["character_goals"],
+            model=self.model,
+            groq_provider=self.groq_provider,
+            narrative_arc=self.narrative_arc,
+            language=self.language,
+        )
+        self.job.add_statistics(statistics)
+        arc_patch = json.loads(arc_patch)
+        self.store.put(key, {"title": "character arcs", "patch": arc_patch})
+        return arc_patch
+
+    def close(self):
+        # Updates already submitted still finish, so they are cached
+        self.executor.shutdown(wait=False)
+
+
+def new_arc_state():
+    """Character arc fields of the novel writing state"""
+    return {
+        # Sections and characters whose arcs have not been submitted yet
+        "pending_arc_sections": [],
+        "pending_arc_characters": [],
+        # {"names", "prompt", "sections_left"} per update submitted but not merged
+        "arc_updates": [],
+    }
+
+
+def queue_arc_update(state, title, description, section_text):
+    """Returns the state with a written section waiting for an arc update"""
+    mentioned = CharacterIndex(state["characters"]).mentioned(section_text)
+    if not mentioned:
+        # A section that mentions nobody leaves the arcs as they are
+        return state
+    return {
+        **new_arc_state(),
+        **state,
+        "pending_arc_sections": state.get("pending_arc_sections", []) + [f"{title}: {description}"],
+        "pending_arc_characters": list(dict.fromkeys(state.get("pending_arc_characters", []) + mentioned)),
+    }
+
+
+def submit_arc_updates(job, state, tracker, staleness=ARC_STALENESS):
+    """
+    Submit one update for the arcs of the characters mentioned in the
+    pending sections, with only their profiles and goals. Returns the state
+    with nothing pending and the update in flight for `staleness` sections.
+    """
+    names = [name for name in state.get("pending_arc_characters", []) if name in state["characters"]]
+    plot_points = state.get("pending_arc_sections", [])
+    state = {**new_arc_state(), **state, "pending_arc_sections": [], "pending_arc_characters": []}
+    if not names:
+        return state
+
+    context = PromptContext(context_budget("character_arcs", tracker.model))
+    context.add("plot_point", "\n".join(plot_points), priority=5, min_tokens=200)
+    context.add("character_goals", json.dumps({name: state["character_goals"].get(name) for name in names}, ensure_ascii=False), priority=4, min_tokens=200)
+    context.add("characters", json.dumps({name: state["characters"][name] for name in names}, ensure_ascii=False), priority=3, min_tokens=300, shrink=compact_characters)
+    context.add("completed_sections", state["completed_sections"], priority=1, min_tokens=300, shrink=keep_tail)
+    prompt = context.fit()
+    record_context_usage(job, "character_arcs", context.usage)
+    tracker.submit(prompt)
+    state["arc_updates"] = state["arc_updates"] + [{"names": names, "prompt": prompt, "sections_left": staleness}]
+    return state
+
+
+def merge_arc_updates(job, state, tracker, flush=False):
+    """
+    Merge the updates in flight whose staleness bound is reached, or all of
+    them with `flush`, waiting for them if needed; the others have one
+    section less to go. Updates are merged at their bound rather than as
+    soon as they are ready, so the prompts of a section only depend on the
+    state and sections can be reused from the section store.
+    """
+    state = {**new_arc_state(), **state}
+    characters = state["characters"]
+    in_flight = []
+    for update in state["arc_updates"]:
+        if not flush and update["sections_left"] > 0:
+            in_flight.append({**update, "sections_left": update["sections_left"] - 1})
+            continue
+        # Only characters of the cast are patched, and none are removed
+        arc_patch = {
+            name: delta for name, delta in tracker.patch(update["prompt"]).items()
+            if name in update["names"] and isinstance(delta, dict)
+        }
+        characters = {
+            name: merge_patch(profile, arc_patch[name]) if name in arc_patch else profile
+            for name, profile in characters.items()
+        }
+    if len(in_flight) < len(state["arc_updates"]):
+        job.set_data("character_arcs", characters)
+    return {**state, "characters": characters, "arc_updates": in_flight}
+
+
+def flush_arc_updates(job, states, tracker):
+    """
+    Submit what is pending in each of `states`, the states after the last
+    section of chains written side by side, and merge every update, waiting
+    for them. Returns the last state with the arcs of all of them merged.
+    """
+    arc_updates = []
+    for state in states:
+        state = submit_arc_updates(job, state, tracker)
+        arc_updates += state["arc_updates"]
+    return merge_arc_updates(job, {**state, "arc_updates": arc_updates}, tracker, flush=True)
@@ -0,0 +1,413 @@
+"""
+Pipeline to generate a nonfiction book: structure, title, then section content
+"""
+
+import json
+from functools import partial
+
+from ..agents import generate_book_structure, generate_book_title, generate_section, stream_book_structure
+from ..agents.schemas import BookStructure, validate_output
+from .common import stream_into_job, stream_json_members, generate_json_output, report_section_reuse, select_params
+from .length_plan import book_section_weights, section_length
+from .plan_cache import cached_plan, lookup_plan, report_plan_cache, store_plan
+from .section_store import get_section_store, section_key
+from .seed import SEED_SECTION_PASSAGES, SEED_STRUCTURE_PASSAGES, report_seed_retrieval, retrieve_seed, seed_prompt
+from .task_graph import TaskGraph
+
+DEFAULT_MODEL = "llama-3.3-70b-specdec"
+
+# Ways to rewrite a single section of a finished book
+REWRITE_MODES = ("regenerate", "continue")
+
+ADVANCED_SECTION_WRITER_PROMPT = "The book chapters should be comprehensive. The writing should be: \nEngaging and tailored to the specified writing style, tone, and complexity level. \nWell-structured with clear subheadings, paragraphs, and transitions. \nRich in relevant examples, analogies, and explanations. \nConsistent with provided seed content and additional instructions. \nFocused on delivering value through insightful analysis and information. \nFactually accurate based on the latest available information. \nCreative, offering unique perspectives or thought-provoking ideas. \nEnsure each section flows logically, maintaining coherence throughout the chapter."
+
+
+def build_book_prompts(
+    additional_instructions="",
+    advanced=False,
+    writing_style="",
+    complexity_level="",
+):
+    """
+    Returns the (structure_instructions, section_instructions) used by the
+    basic and advanced book modes. Seed content is not part of them: each
+    prompt gets the seed passages relevant to it (see retrieve_seed).
+    """
+    if not advanced:
+        return additional_instructions, additional_instructions
+
+    advanced_settings_prompt = f"Use the following parameters:\nWriting Style: {writing_style}\nComplexity Level: {complexity_level}"
+    structure_instructions = additional_instructions + advanced_settings_prompt
+    section_instructions = f"{ADVANCED_SECTION_WRITER_PROMPT}\n{additional_instructions}\n{advanced_settings_prompt}"
+    return structure_instructions, section_instructions
+
+
+def with_seed(job, instructions, seed_content, query, k):
+    """`instructions` followed by the `k` seed passages most relevant to `query`"""
+    prompt = seed_prompt(retrieve_seed(job, seed_content, query, k))
+    return f"{instructions}\n{prompt}" if prompt else instructions
+
+
+def plan_book(
+    job,
+    groq_provider,
+    topic,
+    additional_instructions="",
+    title_model=DEFAULT_MODEL,
+    structure_model=DEFAULT_MODEL,
+    advanced=False,
+    writing_style="",
+    complexity_level="",
+    seed_content="",
+    structure=None,
+    book_title="",
+    reuse_sections=True,
+):
+    """
+    Generate the structure and title of a book into `job`.
+    Returns the parsed structure. A given `structure` (e.g. an outline the
+    user edited) or `book_title` is used as is, and a job resumed from a
+    journal keeps the structure and title it already has, unless the
+    structure was still being streamed when it stopped. With
+    `reuse_sections`, the structure and title of a similar earlier request
+    are taken from the plan cache instead of being generated.
+    """
+    if job.title and job.structure and job.data.get("structure_complete", True):
+        return job.structure
+
+    cancel_token = job.cancel_token
+    structure_instructions, _ = build_book_prompts(
+        additional_instructions, advanced, writing_style, complexity_level
+    )
+    structure_instructions = with_seed(
+        job, structure_instructions, seed_content, f"{topic}\n{additional_instructions}", SEED_STRUCTURE_PASSAGES
+    )
+
+    # The title only needs the topic, so it is generated alongside the structure
+    graph = TaskGraph(job)
+    if structure:
+        book_structure_json = json.loads(structure) if isinstance(structure, str) else structure
+    else:
+        # Step 1: Generate book structure using structure_writer agent
+        job.set_stage("Generating book title and structure in background....")
+        graph.add("structure", lambda: cached_plan(
+            job,
+            "book_structure",
+            topic,
+            lambda: generate_json_output(
+                job,
+                lambda: generate_book_structure(
+                    prompt=topic,
+                    additional_instructions=structure_instructions,
+                    model=structure_model,
+                    groq_provider=groq_provider,
+                    long=advanced,
+                ),
+                "book structure",
+                BookStructure,
+            ),
+            reuse=reuse_sections,
+            instructions=structure_instructions,
+            model=structure_model,
+            long=advanced,
+        ))
+
+    if not book_title:
+        # Step 2: Generate book title using title_writer agent
+        graph.add("title", lambda: cached_plan(
+            job,
+            "book_title",
+            topic,
+            lambda: generate_book_title(prompt=topic, model=title_model, groq_provider=groq_provider),
+            reuse=reuse_sections,
+            model=title_model,
+        ))
+
+    results = graph.run()
+    cancel_token.raise_if_cancelled()
+    if not structure:
+        book_structure_json = results["structure"]
+    book_title = results.get("title", book_title)
+
+    job.set_title(book_title)
+    job.set_structure(book_structure_json)
+    job.set_data("structure_complete", True)
+    return book_structure_json
+
+
+def stream_book_plan(
+    job,
+    groq_provider,
+    topic,
+    additional_instructions="",
+    title_model=DEFAULT_MODEL,
+    structure_model=DEFAULT_MODEL,
+    advanced=False,
+    writing_style="",
+    complexity_level="",
+    seed_content="",
+    book_title="",
+    reuse_sections=True,
+):
+    """
+    Like plan_book, but the structure is streamed: each top-level section
+    is added to the job's structure as soon as the model has written it,
+    while the title is generated alongside. Yields (title, description)
+    for the leaf sections in reading order, so writing starts while later
+    parts of the structure are still being generated. A structure taken
+    from the plan cache is yielded at once.
+    """
+    structure_instructions, _ = build_book_prompts(
+        additional_instructions, advanced, writing_style, complexity_level
+    )
+    structure_instructions = with_seed(
+        job, structure_instructions, seed_content, f"{topic}\n{additional_instructions}", SEED_STRUCTURE_PASSAGES
+    )
+
+    graph = TaskGraph(job)
+    if book_title or job.title:
+        job.set_title(book_title or job.title)
+    else:
+        graph.add("title", lambda: job.set_title(cached_plan(
+            job,
+            "book_title",
+            topic,
+            lambda: generate_book_title(prompt=topic, model=title_model, groq_provider=groq_provider),
+            reuse=reuse_sections,
+            model=title_model,
+        )))
+    graph.start()
+    job.set_data("structure_complete", False)
+
+    job.set_stage("Generating book structure and sections...")
+    plan_params = {"instructions": structure_instructions, "model": structure_model, "long": advanced}
+    cached_structure = lookup_plan(job, "book_structure", topic, reuse_sections, **plan_params)
+    if cached_structure is not None:
+        try:
+            job.set_structure(cached_structure)
+            yield from iter_book_sections(cached_structure)
+            if "title" in graph.tasks:
+                graph.result("title")
+        finally:
+            graph.close()
+        job.set_data("structure_complete", True)
+        return
+
+    content_stream = stream_book_structure(
+        prompt=topic,
+        additional_instructions=structure_instructions,
+        model=structure_model,
+        groq_provider=groq_provider,
+        long=advanced,
+        cancel_token=job.cancel_token,
+    )
+    book_structure_json = {}
+    skipped = []
+    try:
+        for title, content in stream_json_members(job, content_stream, "book structure", skipped):
+            book_structure_json[title] = content
+            job.set_structure(dict(book_structure_json))
+            yield from iter_book_sections({title: content})
+        if "title" in graph.tasks:
+            graph.result("title")
+    finally:
+        graph.close()
+    job.set_data("structure_complete", True)
+    # Only a whole, valid structure is reused for similar topics
+    if not skipped:
+        try:
+            store_plan("book_structure", topic, validate_output(book_structure_json, BookStructure), **plan_params)
+        except ValueError:
+            pass
+
+
+def iter_book_sections(structure):
+    """Yields (title, description) for every leaf section in reading order"""
+    for title, content in structure.items():
+        if isinstance(content, str):
+            yield title, content
+        elif isinstance(content, dict):
+            yield from iter_book_sections(content)
+
+
+def write_book_section(
+    job,
+    groq_provider,
+    title,
+    description,
+    section_instructions="",
+    section_model=DEFAULT_MODEL,
+    writing_style="",
+    reuse_sections=True,
+    continue_from="",
+    seed_content="",
+    target_words=0,
+):
+    """
+    Stream one section into `job`, replacing any earlier partial content,
+    and record it as completed. Returns the section text. The passages of
+    `seed_content` relevant to the section are added to its instructions.
+    With `target_words` for the whole book, the section gets its share of
+    what is left of it as length and output budget (see section_length).
+
+    With `reuse_sections`, a section generated before from the same inputs
+    is taken from the section store instead. `continue_from` extends the
+    given text rather than writing the section from scratch.
+    """
+    section_instructions = with_seed(
+        job, section_instructions, seed_content, f"{title}\n{description}", SEED_SECTION_PASSAGES
+    )
+    store = get_section_store()
+    key = section_key(
+        "book",
+        template="book_section",
+        title=title,
+        description=description,
+        instructions=section_instructions,
+        model=section_model,
+        writing_style=writing_style,
+        # Only a target length changes the key, so stored sections stay valid
+        **({"target_words": target_words} if target_words else {}),
+    )
+    if reuse_sections and not continue_from and (record := store.get(key)):
+        job.complete_section(title, record["text"], reused=True)
+        return record["text"]
+
+    words, max_tokens = section_length(job, book_section_weights(job.structure), target_words, title)
+    job.set_content(title, continue_from)
+    content_stream = generate_section(
+        prompt=(title + ": " + description),
+        plot_context="",
+        characters="",
+        tone=writing_style,
+        additional_instructions=section_instructions,
+        model=section_model,
+        groq_provider=groq_provider,
+        cancel_token=job.cancel_token,
+        continue_from=continue_from,
+        target_words=words,
+        max_tokens=max_tokens,
+    )
+    section_text = continue_from + stream_into_job(job, title, content_stream)
+    job.cancel_token.raise_if_cancelled()
+    store.put(key, {"title": title, "text": section_text})
+    job.complete_section(title, section_text)
+    return section_text
+
+
+def run_book_pipeline(
+    job,
+    groq_provider,
+    topic,
+    additional_instructions="",
+    title_model=DEFAULT_MODEL,
+    structure_model=DEFAULT_MODEL,
+    section_model=DEFAULT_MODEL,
+    advanced=False,
+    writing_style="",
+    complexity_level="",
+    seed_content="",
+    structure=None,
+    book_title="",
+    reuse_sections=True,
+    stream_structure=True,
+    section_workers=3,
+    target_words=0,
+):
+    """
+    Generate a whole book into `job`. `advanced` enables the long structure,
+    writing style, complexity level and seed content of the advanced page;
+    the seed is text or its passages (see load_seed_file). Sections whose inputs did not change since an earlier run are reused,
+    and so are the structure and title of a similar earlier request (see
+    plan_cache). With `stream_structure`, sections are written as soon as their part of
+    the structure has been generated. Up to `section_workers` sections are
+    written at the same time, earliest first. With `target_words`, the
+    length of the book is shared among its sections by depth; the
+    structure is then planned in full before the first section.
+    """
+    plan_params = dict(
+        additional_instructions=additional_instructions,
+        title_model=title_model,
+        structure_model=structure_model,
+        advanced=advanced,
+        writing_style=writing_style,
+        complexity_level=complexity_level,
+        seed_content=seed_content,
+        book_title=book_title,
+        reuse_sections=reuse_sections,
+    )
+    planned = job.structure and job.data.get("structure_complete", True)
+    # Section budgets are shared out over the whole structure
+    if stream_structure and not target_words and not structure and not planned:
+        sections = stream_book_plan(job, groq_provider, topic, **plan_params)
+    else:
+        sections = iter_book_sections(plan_book(job, groq_provider, topic, structure=structure, **plan_params))
+        # Step 3: Generate book section content using section_writer agent
+        job.set_stage("Generating sections...")
+
+    _, section_instructions = build_book_prompts(
+        additional_instructions, advanced, writing_style, complexity_level
+    )
+    # Sections only depend on the structure, so they are written in parallel
+    graph = TaskGraph(job, max_workers=section_workers).start()
+    try:
+        for title, description in sections:
+            # A title used twice has one text, written once
+            if title in job.completed_sections or title in graph.tasks:
+                continue
+            job.cancel_token.raise_if_cancelled()
+            graph.raise_if_failed()
+            graph.add(title, partial(
+                write_book_section,
+                job,
+                groq_provider,
+                title,
+                description,
+                section_instructions=section_instructions,
+                section_model=section_model,
+                writing_style=writing_style,
+                reuse_sections=reuse_sections,
+                seed_content=seed_content,
+                target_words=target_words,
+            ))
+        graph.wait()
+    finally:
+        graph.close()
+    report_section_reuse(job)
+    report_seed_retrieval(job)
+    report_plan_cache(job)
+    job.set_stage("Done")
+
+
+def rewrite_book_section(job, groq_provider, section_title, mode="regenerate", instructions=""):
+    """
+    Regenerate (`mode="regenerate"`) or extend (`mode="continue"`) one
+    section of a finished book with the inputs the pipeline used, leaving
+    the other sections untouched. `instructions` are added for this
+    section only.
+    """
+    if mode not in REWRITE_MODES:
+        raise ValueError(f"Unknown rewrite mode '{mode}'")
+    descriptions = dict(iter_book_sections(job.structure))
+    if section_title not in descriptions:
+        raise ValueError(f"The book has no section '{section_title}'")
+
+    _, section_instructions = build_book_prompts(**select_params(build_book_prompts, job.params))
+    if instructions:
+        section_instructions += f"\n{instructions}"
+
+    job.set_stage(f"Rewriting {section_title}...")
+    write_book_section(
+        job,
+        groq_provider,
+        section_title,
+        descriptions[section_title],
+        section_instructions=section_instructions,
+        section_model=job.params.get("section_model", DEFAULT_MODEL),
+        writing_style=job.params.get("writing_style", ""),
+        reuse_sections=False,
+        continue_from=job.contents.get(section_title, "") if mode == "continue" else "",
+        seed_content=job.params.get("seed_content", ""),
+        target_words=job.params.get("target_words", 0),
+    )
+    job.set_stage("Done")
@@ -0,0 +1,151 @@
+"""
+Novel chapters written in parallel against precomputed hand-off briefs
+"""
+
+import json
+import logging
+
+from ..agents import generate_chapter_briefs, smooth_seam
+from ..agents.schemas import ChapterBriefs
+from ..inference import GenerationCancelled
+from .common import generate_json_output
+from .context import compact_characters, keep_head, keep_tail
+from .section_store import get_section_store, section_key
+from .summaries import SUMMARY_MODEL, SUMMARY_TOKEN_BUDGET
+
+logger = logging.getLogger(__name__)
+
+# Tokens of the chapter outline, characters and plot sent for the briefs
+BRIEF_PART_TOKENS = 2000
+# Characters of a chapter opening the seam pass may rewrite, and of the
+# previous chapter's ending it is shown
+SEAM_OPENING_CHARS = 1200
+SEAM_ENDING_CHARS = 800
+SEAM_MODEL = SUMMARY_MODEL
+
+
+def chapter_outline(novel_structure):
+    """One line per chapter: its title and description"""
+    lines = []
+    for title, content in novel_structure.items():
+        description = content.get("description", "") if isinstance(content, dict) else content
+        lines.append(f"{title}: {description}")
+    return "\n".join(lines)
+
+
+def plan_chapter_briefs(job, groq_provider, plot_structure, genre, narrative_style, model, language="English"):
+    """
+    Generate the hand-off briefs of every chapter in one call into
+    `job.data["chapter_briefs"]`; a resumed job keeps the briefs it has.
+    Briefs are cached in the section store, since the sections written
+    from them can only be reused with the same briefs.
+    """
+    if "chapter_briefs" in job.data:
+        return job.data["chapter_briefs"]
+    job.set_stage("Planning chapter hand-offs...")
+    agent_params = dict(
+        chapters=keep_head(chapter_outline(job.data["novel_structure"]), BRIEF_PART_TOKENS),
+        characters=compact_characters(json.dumps(job.data["characters"], ensure_ascii=False), BRIEF_PART_TOKENS),
+        plot_structure=keep_head(json.dumps(plot_structure or {}, ensure_ascii=False), BRIEF_PART_TOKENS),
+        genre=genre,
+        narrative_style=narrative_style,
+        model=model,
+        language=language,
+    )
+    store = get_section_store()
+    key = section_key("chapter_briefs", template="chapter_briefs", **agent_params)
+    if record := store.get(key):
+        briefs = record["briefs"]
+    else:
+        briefs = generate_json_output(
+            job,
+            lambda: generate_chapter_briefs(**agent_params, groq_provider=groq_provider),
+            "chapter briefs",
+            ChapterBriefs,
+        )
+        store.put(key, {"title": "chapter briefs", "briefs": briefs})
+    job.set_data("chapter_briefs", briefs)
+    return briefs
+
+
+def brief_text(brief):
+    """The brief of a chapter as given to the prompts of its sections"""
+    positions = brief.get("positions") or ""
+    if isinstance(positions, dict):
+        positions = "; ".join(f"{name}: {position}" for name, position in positions.items())
+    lines = [
+        f"The chapter opens with: {brief['start_state']}" if brief.get("start_state") else "",
+        f"By its end: {brief['end_state']}" if brief.get("end_state") else "",
+        f"Where the characters are at its end: {positions}" if positions else "",
+    ]
+    return "\n".join(line for line in lines if line)
+
+
+def chapter_start_state(initial_state, chapters, chapter, briefs):
+    """
+    The writing state a chapter starts from when the chapters before it are
+    written at the same time: the end states of the earlier chapters stand
+    in for the story so far, and the chapter's brief for its continuity.
+    """
+    earlier = chapters[:chapters.index(chapter)]
+    story_so_far = "\n".join(f"{title}: {briefs[title]['end_state']}" for title in earlier if briefs.get(title, {}).get("end_state"))
+    return {
+        **initial_state,
+        "book_summary": keep_tail(story_so_far, SUMMARY_TOKEN_BUDGET // 2),
+        "chapter_brief": brief_text(briefs.get(chapter, {})),
+        "continuity_text": "",
+    }
+
+
+def split_opening(text, max_chars=SEAM_OPENING_CHARS):
+    """The first paragraphs of a text, up to `max_chars`, and the rest"""
+    paragraphs = text.split("\n\n")
+    opening = paragraphs[0]
+    for index, paragraph in enumerate(paragraphs[1:], start=1):
+        if len(opening) + len(paragraph) + 2 > max_chars:
+            return opening, "\n\n" + "\n\n".join(paragraphs[index:])
+        opening += "\n\n" + paragraph
+    return opening, ""
+
+
+def smooth_chapter_seams(job, groq_provider, sections, graph, model=SEAM_MODEL, language="English"):
+    """
+    Rewrite the opening of every chapter after the first so it follows on
+    from the ending of the chapter before, as tasks of `graph`. Rewrites
+    are cached in the section store, and a seam is only smoothed once per
+    job (listed in `job.data["smoothed_seams"]`).
+    """
+    store = get_section_store()
+    last_by_chapter, first_by_chapter = {}, {}
+    for section in sections:
+        first_by_chapter.setdefault(section["chapter"], section["title"])
+        last_by_chapter[section["chapter"]] = section["title"]
+    chapters = list(first_by_chapter)
+
+    def smooth(previous_title, title):
+        ending = job.contents[previous_title][-SEAM_ENDING_CHARS:]
+        opening, rest = split_opening(job.contents[title])
+        key = section_key("seam", template="seam", ending=ending, opening=opening, model=model, language=language)
+        if record := store.get(key):
+            smoothed = record["text"]
+        else:
+            try:
+                statistics, smoothed = smooth_seam(ending, opening, model, groq_provider, language)
+            except GenerationCancelled:
+                raise
+            except Exception as e:
+                logger.warning(f"Could not smooth the opening of '{title}': {e}")
+                return None
+            job.add_statistics(statistics)
+            store.put(key, {"title": title, "text": smoothed})
+        job.complete_section(title, smoothed + rest, state=job.section_states.get(title))
+        return title
+
+    smoothed_seams = list(job.data.get("smoothed_seams", []))
+    for previous_chapter, chapter in zip(chapters, chapters[1:]):
+        title = first_by_chapter[chapter]
+        if title not in smoothed_seams:
+            graph.add(("seam", title), lambda previous_title=last_by_chapter[previous_chapter], title=title: smooth(previous_title, title))
+    job.set_stage("Smoothing chapter transitions...")
+    smoothed_seams += [result for name, result in graph.wait().items() if isinstance(name, tuple) and result]
+    job.set_data("smoothed_seams", list(dict.fromkeys(smoothed_seams)))
@@ -0,0 +1,135 @@
+"""
+Helpers shared by the generation pipelines
+"""
+
+import inspect
+import queue
+import threading
+
+from ..agents.schemas import parse_json_output
+from ..inference import GenerationStatistics, StreamNotice
+from ..tools.json_stream import StreamingObjectParser
+
+_STREAM_END = object()
+
+
+def stream_into_job(job, section_title, content_stream):
+    """
+    Consume an agent stream, forwarding tokens, statistics and notices to
+    the job. Returns the full text generated for the section.
+    """
+    section_text = ""
+    for chunk in content_stream:
+        if isinstance(chunk, GenerationStatistics):
+            job.add_statistics(chunk)
+        elif isinstance(chunk, StreamNotice):
+            job.notice(chunk)
+        elif chunk is not None:
+            section_text += chunk
+            job.append_content(section_title, chunk)
+    return section_text
+
+
+def stream_json_members(job, content_stream, what, skipped=None):
+    """
+    Consume an agent stream of a JSON object on a background thread and
+    yield its top-level (key, value) members as soon as each is complete,
+    so the caller can work on the first sections while the rest is still
+    being generated. Statistics and notices are forwarded to the job.
+    Members that could not be decoded are added to the `skipped` list.
+    Raises ValueError if no member could be parsed.
+    """
+    members = queue.Queue()
+    parser = StreamingObjectParser()
+
+    def consume():
+        try:
+            for chunk in content_stream:
+                if isinstance(chunk, GenerationStatistics):
+                    job.add_statistics(chunk)
+                elif isinstance(chunk, StreamNotice):
+                    job.notice(chunk)
+                elif chunk is not None:
+                    for member in parser.feed(chunk):
+                        members.put(member)
+            for member in parser.close():
+                members.put(member)
+        except Exception as e:
+            members.put(e)
+        members.put(_STREAM_END)
+
+    threading.Thread(target=consume, name=f"{job.id}-{what}", daemon=True).start()
+
+    received = 0
+    while (member := members.get()) is not _STREAM_END:
+        if isinstance(member, Exception):
+            raise member
+        received += 1
+        yield member
+
+    if not received:
+        raise ValueError(f"Failed to decode the {what}. Please try again.")
+    if parser.failed:
+        job.notice(f"Part of the {what} could not be decoded and was skipped.")
+        if skipped is not None:
+            skipped.extend(parser.failed)
+
+
+def load_json_output(content, what, schema=None):
+    """
+    Parse JSON returned by an agent, repaired locally and validated against
+    `schema`, with a readable error if it cannot be recovered
+    """
+    try:
+        return parse_json_output(content, schema)
+    except ValueError as e:
+        raise ValueError(f"Failed to decode the {what}. Please try again.") from e
+
+
+def generate_json_output(job, generate, what, schema=None, attempts=2):
+    """
+    Call `generate`, an agent call returning (statistics, content), and
+    parse its JSON output. Malformed output is repaired locally; the agent
+    is only called again when the output cannot be recovered.
+    """
+    for attempt in range(attempts):
+        statistics, content = generate()
+        job.add_statistics(statistics)
+        job.cancel_token.raise_if_cancelled()
+        try:
+            return load_json_output(content, what, schema)
+        except ValueError:
+            if attempt == attempts - 1:
+                raise
+            job.notice(f"The {what} could not be decoded, generating it again.")
+
+
+def merge_patch(target, patch):
+    """
+    Apply a JSON merge patch (RFC 7386): objects are merged recursively,
+    null removes a key and any other value replaces it. Returns a new value.
+    """
+    if not isinstance(patch, dict):
+        return patch
+    merged = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            merged.pop(key, None)
+        else:
+            merged[key] = merge_patch(merged.get(key), value)
+    return merged
+
+
+def select_params(function, params):
+    """Returns the subset of `params` that `function` accepts as keywords"""
+    parameters = inspect.signature(function).parameters
+    return {key: value for key, value in params.items() if key in parameters}
+
+
+def report_section_reuse(job):
+    """Record how many sections were reused from the section store versus generated"""
+    reused = len(job.reused_sections)
+    regenerated = len(job.completed_sections) - reused
+    job.set_data("section_reuse", {"reused": reused, "regenerated": regenerated})
+    if reused:
+        job.notice(f"Reused {reused} unchanged sections, regenerated {regenerated}.")
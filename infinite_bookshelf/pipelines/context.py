@@ -0,0 +1,143 @@
+"""
+Prompt assembly within a token budget per agent and model
+"""
+
+import json
+
+from ..inference import estimate_tokens
+
+# Context windows of the models the pages offer, in tokens
+MODEL_CONTEXT_WINDOWS = {
+    "llama-3.3-70b-versatile": 128000,
+    "llama-3.3-70b-specdec": 8192,
+    "llama-3.2-90b-versatile": 8192,
+    "llama-3.1-8b-instant": 128000,
+    "deepseek-r1-distill-llama-70b": 128000,
+    "gemma2-9b-it": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Input tokens the variable parts of an agent's prompt may use. Bounded well
+# below the context windows so every call has predictable latency and cost.
+AGENT_BUDGETS = {
+    "novel_section": 5000,
+    "character_arcs": 3000,
+}
+
+# Room kept for the fixed instructions of the prompt
+PROMPT_OVERHEAD_TOKENS = 800
+
+
+def context_budget(agent, model):
+    """
+    Input tokens available to the variable parts of a prompt for `agent`
+    on `model`: the agent's budget, within half of the model's context
+    window so the output has room.
+    """
+    window = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+    return min(AGENT_BUDGETS[agent], window // 2 - PROMPT_OVERHEAD_TOKENS)
+
+
+def keep_head(text, max_tokens):
+    """The start of `text`, cut at a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * 4]
+    return cut[:cut.rfind(" ")] + "..." if " " in cut else cut
+
+
+def keep_tail(text, max_tokens):
+    """The end of `text`, cut at a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[len(text) - max_tokens * 4:]
+    return "..." + cut[cut.find(" ") + 1:] if " " in cut else cut
+
+
+def compact_characters(characters_json, max_tokens):
+    """
+    Shrink character profiles by shortening every field equally, so each
+    character keeps its name and the start of every trait rather than the
+    last characters being cut off.
+    """
+    try:
+        characters = json.loads(characters_json)
+    except json.JSONDecodeError:
+        return keep_head(characters_json, max_tokens)
+    if not isinstance(characters, dict):
+        return keep_head(characters_json, max_tokens)
+
+    field_chars = 400
+    while field_chars >= 20:
+        compact = json.dumps(
+            {
+                name: {field: keep_head(str(value), field_chars // 4) for field, value in profile.items()}
+                if isinstance(profile, dict) else profile
+                for name, profile in characters.items()
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        if estimate_tokens(compact) <= max_tokens:
+            return compact
+        field_chars //= 2
+    return keep_head(compact, max_tokens)
+
+
+class PromptContext:
+    """
+    The variable parts of a prompt, fitted into a token budget. Parts are
+    added with a priority; when the total is over budget, the parts with
+    the lowest priority are shrunk first, each down to its `min_tokens`,
+    with its own `shrink` function (keep_head, keep_tail or e.g.
+    compact_characters).
+
+        context = PromptContext(context_budget("novel_section", model))
+        context.add("summary", summary, priority=2, shrink=keep_tail)
+        parts = context.fit()
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.parts = []
+        self.usage = {}
+
+    def add(self, name, text, priority=1, min_tokens=0, shrink=keep_head):
+        self.parts.append({"name": name, "text": text or "", "priority": priority, "min_tokens": min_tokens, "shrink": shrink})
+
+    def fit(self):
+        """Returns {name: text} with the parts fitted to the budget; see `usage`"""
+        texts = {part["name"]: part["text"] for part in self.parts}
+        excess = sum(estimate_tokens(text) for text in texts.values()) - self.budget
+        for part in sorted(self.parts, key=lambda part: part["priority"]):
+            if excess <= 0:
+                break
+            tokens = estimate_tokens(part["text"])
+            target = max(part["min_tokens"], tokens - excess)
+            if target < tokens:
+                texts[part["name"]] = part["shrink"](part["text"], target)
+                excess -= tokens - estimate_tokens(texts[part["name"]])
+
+        self.usage = {
+            part["name"]: {
+                "tokens": estimate_tokens(texts[part["name"]]),
+                "dropped": estimate_tokens(part["text"]) - estimate_tokens(texts[part["name"]]),
+            }
+            for part in self.parts
+        }
+        return texts
+
+
+def record_context_usage(job, agent, usage):
+    """
+    Add the token usage per prompt part of one call to the job's
+    "context_usage" data: calls per agent and tokens sent and dropped per part.
+    """
+    all_usage = dict(job.data.get("context_usage", {}))
+    agent_usage = all_usage.get(agent, {"calls": 0, "parts": {}})
+    parts = dict(agent_usage["parts"])
+    for name, part_usage in usage.items():
+        totals = parts.get(name, {"tokens": 0, "dropped": 0})
+        parts[name] = {key: totals[key] + part_usage[key] for key in totals}
+    all_usage[agent] = {"calls": agent_usage["calls"] + 1, "parts": parts}
+    job.set_data("context_usage", all_usage)
@@ -0,0 +1,79 @@
+"""
+Output budget of each section from a target book length
+"""
+
+import threading
+
+WORDS_PER_PAGE = 300
+# Output tokens per word of prose, and room left over the target so a
+# section can finish its last paragraph
+TOKENS_PER_WORD = 1.4
+OUTPUT_HEADROOM = 1.3
+# The output budget the section agents use without a target length
+MAX_SECTION_TOKENS = 8000
+MIN_SECTION_WORDS = 150
+# Share of a section relative to its parent level: deeper sections cover less
+DEPTH_WEIGHT = 0.7
+# Rebalancing keeps a section within this factor of its planned share, so
+# one section running short does not make the last one huge
+REBALANCE_LIMIT = 2
+
+_record_lock = threading.Lock()
+
+
+def section_weight(depth, dramaturgy_level=None):
+    """
+    Relative length of a section: smaller the deeper it is nested and, for
+    novels, larger the more intense it is (level 1 gets 0.6, level 10 1.5).
+    """
+    weight = DEPTH_WEIGHT ** depth
+    if dramaturgy_level is not None:
+        try:
+            level = min(10, max(1, int(dramaturgy_level)))
+        except (TypeError, ValueError):
+            level = 5
+        weight *= 0.5 + level / 10
+    return weight
+
+
+def book_section_weights(structure, depth=0):
+    """Weights of the leaf sections of a book structure, by title"""
+    weights = {}
+    for title, content in structure.items():
+        if isinstance(content, str):
+            weights.setdefault(title, section_weight(depth))
+        elif isinstance(content, dict):
+            for nested_title, weight in book_section_weights(content, depth + 1).items():
+                weights.setdefault(nested_title, weight)
+    return weights
+
+
+def section_length(job, weights, target_words, title):
+    """
+    The (words, max_tokens) budget of a section from the `target_words` of
+    the whole book: what is left of the target after the sections already
+    written, shared among the sections still to write by weight. Budgets
+    are rebalanced from the actual length of every completed section, so
+    sections running long or short make the later ones shorter or longer.
+    Returns (0, MAX_SECTION_TOKENS) without a target.
+    """
+    if not target_words or title not in weights:
+        return 0, MAX_SECTION_TOKENS
+    written = {
+        completed: len(job.contents.get(completed, "").split())
+        for completed in list(job.completed_sections)
+        if completed in weights and completed != title
+    }
+    pending_weight = sum(weight for pending, weight in weights.items() if pending not in written)
+    remaining_words = max(0, target_words - sum(written.values()))
+    planned = target_words * weights[title] / sum(weights.values())
+    words = min(max(remaining_words * weights[title] / pending_weight, planned / REBALANCE_LIMIT), planned * REBALANCE_LIMIT)
+    words = max(MIN_SECTION_WORDS, round(words))
+    max_tokens = min(MAX_SECTION_TOKENS, round(words * TOKENS_PER_WORD * OUTPUT_HEADROOM))
+
+    # Sections can be written in parallel, so the plan is updated under a lock
+    with _record_lock:
+        length_plan = dict(job.data.get("length_plan", {}))
+        length_plan[title] = words
+        job.set_data("length_plan", length_plan)
+    return words, max_tokens
@@ -0,0 +1,890 @@
+"""
+Pipeline to generate a novel: characters, plot, structure, title, then
+sections with continuity and character arc tracking
+"""
+
+import json
+from functools import partial
+
+from ..agents import (
+    generate_book_title,
+    generate_characters,
+    generate_plot_structure,
+    is_fallback_characters,
+    generate_novel_structure,
+    generate_novel_section,
+    stream_novel_structure,
+)
+from ..agents.schemas import Characters, NovelStructure, PlotStructure
+from ..tools.entity_index import CharacterIndex
+from .common import (
+    stream_into_job,
+    stream_json_members,
+    load_json_output,
+    generate_json_output,
+    report_section_reuse,
+    select_params,
+)
+from .arcs import (
+    ARC_STALENESS,
+    ArcTracker,
+    flush_arc_updates,
+    merge_arc_updates,
+    new_arc_state,
+    queue_arc_update,
+    submit_arc_updates,
+)
+from .chapters import SEAM_MODEL, chapter_start_state, plan_chapter_briefs, smooth_chapter_seams
+from .context import (
+    PromptContext,
+    compact_characters,
+    context_budget,
+    keep_tail,
+    record_context_usage,
+)
+from .length_plan import section_length, section_weight
+from .plan_cache import cached_plan, report_plan_cache
+from .section_store import get_section_store, section_key
+from .task_graph import TaskGraph
+from .summaries import (
+    SUMMARY_MODEL,
+    SECTION_SUMMARY_WORDS,
+    Summarizer,
+    add_section_summary,
+    advance_summaries,
+    new_summary_state,
+    replace_section_summary,
+)
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+
+# Ways to rewrite a single section of a finished novel
+REWRITE_MODES = ("regenerate", "continue")
+
+# Characters of previous sections kept for the character arc tracker; the
+# context budget decides how much of it a call gets
+COMPLETED_CONTEXT_CHARS = 12000
+
+# Keys the structure agent sometimes emits that are not actual chapters
+METADATA_FIELDS = [
+    "narrative_arc", "emotional_tone", "characters_involved",
+    "plot_structure", "narrative_advancement", "exposition",
+    "inciting_incident", "rising_action", "midpoint",
+    "complications", "climax", "resolution"
+]
+
+# Keys of a section specification rather than nested sections
+SECTION_FIELDS = ["description", "dramaturgy_level", "setting_focus", "character_focus", "scenes"]
+
+
+def filter_structure(structure):
+    filtered = {}
+    for key, value in structure.items():
+        key_lower = key.lower()
+        if not any(field.lower() in key_lower for field in METADATA_FIELDS):
+            if isinstance(value, dict):
+                filtered[key] = filter_structure(value)
+            else:
+                filtered[key] = value
+    return filtered
+
+
+def iter_novel_sections(structure, depth=0, parent=None, chapter=None):
+    """
+    Yields a section spec dict for every chapter and scene of a novel
+    structure, in reading order. `chapter` is the top-level chapter a
+    section belongs to.
+    """
+    for title, content in structure.items():
+        if not isinstance(content, dict) or "description" not in content:
+            continue
+        yield {
+            "title": title,
+            "description": content["description"],
+            "dramaturgy_level": content.get("dramaturgy_level", 5),
+            "setting_focus": content.get("setting_focus", False),
+            "character_focus": content.get("character_focus", False),
+            "depth": depth,
+            "parent": parent,
+            "chapter": chapter or title,
+        }
+        nested = content.get("scenes")
+        if not isinstance(nested, dict):
+            nested = {k: v for k, v in content.items() if k not in SECTION_FIELDS}
+        yield from iter_novel_sections(nested, depth + 1, title, chapter or title)
+
+
+def novel_section_weights(structure):
+    """Relative length of every section of a novel structure, by title"""
+    weights = {}
+    for section in iter_novel_sections(structure):
+        weights.setdefault(section["title"], section_weight(section["depth"], section["dramaturgy_level"]))
+    return weights
+
+
+def display_structure(structure):
+    """
+    Reduces a novel structure to {title: description | {nested...}} so it
+    can be rendered like a book structure.
+    """
+    display = {}
+    for title, content in structure.items():
+        if not isinstance(content, dict) or "description" not in content:
+            continue
+        nested = content.get("scenes")
+        if not isinstance(nested, dict):
+            nested = {k: v for k, v in content.items() if k not in SECTION_FIELDS}
+        nested_display = display_structure(nested)
+        display[title] = nested_display if nested_display else content["description"]
+    return display
+
+
+def extract_character_goals(characters_data):
+    """Store character goals for later use in character arc tracking"""
+    character_goals = {}
+    for name, info in characters_data.items():
+        if isinstance(info, dict) and "motivations" in info:
+            character_goals[name] = info["motivations"]
+        elif isinstance(info, dict) and "goals" in info:
+            character_goals[name] = info["goals"]
+        else:
+            character_goals[name] = "Unknown goals"
+    return character_goals
+
+
+def relevant_characters(characters, section, recent_text=""):
+    """
+    The profiles of the characters a section involves: the protagonists,
+    and those its title and description or the end of the previous
+    section mention by name or alias. The whole cast if nobody is mentioned.
+    """
+    mentioned = CharacterIndex(characters).mentioned(section["title"], section["description"], recent_text)
+    if not mentioned:
+        return characters
+    return {
+        name: profile
+        for name, profile in characters.items()
+        if name in mentioned or (isinstance(profile, dict) and "protagonist" in str(profile.get("role", "")).lower())
+    }
+
+
+def last_sentences(text, count=4):
+    """Extract the last few sentences of a section for continuity in the next one"""
+    sentences = text.split(".")
+    return ".".join(sentences[-count - 1:-1]) + "." if len(sentences) > count else text
+
+
+def plan_novel(
+    job,
+    groq_provider,
+    concept_text,
+    genre,
+    narrative_style,
+    num_characters=4,
+    has_romance=False,
+    has_twist=False,
+    complexity="Moderate",
+    additional_instructions="",
+    character_seeds="",
+    narrative_arc="auto",
+    language="English",
+    title_model=DEFAULT_MODEL,
+    character_model=DEFAULT_MODEL,
+    plot_model=DEFAULT_MODEL,
+    characters=None,
+    novel_structure=None,
+    book_title="",
+    stream_structure=False,
+    reuse_sections=True,
+):
+    """
+    Generate characters, plot, structure and title of a novel into `job`.
+    Returns the section specs in reading order and the initial writing state.
+    Given `characters`, `novel_structure` or `book_title` (e.g. edited by
+    the user) are used as is, and stages a job resumed from a journal
+    already completed are skipped. The title is generated at the same time
+    as the characters and plot, which it does not depend on. With
+    `reuse_sections`, the characters, plot and title of a similar earlier
+    request are taken from the plan cache.
+
+    With `stream_structure`, the section specs are a generator yielding
+    each chapter as soon as the structure agent has written it.
+    """
+    cancel_token = job.cancel_token
+    if characters and "characters" not in job.data:
+        job.set_data("characters", json.loads(characters) if isinstance(characters, str) else characters)
+    if novel_structure and "novel_structure" not in job.data:
+        novel_structure = json.loads(novel_structure) if isinstance(novel_structure, str) else novel_structure
+        job.set_data("novel_structure", novel_structure)
+    if book_title and not job.title:
+        job.set_title(book_title)
+    romance_instruction = "Include a romance subplot" if has_romance else ""
+    combined_instructions = f"{additional_instructions}\n{romance_instruction}".strip()
+
+    # Stages with the inputs they need; the title only needs the concept,
+    # so it is generated while the characters and plot are
+    graph = TaskGraph(job)
+
+    # 1. GENERATE CHARACTERS
+    def characters_stage():
+        if "characters" in job.data:
+            return job.data["characters"]
+        job.set_stage("Creating characters...")
+
+        # Prepare character generation prompt with seeds if provided
+        combined_character_instructions = additional_instructions
+        if character_seeds:
+            combined_character_instructions += f"\nCharacter seeds: {character_seeds}"
+
+        def generate():
+            char_stats, characters_json = generate_characters(
+                prompt=concept_text,
+                additional_instructions=combined_character_instructions,
+                number_of_characters=num_characters,
+                model=character_model,
+                groq_provider=groq_provider,
+                language=language
+            )
+            job.add_statistics(char_stats)
+            cancel_token.raise_if_cancelled()
+            return load_json_output(characters_json, "characters", Characters)
+
+        characters_data = cached_plan(
+            job,
+            "characters",
+            concept_text,
+            generate,
+            reuse=reuse_sections,
+            # Placeholder characters of an undecodable output are not reused
+            cacheable=lambda characters: not is_fallback_characters(characters),
+            instructions=combined_character_instructions,
+            model=character_model,
+            number_of_characters=num_characters,
+            language=language,
+        )
+        job.set_data("characters", characters_data)
+        return characters_data
+
+    # 2. GENERATE PLOT STRUCTURE - with narrative arc
+    def plot_stage(characters):
+        if "plot_structure" in job.data or "novel_structure" in job.data:
+            return job.data.get("plot_structure")
+        job.set_stage("Creating plot structure...")
+
+        plot_structure = cached_plan(
+            job,
+            "plot",
+            concept_text,
+            lambda: generate_json_output(
+                job,
+                lambda: generate_plot_structure(
+                    prompt=concept_text,
+                    characters=json.dumps(characters),
+                    genre=genre,
+                    narrative_style=narrative_style,
+                    additional_instructions=combined_instructions,
+                    model=plot_model,
+                    groq_provider=groq_provider,
+                    narrative_arc=narrative_arc,
+                    language=language,
+                    cancel_token=cancel_token,
+                ),
+                "plot structure",
+                PlotStructure,
+            ),
+            reuse=reuse_sections,
+            instructions=combined_instructions,
+            # The plot names the characters, so it is only reused for the same ones
+            characters=json.dumps(characters, sort_keys=True, ensure_ascii=False),
+            model=plot_model,
+            genre=genre,
+            narrative_style=narrative_style,
+            narrative_arc=narrative_arc,
+            language=language,
+        )
+        job.set_data("plot_structure", plot_structure)
+        return plot_structure
+
+    def structure_args(characters, plot):
+        return (
+            job,
+            groq_provider,
+            concept_text,
+            json.dumps(characters),
+            plot,
+            genre,
+            narrative_style,
+            has_twist,
+            complexity,
+            combined_instructions,
+            narrative_arc,
+            language,
+            plot_model,
+        )
+
+    graph.add("characters", characters_stage)
+    graph.add("plot", plot_stage, requires=["characters"])
+    if not job.title:
+        graph.add("title", lambda: job.set_title(cached_plan(
+            job,
+            "book_title",
+            concept_text,
+            lambda: generate_book_title(concept_text, title_model, groq_provider),
+            reuse=reuse_sections,
+            model=title_model,
+        )))
+
+    structure_planned = "novel_structure" in job.data and job.data.get("structure_complete", True)
+    if stream_structure and not structure_planned:
+        graph.start()
+        try:
+            characters_data = graph.result("characters")
+            plot_structure = graph.result("plot")
+        except BaseException:
+            graph.close()
+            raise
+        return (
+            stream_structure_stage(*structure_args(characters_data, plot_structure), graph=graph),
+            new_writing_state(characters_data),
+        )
+
+    # 3. GENERATE NOVEL STRUCTURE - based on plot structure
+    if structure_planned:
+        graph.add("structure", lambda: job.data["novel_structure"])
+    else:
+        graph.add("structure", lambda characters, plot: generate_structure_stage(*structure_args(characters, plot)), requires=["characters", "plot"])
+    results = graph.run()
+    characters_data, novel_structure = results["characters"], results["structure"]
+
+    sections = list(iter_novel_sections(novel_structure))
+    if not job.structure:
+        job.set_data("sections", {section["title"]: section for section in sections})
+        job.set_structure(display_structure(novel_structure))
+
+    return sections, new_writing_state(characters_data)
+
+
+def generate_structure_stage(
+    job,
+    groq_provider,
+    concept_text,
+    characters_json,
+    plot_structure,
+    genre,
+    narrative_style,
+    has_twist,
+    complexity,
+    combined_instructions,
+    narrative_arc,
+    language,
+    plot_model,
+):
+    """Generate the chapter and scene structure of a novel from its plot"""
+    # 3. GENERATE NOVEL STRUCTURE - based on plot structure
+    job.set_stage("Creating detailed novel structure...")
+
+    agent_params = structure_agent_params(
+        concept_text, characters_json, plot_structure, genre, narrative_style, has_twist,
+        complexity, combined_instructions, narrative_arc, language, plot_model,
+    )
+    novel_structure = filter_structure(
+        generate_json_output(
+            job,
+            lambda: generate_novel_structure(**agent_params, groq_provider=groq_provider),
+            "novel structure",
+            NovelStructure,
+        )
+    )
+    job.set_data("novel_structure", novel_structure)
+    job.set_data("structure_complete", True)
+    return novel_structure
+
+
+def stream_structure_stage(
+    job,
+    groq_provider,
+    concept_text,
+    characters_json,
+    plot_structure,
+    genre,
+    narrative_style,
+    has_twist,
+    complexity,
+    combined_instructions,
+    narrative_arc,
+    language,
+    plot_model,
+    graph=None,
+):
+    """
+    Like generate_structure_stage, but the structure is streamed: yields the
+    section specs of each chapter as soon as it is complete, growing the
+    novel structure, section specs and displayed structure of the job as
+    chapters arrive. The stages of `graph` still running (the title) are
+    waited for once the structure is complete.
+    """
+    job.set_stage("Creating novel structure and writing sections...")
+    job.set_data("structure_complete", False)
+    content_stream = stream_novel_structure(
+        **structure_agent_params(
+            concept_text, characters_json, plot_structure, genre, narrative_style, has_twist,
+            complexity, combined_instructions, narrative_arc, language, plot_model,
+        ),
+        groq_provider=groq_provider,
+        cancel_token=job.cancel_token,
+    )
+
+    novel_structure, section_specs = {}, {}
+    try:
+        for title, content in stream_json_members(job, content_stream, "novel structure"):
+            chapter = filter_structure({title: content})
+            chapter_sections = list(iter_novel_sections(chapter))
+            if not chapter_sections:
+                continue
+            novel_structure.update(chapter)
+            section_specs.update({section["title"]: section for section in chapter_sections})
+            job.set_data("novel_structure", dict(novel_structure))
+            job.set_data("sections", dict(section_specs))
+            job.set_structure(display_structure(novel_structure))
+            yield from chapter_sections
+        if graph is not None:
+            for name in graph.tasks:
+                graph.result(name)
+    finally:
+        if graph is not None:
+            graph.close()
+
+    job.set_data("structure_complete", True)
+
+
+def structure_agent_params(
+    concept_text,
+    characters_json,
+    plot_structure,
+    genre,
+    narrative_style,
+    has_twist,
+    complexity,
+    combined_instructions,
+    narrative_arc,
+    language,
+    plot_model,
+):
+    """Arguments of the novel structure agent for the structure stages"""
+    # Extract themes from concept
+    themes = concept_text.split()[:5]  # Simple extraction of potential themes
+    themes_str = ", ".join(themes)
+
+    # Pass plot structure as part of instructions
+    structure_instructions = f"{combined_instructions}\nFollow this plot structure: {json.dumps(plot_structure)}"
+
+    return dict(
+        prompt=concept_text,
+        characters=characters_json,
+        genre=genre,
+        narrative_style=narrative_style,
+        themes=themes_str,
+        has_twist=has_twist,
+        complexity_level=complexity,
+        additional_instructions=structure_instructions,
+        narrative_arc=narrative_arc,
+        model=plot_model,
+        language=language,
+    )
+
+
+def new_writing_state(characters_data):
+    """
+    State carried from one novel section to the next. Plain JSON so it can
+    be persisted between stages.
+    """
+    return {
+        "characters": characters_data,
+        "character_goals": extract_character_goals(characters_data),
+        # Section, chapter and book summaries; "summary" is what prompts get
+        **new_summary_state(),
+        "continuity_text": "",
+        "completed_sections": "",
+        # Character arc updates pending and in flight
+        **new_arc_state(),
+    }
+
+
+def write_novel_section(
+    job,
+    groq_provider,
+    section,
+    state,
+    genre,
+    narrative_style,
+    tone,
+    additional_instructions="",
+    narrative_arc="auto",
+    language="English",
+    character_model=DEFAULT_MODEL,
+    section_model=DEFAULT_MODEL,
+    reuse_sections=True,
+    continue_from="",
+    update_arcs=True,
+    arc_update_interval=1,
+    arc_staleness=ARC_STALENESS,
+    summary_model=SUMMARY_MODEL,
+    summarizer=None,
+    arc_tracker=None,
+    target_words=0,
+):
+    """
+    Stream one novel section into `job` and return the writing state for
+    the next section (summary, continuity and character arcs).
+
+    With `reuse_sections`, a section written before from the same spec,
+    settings and story state so far is taken from the section store, with
+    the state that followed it. `continue_from` extends the given text
+    instead of starting over, and `update_arcs=False` skips the character
+    arc update. Arcs are updated once `arc_update_interval` sections that
+    mention characters are pending, for those characters only, in the
+    background: sections are written with arcs up to `arc_staleness`
+    sections old. Summaries and arcs are written by `summarizer` and
+    `arc_tracker`, which a run shares across its sections; without them,
+    the section makes its own and closes them when it is done. With
+    `target_words` for the whole novel, the section gets its share of what
+    is left of it, by depth and dramaturgy level.
+    """
+    cancel_token = job.cancel_token
+    title = section["title"]
+    # A summarizer or arc tracker made for this section only is closed with it
+    owned_summarizer = owned_arc_tracker = None
+    if summarizer is None:
+        summarizer = owned_summarizer = Summarizer(job, groq_provider, summary_model, language)
+    if arc_tracker is None:
+        arc_tracker = owned_arc_tracker = ArcTracker(job, groq_provider, character_model, narrative_arc, language)
+    try:
+        state = advance_summaries(state, section.get("chapter", title), job.contents, summarizer)
+        state = merge_arc_updates(job, state, arc_tracker)
+        store = get_section_store()
+        key = section_key(
+            "novel",
+            template="novel_section",
+            section=section,
+            state=state,
+            genre=genre,
+            narrative_style=narrative_style,
+            tone=tone,
+            instructions=additional_instructions,
+            narrative_arc=narrative_arc,
+            language=language,
+            character_model=character_model,
+            model=section_model,
+            arc_update_interval=arc_update_interval,
+            arc_staleness=arc_staleness,
+            # Only a target length changes the key, so stored sections stay valid
+            **({"target_words": target_words} if target_words else {}),
+        )
+        if reuse_sections and not continue_from and (record := store.get(key)):
+            if section["depth"] <= 1:
+                job.set_data("character_arcs", record["state"]["characters"])
+            job.complete_section(title, record["text"], state=record["state"], reused=True)
+            return record["state"]
+
+        state = dict(state)
+        words, max_tokens = section_length(job, novel_section_weights(job.data["novel_structure"]), target_words, title)
+        job.set_content(title, continue_from)
+        # Fit the variable parts of the prompt into the budget of the section writer
+        context = PromptContext(context_budget("novel_section", section_model))
+        context.add("instructions", additional_instructions, priority=5, min_tokens=300)
+        context.add("description", section["description"], priority=5, min_tokens=300)
+        context.add("continuity", state["continuity_text"], priority=4, min_tokens=100, shrink=keep_tail)
+        characters = relevant_characters(state["characters"], section, state["continuity_text"])
+        context.add("characters", json.dumps(characters, ensure_ascii=False), priority=3, min_tokens=300, shrink=compact_characters)
+        context.add("summary", state["summary"], priority=2, min_tokens=200, shrink=keep_tail)
+        context.add("plot_context", f"Parent section: {section['parent']}" if section["parent"] else "", priority=1)
+        # Hand-off brief of the chapter when chapters are written in parallel
+        context.add("chapter_brief", state.get("chapter_brief", ""), priority=4, min_tokens=100)
+        prompt_parts = context.fit()
+        record_context_usage(job, "novel_section", context.usage)
+        section_text = stream_into_job(
+            job,
+            title,
+            generate_novel_section(
+                title=title,
+                section_description=prompt_parts["description"],
+                plot_context="\n".join(part for part in (prompt_parts["chapter_brief"], prompt_parts["plot_context"]) if part),
+                characters=prompt_parts["characters"],
+                genre=genre,
+                tone=tone,
+                narrative_style=narrative_style,
+                previous_sections_summary=prompt_parts["summary"],
+                continuity_text=prompt_parts["continuity"],
+                dramaturgy_level=section["dramaturgy_level"],
+                setting_focus=section["setting_focus"],
+                character_focus=section["character_focus"],
+                additional_instructions=prompt_parts["instructions"],
+                model=section_model,
+                groq_provider=groq_provider,
+                language=language,
+                cancel_token=cancel_token,
+                continue_from=continue_from,
+                target_words=words,
+                max_tokens=max_tokens,
+            ),
+        )
+        section_text = continue_from + section_text
+
+        # Update summary with new section; its summary is written in the background
+        state = add_section_summary(state, title, section.get("chapter", title), section_text, summarizer)
+
+        state["continuity_text"] = last_sentences(section_text)
+        # Only the tail is used for arc tracking; bounded so checkpoints stay small
+        state["completed_sections"] = (state["completed_sections"] + f"\n\n{title}: {section_text}")[-COMPLETED_CONTEXT_CHARS:]
+
+        # Track the arcs of the characters a significant section mentions, in
+        # the background while the next sections are written
+        if update_arcs and section["depth"] <= 1:  # Only update for main chapters or key scenes
+            state = queue_arc_update(state, title, section["description"], section_text)
+            if len(state.get("pending_arc_sections", [])) >= arc_update_interval:
+                cancel_token.raise_if_cancelled()
+                state = submit_arc_updates(job, state, arc_tracker, arc_staleness)
+
+        cancel_token.raise_if_cancelled()
+        store.put(key, {"title": title, "text": section_text, "state": state})
+        job.complete_section(title, section_text, state=state)
+        return state
+    finally:
+        if owned_summarizer:
+            owned_summarizer.close()
+        if owned_arc_tracker:
+            owned_arc_tracker.close()
+
+
+def finish_novel_arcs(job, groq_provider, state, narrative_arc="auto", language="English", character_model=DEFAULT_MODEL):
+    """
+    Merge the character arc updates still pending or in flight after the
+    last section of a novel written section by section (as by the task
+    queue), and return the final state
+    """
+    arc_tracker = ArcTracker(job, groq_provider, character_model, narrative_arc, language)
+    try:
+        return flush_arc_updates(job, [state], arc_tracker)
+    finally:
+        arc_tracker.close()
+
+
+def run_novel_pipeline(
+    job,
+    groq_provider,
+    concept_text,
+    genre,
+    narrative_style,
+    tone,
+    num_characters=4,
+    has_romance=False,
+    has_twist=False,
+    complexity="Moderate",
+    pacing="Moderate",
+    additional_instructions="",
+    character_seeds="",
+    narrative_arc="auto",
+    language="English",
+    title_model=DEFAULT_MODEL,
+    character_model=DEFAULT_MODEL,
+    plot_model=DEFAULT_MODEL,
+    section_model=DEFAULT_MODEL,
+    summary_model=SUMMARY_MODEL,
+    arc_update_interval=1,
+    arc_staleness=ARC_STALENESS,
+    characters=None,
+    novel_structure=None,
+    book_title="",
+    reuse_sections=True,
+    stream_structure=True,
+    parallel_chapters=False,
+    chapter_workers=3,
+    smooth_seams=True,
+    seam_model=SEAM_MODEL,
+    target_words=0,
+):
+    """
+    Generate a whole novel into `job`. Characters, plot and the section
+    spec of every chapter are stored in `job.data`. Sections whose inputs
+    did not change since an earlier run are reused, and so are the
+    characters, plot and title of a similar earlier request (see
+    plan_cache). With `stream_structure`, the first chapters are written
+    while the structure of the later ones is still being generated. Earlier sections reach the
+    prompts as summaries written with `summary_model`, bounded in size.
+    Character arcs are updated every `arc_update_interval` sections that
+    mention characters, in the background while the next sections are
+    written, at most `arc_staleness` sections behind; what is left is
+    merged at the end.
+
+    With `parallel_chapters`, hand-off briefs of every chapter (how it
+    opens, how it ends, where everyone is) are planned in one call, and up
+    to `chapter_workers` chapters are then written at the same time, each
+    continuing from its brief rather than from the chapter before. With
+    `smooth_seams`, the opening of every chapter is then lightly rewritten
+    with `seam_model` to follow on from the ending of the one before.
+
+    With `target_words`, the length of the novel is shared among its
+    sections by depth and dramaturgy level, rebalanced as sections come in
+    longer or shorter; the structure is then planned in full first.
+    """
+    sections, state = plan_novel(
+        job,
+        groq_provider,
+        concept_text,
+        genre,
+        narrative_style,
+        num_characters=num_characters,
+        has_romance=has_romance,
+        has_twist=has_twist,
+        complexity=complexity,
+        additional_instructions=additional_instructions,
+        character_seeds=character_seeds,
+        narrative_arc=narrative_arc,
+        language=language,
+        title_model=title_model,
+        character_model=character_model,
+        plot_model=plot_model,
+        characters=characters,
+        novel_structure=novel_structure,
+        book_title=book_title,
+        reuse_sections=reuse_sections,
+        # The briefs and section budgets are planned from the whole structure
+        stream_structure=stream_structure and not parallel_chapters and not target_words,
+    )
+
+    if parallel_chapters:
+        sections = list(sections)
+        chapters = list(dict.fromkeys(section["chapter"] for section in sections))
+        briefs = plan_chapter_briefs(job, groq_provider, job.data.get("plot_structure"), genre, narrative_style, plot_model, language)
+    elif job.checkpoint is not None:
+        # Continue from the state saved with the last completed section
+        state = job.checkpoint
+
+    # 4. GENERATE SECTIONS with continuity and character arc tracking
+    job.set_stage("Writing sections...")
+    summarizer = Summarizer(job, groq_provider, summary_model, language)
+    arc_tracker = ArcTracker(job, groq_provider, character_model, narrative_arc, language)
+    write_section = partial(
+        write_novel_section,
+        job,
+        groq_provider,
+        genre=genre,
+        narrative_style=narrative_style,
+        tone=tone,
+        additional_instructions=additional_instructions,
+        narrative_arc=narrative_arc,
+        language=language,
+        character_model=character_model,
+        section_model=section_model,
+        reuse_sections=reuse_sections,
+        arc_update_interval=arc_update_interval,
+        arc_staleness=arc_staleness,
+        summarizer=summarizer,
+        arc_tracker=arc_tracker,
+        target_words=target_words,
+    )
+    graph = TaskGraph(job, max_workers=chapter_workers).start()
+    # Title of the latest section of each chain: the whole novel, or each
+    # chapter when chapters are written in parallel
+    previous = {}
+    try:
+        for section in sections:
+            title = section["title"]
+            chain = section["chapter"] if parallel_chapters else None
+            before, previous[chain] = previous.get(chain), title
+            # A title used twice has one text, written once
+            if title in job.completed_sections or title in graph.tasks:
+                continue
+            job.cancel_token.raise_if_cancelled()
+            graph.raise_if_failed()
+            # Each section continues from the state after the one before
+            if before in graph.tasks:
+                graph.add(title, partial(write_section, section=section), requires={"state": before})
+                continue
+            start_state = job.section_states.get(before)
+            if start_state is None:
+                start_state = chapter_start_state(state, chapters, chain, briefs) if parallel_chapters else state
+            graph.add(title, partial(write_section, section=section, state=start_state))
+        graph.wait()
+        # Merge the arc updates still pending or in flight after the last
+        # section of every chain, not only of the last chapter
+        final_states = [job.section_states[title] for title in previous.values() if title in job.section_states]
+        flush_arc_updates(job, final_states or [state], arc_tracker)
+
+        if parallel_chapters and smooth_seams:
+            smooth_chapter_seams(job, groq_provider, sections, graph, seam_model, language)
+    finally:
+        graph.close()
+        summarizer.close()
+        arc_tracker.close()
+
+    report_section_reuse(job)
+    report_plan_cache(job)
+    job.set_stage("Done")
+
+
+def rewrite_novel_section(job, groq_provider, section_title, mode="regenerate", instructions=""):
+    """
+    Regenerate (`mode="regenerate"`) or extend (`mode="continue"`) one
+    section of a finished novel from the story state it was first written
+    with. The summaries saved with the sections after it are patched in
+    place rather than recomputed; character arcs are only re-tracked when
+    it is the latest section.
+    """
+    if mode not in REWRITE_MODES:
+        raise ValueError(f"Unknown rewrite mode '{mode}'")
+    sections = list(iter_novel_sections(job.data["novel_structure"]))
+    titles = [section["title"] for section in sections]
+    if section_title not in titles:
+        raise ValueError(f"The novel has no section '{section_title}'")
+
+    index = titles.index(section_title)
+    if index == 0:
+        state = new_writing_state(job.data["characters"])
+    else:
+        state = job.section_states.get(titles[index - 1])
+        if state is None:
+            raise ValueError(f"'{titles[index - 1]}' has to be written before '{section_title}'")
+
+    params = dict(job.params)
+    params.pop("reuse_sections", None)
+    if instructions:
+        params["additional_instructions"] = f"{params.get('additional_instructions', '')}\n{instructions}".strip()
+
+    job.set_stage(f"Rewriting {section_title}...")
+    is_latest = job.completed_sections[-1:] == [section_title]
+    arc_tracker = ArcTracker(
+        job,
+        groq_provider,
+        params.get("character_model", DEFAULT_MODEL),
+        params.get("narrative_arc", "auto"),
+        params.get("language", "English"),
+    )
+    try:
+        new_state = write_novel_section(
+            job,
+            groq_provider,
+            sections[index],
+            state,
+            **select_params(write_novel_section, params),
+            reuse_sections=False,
+            continue_from=job.contents.get(section_title, "") if mode == "continue" else "",
+            update_arcs=is_latest,
+            arc_tracker=arc_tracker,
+        )
+        if is_latest:
+            flush_arc_updates(job, [new_state], arc_tracker)
+    finally:
+        arc_tracker.close()
+
+    # Later sections keep their text; only the summary entry of this one changes
+    summarizer = Summarizer(job, groq_provider, params.get("summary_model", SUMMARY_MODEL), params.get("language", "English"))
+    summary = summarizer.summarize(job.contents[section_title], SECTION_SUMMARY_WORDS)
+    summarizer.close()
+    for later_title in titles[index + 1:]:
+        later_state = job.section_states.get(later_title)
+        if later_state is not None:
+            job.update_section_state(later_title, replace_section_summary(later_state, section_title, summary))
+
+    job.set_stage("Done")
+    return new_state
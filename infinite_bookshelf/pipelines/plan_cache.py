@@ -0,0 +1,197 @@
+"""
+Cache of planning results (structures, titles, characters, plots) reused for similar requests across sessions
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+
+from ..tools.similarity import minhash, similarity
+from .section_store import section_key
+
+# Similarity from which the plan of an earlier request is reused
+PLAN_CACHE_THRESHOLD = 0.8
+# Plans kept; the least recently used are evicted beyond it
+PLAN_CACHE_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plans (
+    key TEXT NOT NULL,
+    text TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    used REAL NOT NULL,
+    PRIMARY KEY (key, text)
+);
+
+CREATE TABLE IF NOT EXISTS stats (
+    agent TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS plans_used ON plans (used);
+"""
+
+_record_lock = threading.Lock()
+
+
+class PlanCache:
+    """
+    Plans of earlier requests in a SQLite file shared by every session and
+    worker, with the MinHash signature of the text they were planned from
+    (the topic or concept). A request reuses a plan of the same agent with
+    exactly the same parameters (instructions, model, language, counts,
+    ...) whose text is at least `threshold` similar to its own, so
+    "Basics of LLMs" and "LLM basics" share a structure. Beyond
+    `max_entries`, the least recently used plans are evicted. Hits and
+    misses are counted by agent, across sessions.
+    """
+
+    def __init__(self, path, threshold=PLAN_CACHE_THRESHOLD, max_entries=PLAN_CACHE_SIZE):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection().executescript(SCHEMA)
+
+    def connection(self):
+        """One connection per thread; SQLite connections are not thread safe"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def lookup(self, agent, text, params):
+        """
+        The (plan, similarity) of the most similar earlier request to
+        `agent` with the same `params`, or (None, best similarity) below
+        the threshold. Counts a hit or a miss.
+        """
+        key = section_key(f"plan_{agent}", template=agent, **params)
+        signature = minhash(text)
+        connection = self.connection()
+        best, best_similarity = None, 0.0
+        for rowid, entry_text, entry_signature, plan in connection.execute(
+            "SELECT rowid, text, signature, plan FROM plans WHERE key = ?", (key,)
+        ):
+            entry_similarity = 1.0 if entry_text == text else similarity(signature, json.loads(entry_signature))
+            if entry_similarity > best_similarity:
+                best, best_similarity = (rowid, plan), entry_similarity
+        hit = best is not None and best_similarity >= self.threshold
+        with connection:
+            if hit:
+                connection.execute("UPDATE plans SET used = ? WHERE rowid = ?", (time.time(), best[0]))
+            connection.execute(
+                "INSERT INTO stats (agent, hits, misses) VALUES (?, ?, ?) ON CONFLICT (agent) DO UPDATE"
+                " SET hits = hits + excluded.hits, misses = misses + excluded.misses",
+                (agent, int(hit), int(not hit)),
+            )
+        return (json.loads(best[1]) if hit else None), best_similarity
+
+    def put(self, agent, text, params, plan):
+        """Store the plan of a request, evicting the least recently used plans beyond the size"""
+        key = section_key(f"plan_{agent}", template=agent, **params)
+        connection = self.connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO plans (key, text, agent, signature, plan, used) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, text, agent, json.dumps(minhash(text)), json.dumps(plan, ensure_ascii=False), time.time()),
+            )
+            connection.execute(
+                "DELETE FROM plans WHERE rowid NOT IN (SELECT rowid FROM plans ORDER BY used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def hit_rates(self):
+        """Hits, misses and hit rate of every agent since the cache was created"""
+        return {
+            agent: {"hits": hits, "misses": misses, "hit_rate": hits / ((hits + misses) or 1)}
+            for agent, hits, misses in self.connection().execute("SELECT agent, hits, misses FROM stats ORDER BY agent")
+        }
+
+
+@lru_cache(maxsize=None)
+def _plan_cache(path, threshold, max_entries):
+    return PlanCache(path, threshold, max_entries)
+
+
+def get_plan_cache():
+    """
+    The cache in BOOKSHELF_PLAN_CACHE (by default .bookshelf/plans.db),
+    with the similarity threshold in BOOKSHELF_PLAN_CACHE_THRESHOLD and the
+    size in BOOKSHELF_PLAN_CACHE_SIZE. None if the size is 0.
+    """
+    max_entries = int(os.getenv("BOOKSHELF_PLAN_CACHE_SIZE", PLAN_CACHE_SIZE))
+    if max_entries <= 0:
+        return None
+    return _plan_cache(
+        os.getenv("BOOKSHELF_PLAN_CACHE", os.path.join(".bookshelf", "plans.db")),
+        float(os.getenv("BOOKSHELF_PLAN_CACHE_THRESHOLD", PLAN_CACHE_THRESHOLD)),
+        max_entries,
+    )
+
+
+def lookup_plan(job, agent, text, reuse=True, **params):
+    """
+    The plan of an earlier request to `agent` with the same `params` and a
+    similar `text` (see PlanCache), or None. The similarity found is recorded in the job's "plan_cache" data.
+    """
+    cache = get_plan_cache()
+    if not reuse or cache is None:
+        return None
+    plan, plan_similarity = cache.lookup(agent, text, params)
+    # Planning agents run in parallel, so the record is updated under a lock
+    with _record_lock:
+        record = dict(job.data.get("plan_cache", {}))
+        record[agent] = {"reused": plan is not None, "similarity": round(plan_similarity, 3)}
+        job.set_data("plan_cache", record)
+    return plan
+
+
+def store_plan(agent, text, plan, **params):
+    """Keep the plan generated for a request for similar later ones"""
+    cache = get_plan_cache()
+    if cache is not None:
+        cache.put(agent, text, params, plan)
+
+
+def cached_plan(job, agent, text, generate, reuse=True, cacheable=None, **params):
+    """
+    The plan of an earlier request to `agent` with the same `params` and a
+    similar `text`, or else the plan `generate()` returns, stored for later
+    requests. `text` is only the topic or concept: instructions go in
+    `params`, since their boilerplate would make unrelated topics look
+    alike. With `reuse` false, the plan is always generated. With
+    `cacheable`, a generated plan is only stored if `cacheable(plan)`, so
+    fallbacks for output that could not be decoded are not reused.
+    """
+    plan = lookup_plan(job, agent, text, reuse, **params)
+    if plan is None:
+        plan = generate()
+        if cacheable is None or cacheable(plan):
+            store_plan(agent, text, plan, **params)
+    return plan
+
+
+def report_plan_cache(job):
+    """Tell the user which plans were reused and how often the cache is hit"""
+    record = job.data.get("plan_cache", {})
+    reused = [agent.replace("_", " ") for agent, lookup in record.items() if lookup["reused"]]
+    cache = get_plan_cache()
+    if reused and cache is not None:
+        rates = cache.hit_rates()
+        hits = sum(rate["hits"] for rate in rates.values())
+        lookups = hits + sum(rate["misses"] for rate in rates.values())
+        described = " and ".join([", ".join(reused[:-1]), reused[-1]] if len(reused) > 1 else reused)
+        job.notice(
+            f"Reused the {described} of a similar earlier request "
+            f"(plan cache: {hits} of {lookups} lookups hit so far)."
+        )
@@ -0,0 +1,66 @@
+"""
+Content-addressed store of generated sections, keyed on the inputs that produce them
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+
+from ..agents.prompts import PROMPTS
+
+# Bump when generation settings change so stored sections are not reused;
+# prompt changes bump the version of their template instead (see agents.prompts)
+SECTION_STORE_VERSION = 7
+
+
+def section_key(kind, template=None, **inputs):
+    """
+    Stable hash of everything that affects a section's text: its title and
+    description, the instructions, model and generation parameters, the
+    version of the prompt `template` it is written with, and for novels the
+    story state it continues from.
+    """
+    if template is not None:
+        inputs["prompt_version"] = PROMPTS[template].version
+    canonical = json.dumps(
+        {"kind": kind, "version": SECTION_STORE_VERSION, **inputs},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SectionStore:
+    """
+    Sections on disk, one JSON file per key. A rerun with an edited outline
+    or instructions only regenerates sections whose key changed; writes are
+    atomic so concurrent runs and workers can share a store.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        try:
+            with open(self.path(key), encoding="utf-8") as record_file:
+                return json.load(record_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, key, record):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(handle, "w", encoding="utf-8") as record_file:
+            json.dump(record, record_file, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+
+def get_section_store():
+    """The store in BOOKSHELF_SECTION_STORE, by default .bookshelf/sections"""
+    return SectionStore(os.getenv("BOOKSHELF_SECTION_STORE", os.path.join(".bookshelf", "sections")))
@@ -0,0 +1,90 @@
+"""
+Passages of the user's seed content retrieved for each prompt, rather than the whole seed
+"""
+
+import threading
+import time
+from functools import lru_cache
+
+from ..tools.ingest import file_sha256, iter_file_text
+from ..tools.retrieval import BM25Index, iter_passages, split_passages
+from .section_store import get_section_store, section_key
+
+# Seed passages given to the structure prompt and to each section prompt
+SEED_STRUCTURE_PASSAGES = 12
+SEED_SECTION_PASSAGES = 4
+SEED_PASSAGE_WORDS = 150
+
+_retrieval_lock = threading.Lock()
+
+
+def seed_passages(seed_content):
+    """The passages of a seed given as text, or as passages already (see load_seed_file)"""
+    if isinstance(seed_content, str):
+        return split_passages(seed_content, SEED_PASSAGE_WORDS) if seed_content else []
+    return list(seed_content)
+
+
+@lru_cache(maxsize=4)
+def seed_index(seed_content):
+    """The BM25 index of a seed (text or tuple of passages), built once per seed"""
+    return BM25Index(seed_passages(seed_content))
+
+
+def load_seed_file(file, name):
+    """
+    The passages of an uploaded seed file (text, markdown, PDF or HTML),
+    read and split as a stream. The passages are cached in the section
+    store by the hash of the file, so a file uploaded again is not parsed
+    again.
+    """
+    store = get_section_store()
+    key = section_key("seed_file", sha256=file_sha256(file), passage_words=SEED_PASSAGE_WORDS)
+    if record := store.get(key):
+        return record["passages"]
+    passages = list(iter_passages(iter_file_text(file, name), SEED_PASSAGE_WORDS))
+    store.put(key, {"title": name, "passages": passages})
+    return passages
+
+
+def retrieve_seed(job, seed_content, query, k=SEED_SECTION_PASSAGES):
+    """
+    The `k` passages of the seed (text or passages) most relevant to
+    `query`, in the order of the seed, or its first passages if none
+    shares a word with it. Index size and build and query times are
+    recorded in the job's "seed_retrieval" data.
+    """
+    if not seed_content:
+        return []
+    index = seed_index(seed_content if isinstance(seed_content, str) else tuple(seed_content))
+    start = time.perf_counter()
+    passages = index.search(query, k) or index.passages[:k]
+    query_time = time.perf_counter() - start
+    # Sections are written in parallel, so the totals are updated under a lock
+    with _retrieval_lock:
+        retrieval = job.data.get("seed_retrieval", {"queries": 0, "query_time": 0.0})
+        job.set_data("seed_retrieval", {
+            "passages": len(index.passages),
+            "build_time": index.build_time,
+            "queries": retrieval["queries"] + 1,
+            "query_time": retrieval["query_time"] + query_time,
+        })
+    return passages
+
+
+def seed_prompt(passages):
+    """Instructions giving the retrieved passages of the seed to a prompt"""
+    if not passages:
+        return ""
+    seed = "\n\n".join(passages)
+    return f"The user has provided seed content for context. Develop the structure and content around the provided seed: <seed>{seed}</seed>"
+
+
+def report_seed_retrieval(job):
+    """Tell the user how large the seed index is and how long retrieval took"""
+    retrieval = job.data.get("seed_retrieval")
+    if retrieval:
+        job.notice(
+            f"Seed content: {retrieval['passages']} passages indexed in {retrieval['build_time'] * 1000:.0f} ms, "
+            f"{retrieval['queries']} retrievals in {retrieval['query_time'] * 1000:.0f} ms."
+        )
@@ -0,0 +1,228 @@
+"""
+Hierarchical rolling summaries that keep novel prompts under a fixed token budget
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ..agents.summary_writer import generate_summary
+from ..inference import GenerationCancelled, estimate_tokens
+from .section_store import get_section_store, section_key
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MODEL = "llama-3.1-8b-instant"
+
+SECTION_SUMMARY_WORDS = 80
+CHAPTER_SUMMARY_WORDS = 150
+BOOK_SUMMARY_WORDS = 300
+
+# Tokens of story summary given to every section prompt, however long the novel
+SUMMARY_TOKEN_BUDGET = 1000
+# Once chapter summaries take more than this share of the budget, the
+# oldest are folded into the summary of the whole book
+CHAPTER_SUMMARIES_SHARE = 0.5
+
+
+def summary_entry(title, section_text):
+    """Excerpt standing in for the summary of a section until it is written"""
+    return f"{title}: {section_text[:300]}..."
+
+
+class Summarizer:
+    """
+    Writes summaries with a small model on background threads, so they are
+    ready by the time a later section needs them. Summaries are cached in
+    the section store by the text they summarize; the same text submitted
+    twice, or summarized in an earlier run, is not sent again.
+    """
+
+    def __init__(self, job, groq_provider, model=SUMMARY_MODEL, language="English", workers=2):
+        self.job = job
+        self.groq_provider = groq_provider
+        self.model = model
+        self.language = language
+        self.store = get_section_store()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{job.id}-summaries")
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def submit(self, text, words):
+        """Start summarizing `text` in the background; returns a future"""
+        key = section_key("summary", template="summary", text=text, words=words, model=self.model, language=self.language)
+        with self.lock:
+            future = self.futures.get(key)
+            if future is None:
+                future = self.futures[key] = self.executor.submit(self._summarize, key, text, words)
+        return future
+
+    def summarize(self, text, words):
+        """
+        The summary of `text`, waiting for it if needed. If the summary
+        cannot be written, the start of the text is used instead.
+        """
+        try:
+            return self.submit(text, words).result()
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"Summary failed, using an excerpt instead: {e}")
+            return text[:words * 6]
+
+    def _summarize(self, key, text, words):
+        if record := self.store.get(key):
+            return record["text"]
+        self.job.cancel_token.raise_if_cancelled()
+        statistics, summary = generate_summary(text, words, self.model, self.groq_provider, self.language)
+        self.job.add_statistics(statistics)
+        self.store.put(key, {"title": "summary", "text": summary})
+        return summary
+
+    def close(self):
+        # Summaries already submitted still finish, so they are cached
+        self.executor.shutdown(wait=False)
+
+
+def new_summary_state():
+    """Summary fields of the novel writing state"""
+    return {
+        # {"title", "chapter", "summary", "final"} per section not yet folded into its chapter
+        "section_summaries": [],
+        # [chapter, summary] per chapter not yet folded into the book summary
+        "chapter_summaries": [],
+        "book_summary": "",
+        # Folds submitted at the previous section, applied at the next one
+        "pending_chapter_folds": [],
+        "pending_book_fold": [],
+        # What the section prompts get
+        "summary": "",
+    }
+
+
+def _as_entry(entry):
+    if isinstance(entry, list):
+        # [title, summary] pairs of states saved before chapters were tracked
+        title, summary = entry
+        return {"title": title, "chapter": title, "summary": summary, "final": True}
+    return dict(entry)
+
+
+def _chapter_text(entries):
+    return "\n".join(entry["summary"] for entry in entries)
+
+
+def _book_text(book_summary, chapter_summaries):
+    earlier = [f"Earlier: {book_summary}"] if book_summary else []
+    return "\n".join(earlier + [f"{chapter}: {summary}" for chapter, summary in chapter_summaries])
+
+
+def compose_summary(state, budget=SUMMARY_TOKEN_BUDGET):
+    """
+    The summary given to the next section: the book summary, then chapter
+    summaries, then the sections of the current chapters. The oldest
+    chapter and section summaries are left out when over the budget.
+    """
+    book = [f"Story so far: {state['book_summary']}"] if state["book_summary"] else []
+    parts = [f"{chapter}: {summary}" for chapter, summary in state["chapter_summaries"]]
+    parts += [entry["summary"] for entry in state["section_summaries"]]
+    while parts and sum(estimate_tokens(part) for part in book + parts) > budget:
+        parts.pop(0)
+    text = "\n\n".join(book + parts)
+    return text[-budget * 4:]
+
+
+def add_section_summary(state, title, chapter, section_text, summarizer):
+    """
+    Returns the state with a written section added. Until its summary is
+    ready, an excerpt of the section stands in for it.
+    """
+    summarizer.submit(section_text, SECTION_SUMMARY_WORDS)
+    entries = [_as_entry(entry) for entry in state.get("section_summaries", [])]
+    entries.append({"title": title, "chapter": chapter, "summary": summary_entry(title, section_text), "final": False})
+    new_state = {**new_summary_state(), **state, "section_summaries": entries}
+    new_state["summary"] = compose_summary(new_state)
+    return new_state
+
+
+def advance_summaries(state, chapter, contents, summarizer):
+    """
+    Update the summaries before writing a section of `chapter`.
+
+    Summaries lag one step behind, so they are written while the previous
+    section streams: the summary of a section is used from the section
+    after next on, and a finished chapter or the oldest chapters are folded
+    one section after the fold was submitted. What is waited for only
+    depends on the state, so the same inputs give the same prompts and
+    sections can be reused from the section store.
+    """
+    state = {**new_summary_state(), **state}
+    entries = [_as_entry(entry) for entry in state["section_summaries"]]
+    chapter_summaries = [list(item) for item in state["chapter_summaries"]]
+    book_summary = state["book_summary"]
+
+    # Apply the folds submitted before the previous section
+    if state["pending_book_fold"]:
+        folded = [item for item in chapter_summaries if item[0] in state["pending_book_fold"]]
+        book_summary = summarizer.summarize(_book_text(book_summary, folded), BOOK_SUMMARY_WORDS)
+        chapter_summaries = [item for item in chapter_summaries if item[0] not in state["pending_book_fold"]]
+    for folded_chapter in state["pending_chapter_folds"]:
+        chapter_entries = [entry for entry in entries if entry["chapter"] == folded_chapter]
+        chapter_summary = summarizer.summarize(_chapter_text(chapter_entries), CHAPTER_SUMMARY_WORDS)
+        chapter_summaries.append([folded_chapter, chapter_summary])
+        entries = [entry for entry in entries if entry["chapter"] != folded_chapter]
+
+    # Every section but the latest has had a whole section's time to be summarized
+    for entry in entries[:-1]:
+        if not entry["final"] and entry["title"] in contents:
+            summary = summarizer.summarize(contents[entry["title"]], SECTION_SUMMARY_WORDS)
+            entry["summary"] = f"{entry['title']}: {summary}"
+            entry["final"] = True
+
+    # Submit folds of finished chapters whose sections are all summarized
+    latest_chapter = entries[-1]["chapter"] if entries else None
+    pending_chapter_folds = []
+    for entry_chapter in dict.fromkeys(entry["chapter"] for entry in entries):
+        chapter_entries = [entry for entry in entries if entry["chapter"] == entry_chapter]
+        if entry_chapter not in (chapter, latest_chapter) and all(entry["final"] for entry in chapter_entries):
+            summarizer.submit(_chapter_text(chapter_entries), CHAPTER_SUMMARY_WORDS)
+            pending_chapter_folds.append(entry_chapter)
+
+    # Fold the oldest chapters into the book summary when they outgrow their share
+    pending_book_fold = []
+    chapter_tokens = sum(estimate_tokens(summary) for _, summary in chapter_summaries)
+    for chapter_title, summary in chapter_summaries:
+        if chapter_tokens <= SUMMARY_TOKEN_BUDGET * CHAPTER_SUMMARIES_SHARE:
+            break
+        pending_book_fold.append(chapter_title)
+        chapter_tokens -= estimate_tokens(summary)
+    if pending_book_fold:
+        folded = [item for item in chapter_summaries if item[0] in pending_book_fold]
+        summarizer.submit(_book_text(book_summary, folded), BOOK_SUMMARY_WORDS)
+
+    new_state = {
+        **state,
+        "section_summaries": entries,
+        "chapter_summaries": chapter_summaries,
+        "book_summary": book_summary,
+        "pending_chapter_folds": pending_chapter_folds,
+        "pending_book_fold": pending_book_fold,
+    }
+    new_state["summary"] = compose_summary(new_state)
+    return new_state
+
+
+def replace_section_summary(state, title, summary):
+    """
+    Returns the state with the summary of one section replaced, e.g. after
+    it was rewritten. A section already folded into its chapter summary is
+    left as is.
+    """
+    entries = [_as_entry(entry) for entry in state.get("section_summaries", [])]
+    for entry in entries:
+        if entry["title"] == title:
+            entry["summary"] = f"{title}: {summary}"
+            entry["final"] = True
+    new_state = {**new_summary_state(), **state, "section_summaries": entries}
+    new_state["summary"] = compose_summary(new_state)
+    return new_state
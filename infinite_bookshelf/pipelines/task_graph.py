@@ -0,0 +1,171 @@
+"""
+Task graph engine running agent calls concurrently in dependency order
+"""
+
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class TaskGraph:
+    """
+    Agent calls of a pipeline as tasks with their inputs declared
+    explicitly. A task starts as soon as the tasks it requires have
+    finished, with at most `max_workers` running at once; ready tasks start
+    in the order they were added, so sections are written (and stream into
+    the job) in reading order. Tasks can be added while the graph runs,
+    e.g. as a streamed structure arrives.
+
+        graph = TaskGraph(job)
+        graph.add("characters", make_characters)
+        graph.add("plot", make_plot, requires=["characters"])
+        graph.add("title", make_title)
+        results = graph.run()
+
+    A task is called with the results of the tasks it requires as keyword
+    arguments: named after them, or after the keys of a `requires` dict
+    ({argument: task}). If a task fails, the tasks depending on it fail
+    with the same error, which `result` and `wait` raise.
+    """
+
+    def __init__(self, job, max_workers=4):
+        self.job = job
+        self.max_workers = max_workers
+        self.tasks = {}
+        self.futures = {}
+        self.waiting = []
+        self.running = 0
+        self.executor = None
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def add(self, name, function, requires=()):
+        requires = dict(requires) if isinstance(requires, dict) else {dependency: dependency for dependency in requires}
+        with self.lock:
+            if name in self.tasks:
+                raise ValueError(f"Task '{name}' is already defined")
+            if self.executor is not None:
+                self._check_requires(name, requires)
+            self.tasks[name] = (function, requires)
+            self.futures[name] = Future()
+            self.waiting.append(name)
+        if self.executor is not None:
+            self._dispatch()
+        return self
+
+    def start(self):
+        """Start the tasks in the background; see `result` and `wait`"""
+        with self.lock:
+            for name, (_, requires) in self.tasks.items():
+                self._check_requires(name, requires)
+            self._check_acyclic()
+            self.executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{self.job.id}-tasks")
+        self._dispatch()
+        return self
+
+    def result(self, name, timeout=None):
+        """The result of a task, waiting for it if needed"""
+        return self.futures[name].result(timeout)
+
+    def raise_if_failed(self):
+        """Raise the error of the first failed task, if any has failed yet"""
+        for future in list(self.futures.values()):
+            if future.done() and future.exception() is not None:
+                raise future.exception()
+
+    def wait(self):
+        """
+        Wait for every task, including those added while waiting, and
+        return their results by name. Raises the error of the first
+        failed task in the order they were added.
+        """
+        waited = 0
+        while True:
+            with self.lock:
+                names = list(self.tasks)
+            if waited == len(names):
+                return {name: self.futures[name].result() for name in names}
+            for name in names[waited:]:
+                self.futures[name].result()
+            waited = len(names)
+
+    def run(self):
+        """Run all tasks and return their results by name"""
+        self.start()
+        try:
+            return self.wait()
+        finally:
+            self.close()
+
+    def close(self):
+        # Tasks already running finish; the others do not start
+        with self.lock:
+            self.closed = True
+            waiting, self.waiting = self.waiting, []
+        for name in waiting:
+            self.futures[name].set_exception(RuntimeError(f"Task '{name}' did not run, the task graph was closed"))
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+    def _check_requires(self, name, requires):
+        for dependency in requires.values():
+            if dependency not in self.tasks:
+                raise ValueError(f"Task '{name}' requires unknown task '{dependency}'")
+
+    def _check_acyclic(self):
+        ordered = set()
+        while len(ordered) < len(self.tasks):
+            ready = {
+                name for name, (_, requires) in self.tasks.items()
+                if name not in ordered and ordered.issuperset(requires.values())
+            }
+            if not ready:
+                raise ValueError(f"The tasks {sorted(set(self.tasks) - ordered)} depend on each other")
+            ordered |= ready
+
+    def _dispatch(self):
+        """Start the ready tasks in the order they were added, up to max_workers"""
+        failed, started = [], []
+        with self.lock:
+            for name in list(self.waiting):
+                if self.closed or self.running >= self.max_workers:
+                    break
+                function, requires = self.tasks[name]
+                dependencies = [self.futures[dependency] for dependency in requires.values()]
+                if not all(dependency.done() for dependency in dependencies):
+                    continue
+                self.waiting.remove(name)
+                error = next((dependency.exception() for dependency in dependencies if dependency.exception()), None)
+                if error is not None:
+                    failed.append((name, error))
+                    continue
+                self.running += 1
+                inputs = {argument: self.futures[dependency].result() for argument, dependency in requires.items()}
+                started.append((name, function, inputs))
+
+        for name, error in failed:
+            self.futures[name].set_exception(error)
+        for name, function, inputs in started:
+            try:
+                self.executor.submit(self._run, name, function, inputs)
+            except RuntimeError as e:
+                # The graph was closed in the meantime
+                with self.lock:
+                    self.running -= 1
+                self.futures[name].set_exception(e)
+        if failed:
+            # Tasks depending on the failed ones fail as well
+            self._dispatch()
+
+    def _run(self, name, function, inputs):
+        try:
+            self.job.cancel_token.raise_if_cancelled()
+            result, error = function(**inputs), None
+        except BaseException as e:
+            result, error = None, e
+        with self.lock:
+            self.running -= 1
+        if error is None:
+            self.futures[name].set_result(result)
+        else:
+            self.futures[name].set_exception(error)
+        self._dispatch()
@@ -0,0 +1,4 @@
+from .store import TaskQueue, PENDING, CLAIMED, DONE
+from .job import QueuedJob, get_queued_job
+from .stages import STAGES
+from .worker import work, run_pool
@@ -0,0 +1,32 @@
+"""
+Run a pool of queue workers:
+
+    BOOKSHELF_QUEUE_DB=bookshelf.db python -m infinite_bookshelf.taskqueue --workers 4
+"""
+
+import argparse
+import os
+
+from .store import TaskQueue
+from .worker import run_pool
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m infinite_bookshelf.taskqueue",
+        description="Run worker processes for queued book and novel generation jobs.",
+    )
+    parser.add_argument("--db", default=os.getenv("BOOKSHELF_QUEUE_DB"), help="Queue database (default: $BOOKSHELF_QUEUE_DB)")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--tpm", type=int, default=None, help="Tokens per minute budget split across the workers (default: 6000)")
+    args = parser.parse_args(argv)
+    if not args.db:
+        parser.error("provide --db or set BOOKSHELF_QUEUE_DB")
+
+    # Create the schema once before the workers race for it
+    TaskQueue(args.db)
+    run_pool(args.db, workers=max(1, args.workers), tokens_per_minute=args.tpm)
+
+
+if __name__ == "__main__":
+    main()
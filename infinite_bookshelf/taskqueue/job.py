@@ -0,0 +1,76 @@
+"""
+Read-only view of a queued job, rebuilt from the events stored in the queue
+"""
+
+import json
+import time
+
+from ..jobs import Job
+
+
+class QueuedJob(Job):
+    """
+    A Job whose state comes from the task queue instead of a thread in this
+    process, so pages can render it with the same components. `refresh()`
+    replays events stored since the last call; cancelling asks the workers
+    to stop through the queue.
+    """
+
+    def __init__(self, queue, row, poll_interval=0.25, touch_interval=5):
+        super().__init__(
+            row["kind"],
+            params=json.loads(row["params"]),
+            job_id=row["id"],
+            abandon_timeout=row["abandon_timeout"],
+        )
+        self.queue = queue
+        self.poll_interval = poll_interval
+        self.touch_interval = touch_interval
+        self.created_at = row["created_at"]
+        self._last_event_id = 0
+        self._last_touch = 0
+        self.refresh()
+
+    def refresh(self):
+        stored = self.queue.events_since(self.id, self._last_event_id)
+        if stored:
+            self._last_event_id = stored[-1][0]
+            self.replay(event for _, event in stored)
+
+    def touch(self):
+        super().touch()
+        # Throttled: it is a write to the shared database
+        if self.last_polled - self._last_touch > self.touch_interval:
+            self.queue.touch(self.id)
+            self._last_touch = self.last_polled
+
+    def cancel(self):
+        self.queue.request_cancel(self.id)
+        self.refresh()
+
+    def wait_for_events(self, offset, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            self.refresh()
+            if len(self.events) > offset or self.is_finished:
+                break
+            if deadline is not None and time.time() >= deadline:
+                break
+            time.sleep(self.poll_interval)
+        return self.events_since(offset)
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            self.refresh()
+            if self.is_finished:
+                return True
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+
+def get_queued_job(queue, job_id):
+    """Returns the QueuedJob with this id, or None if the queue does not know it"""
+    row = queue.get_job_row(job_id) if job_id else None
+    return QueuedJob(queue, row) if row else None
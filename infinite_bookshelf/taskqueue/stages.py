@@ -0,0 +1,104 @@
+"""
+Per-stage task handlers for the queued book and novel pipelines
+"""
+
+from ..pipelines.book import (
+    plan_book,
+    iter_book_sections,
+    write_book_section,
+    build_book_prompts,
+    rewrite_book_section,
+)
+from ..pipelines.novel import finish_novel_arcs, plan_novel, write_novel_section, rewrite_novel_section
+from ..pipelines.common import select_params
+
+
+# Every handler is called as handler(job, groq_provider, params, payload, previous)
+# where `previous` is the result of the task this one depends on. It returns
+# (result, new_tasks) with new_tasks as (stage, payload, chained) tuples.
+# `job` holds the state of the whole job replayed from the stored events.
+
+
+def plan_book_stage(job, groq_provider, params, payload, previous):
+    structure = plan_book(job, groq_provider, **select_params(plan_book, params))
+    job.set_stage("Generating sections...")
+    # Book sections only depend on the structure, so they run in parallel
+    new_tasks = [
+        ("section", {"title": title, "description": description}, False)
+        for title, description in iter_book_sections(structure)
+    ]
+    return {"sections": len(new_tasks)}, new_tasks
+
+
+def book_section_stage(job, groq_provider, params, payload, previous):
+    _, section_instructions = build_book_prompts(
+        params.get("additional_instructions", ""),
+        params.get("advanced", False),
+        params.get("writing_style", ""),
+        params.get("complexity_level", ""),
+    )
+    write_book_section(
+        job,
+        groq_provider,
+        payload["title"],
+        payload["description"],
+        section_instructions=section_instructions,
+        **select_params(write_book_section, params),
+    )
+    return None, []
+
+
+def plan_novel_stage(job, groq_provider, params, payload, previous):
+    if params.get("parallel_chapters"):
+        # Chained tasks depend on one task each, so chapters cannot fan out and join for the seams
+        job.notice("Chapters are not written in parallel on the task queue; the novel is written section by section.")
+    sections, state = plan_novel(job, groq_provider, **select_params(plan_novel, params))
+    job.set_stage("Writing sections...")
+    # Each section continues from the summary and arcs of the one before,
+    # so they are chained and the writing state travels in task results
+    new_tasks = [("section", {"section": section}, True) for section in sections]
+    # The arc updates left after the last section are merged at the end
+    new_tasks.append(("arcs", {}, True))
+    return state, new_tasks
+
+
+def novel_section_stage(job, groq_provider, params, payload, previous):
+    state = write_novel_section(
+        job,
+        groq_provider,
+        payload["section"],
+        previous,
+        **select_params(write_novel_section, params),
+    )
+    return state, []
+
+
+def novel_arcs_stage(job, groq_provider, params, payload, previous):
+    state = finish_novel_arcs(job, groq_provider, previous, **select_params(finish_novel_arcs, params))
+    return state, []
+
+
+def rewrite_section_stage(rewrite):
+    """Handler running a single section rewrite requested on a finished job"""
+
+    def handler(job, groq_provider, params, payload, previous):
+        rewrite(job, groq_provider, **payload)
+        return None, []
+
+    return handler
+
+
+# Stage handlers by pipeline name (as stored in the queue) and stage
+STAGES = {
+    "run_book_pipeline": {
+        "plan": plan_book_stage,
+        "section": book_section_stage,
+        "rewrite": rewrite_section_stage(rewrite_book_section),
+    },
+    "run_novel_pipeline": {
+        "plan": plan_novel_stage,
+        "section": novel_section_stage,
+        "arcs": novel_arcs_stage,
+        "rewrite": rewrite_section_stage(rewrite_novel_section),
+    },
+}
@@ -0,0 +1,419 @@
+"""
+SQLite-backed queue of generation jobs split into per-stage tasks
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from ..jobs import QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED
+
+# Task statuses
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    pipeline TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    abandon_timeout REAL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    last_polled REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    stage TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    depends_on INTEGER REFERENCES tasks(id),
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL REFERENCES jobs(id),
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    time REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (status, available_at);
+CREATE INDEX IF NOT EXISTS tasks_job ON tasks (job_id);
+CREATE INDEX IF NOT EXISTS events_job ON events (job_id, id);
+"""
+
+
+class TaskQueue:
+    """
+    Durable job queue in a single SQLite file, shared by the pages that
+    enqueue jobs and the worker processes that run their tasks.
+
+    A job is split into tasks (e.g. one "plan" task, then one task per
+    section). Workers claim a task with a lease they keep extending while
+    it runs; a task whose lease expires (crashed worker) is claimed again.
+    Failed tasks are retried with backoff up to `max_attempts`. Job events
+    are stored as they happen so any process can follow a job.
+    """
+
+    def __init__(self, path, lease_seconds=60, max_attempts=3, retry_delay=5):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA)
+
+    @classmethod
+    def from_env(cls):
+        """Returns the queue configured by BOOKSHELF_QUEUE_DB, or None"""
+        path = os.getenv("BOOKSHELF_QUEUE_DB")
+        return cls(path) if path else None
+
+    # Connections
+
+    def connection(self):
+        """One connection per thread; SQLite connections are not thread safe"""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def transaction(self):
+        return _Transaction(self.connection())
+
+    # Jobs
+
+    def enqueue(self, kind, pipeline, params, first_stage="plan", abandon_timeout=None):
+        """Create a job and its first task. Returns the job id."""
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT INTO jobs (id, kind, pipeline, params, status, abandon_timeout,"
+                " created_at, updated_at, last_polled) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, pipeline, json.dumps(params), QUEUED, abandon_timeout, now, now, now),
+            )
+            self._insert_event(connection, job_id, "status", {"status": QUEUED, "error": None})
+            self._insert_task(connection, job_id, first_stage, {}, now=now)
+        return job_id
+
+    def add_task(self, job_id, stage, payload):
+        """
+        Queue another task for an existing job, e.g. rewriting one section
+        of a finished book. The job is reopened until the task is done.
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            row = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                raise ValueError(f"Unknown job {job_id}")
+            if row["status"] in (QUEUED, RUNNING):
+                raise ValueError(f"Job {job_id} is still running")
+            position = connection.execute(
+                "SELECT COALESCE(MAX(position), 0) + 1 FROM tasks WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+            self._insert_task(connection, job_id, stage, payload, position=position, now=now)
+            connection.execute(
+                "UPDATE jobs SET cancel_requested = 0, last_polled = ? WHERE id = ?", (now, job_id)
+            )
+            self._set_job_status(connection, job_id, QUEUED)
+
+    def get_job_row(self, job_id):
+        return self.connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+    def list_jobs(self, status=None):
+        if status:
+            return self.connection().execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at", (status,)
+            ).fetchall()
+        return self.connection().execute("SELECT * FROM jobs ORDER BY created_at").fetchall()
+
+    def request_cancel(self, job_id):
+        """
+        Ask for a job to be cancelled. Queued tasks are dropped right away;
+        workers running one of its tasks notice on their next heartbeat.
+        """
+        with self.transaction() as connection:
+            row = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row["status"] in (COMPLETED, FAILED, CANCELLED):
+                return
+            connection.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (job_id,))
+            connection.execute(
+                "UPDATE tasks SET status = ?, updated_at = ? WHERE job_id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, PENDING),
+            )
+            self._finish_job_if_done(connection, job_id)
+
+    def is_cancel_requested(self, job_id):
+        row = self.connection().execute(
+            "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def touch(self, job_id):
+        self.connection().execute(
+            "UPDATE jobs SET last_polled = ? WHERE id = ?", (time.time(), job_id)
+        )
+
+    # Events
+
+    def add_events(self, job_id, events):
+        """Persist events emitted by a task in one transaction"""
+        with self.transaction() as connection:
+            for event in events:
+                data = {k: v for k, v in event.items() if k not in ("seq", "type", "time")}
+                connection.execute(
+                    "INSERT INTO events (job_id, type, data, time) VALUES (?, ?, ?, ?)",
+                    (job_id, event["type"], json.dumps(data), event["time"]),
+                )
+            connection.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def events_since(self, job_id, after_id=0):
+        """Returns (event id, event dict) pairs stored after `after_id`"""
+        rows = self.connection().execute(
+            "SELECT id, type, data, time FROM events WHERE job_id = ? AND id > ? ORDER BY id",
+            (job_id, after_id),
+        ).fetchall()
+        return [
+            (row["id"], {"type": row["type"], "time": row["time"], **json.loads(row["data"])})
+            for row in rows
+        ]
+
+    # Tasks
+
+    def claim(self, worker_id):
+        """
+        Lease the next runnable task: pending (or with an expired lease),
+        past its retry delay, and whose dependency is done. Returns the
+        task row or None.
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            self._expire_leases(connection, now)
+            row = connection.execute(
+                """
+                SELECT t.* FROM tasks t JOIN jobs j ON j.id = t.job_id
+                WHERE t.status = ? AND t.available_at <= ? AND j.cancel_requested = 0
+                  AND (t.depends_on IS NULL
+                       OR (SELECT status FROM tasks d WHERE d.id = t.depends_on) = ?)
+                ORDER BY j.created_at, t.position, t.id
+                LIMIT 1
+                """,
+                (PENDING, now, DONE),
+            ).fetchone()
+            if row is None:
+                return None
+
+            connection.execute(
+                "UPDATE tasks SET status = ?, attempts = attempts + 1, lease_owner = ?,"
+                " lease_expires = ?, updated_at = ? WHERE id = ?",
+                (CLAIMED, worker_id, now + self.lease_seconds, now, row["id"]),
+            )
+            job = connection.execute("SELECT status FROM jobs WHERE id = ?", (row["job_id"],)).fetchone()
+            if job["status"] == QUEUED:
+                self._set_job_status(connection, row["job_id"], RUNNING)
+            return connection.execute("SELECT * FROM tasks WHERE id = ?", (row["id"],)).fetchone()
+
+    def extend_lease(self, task_id, worker_id):
+        """Returns False if the lease was lost to another worker"""
+        cursor = self.connection().execute(
+            "UPDATE tasks SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+            (time.time() + self.lease_seconds, task_id, worker_id, CLAIMED),
+        )
+        return cursor.rowcount == 1
+
+    def get_task(self, task_id):
+        return self.connection().execute("SELECT * FROM tasks WHERE id = ?", (task_id,)).fetchone()
+
+    def task_result(self, task_id):
+        row = self.connection().execute("SELECT result FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        return json.loads(row["result"]) if row and row["result"] else None
+
+    def complete(self, task, result=None, new_tasks=()):
+        """
+        Store the result of a task and add the tasks it spawned, given as
+        (stage, payload, chained) tuples. A chained task depends on the one
+        added before it (or on this task, for the first), so it runs only
+        after that one is done and can read its result.
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = ?, result = ?, lease_owner = NULL, updated_at = ?"
+                " WHERE id = ?",
+                (DONE, json.dumps(result), now, task["id"]),
+            )
+            previous_id = task["id"]
+            for position, (stage, payload, chained) in enumerate(new_tasks, start=1):
+                previous_id = self._insert_task(
+                    connection,
+                    task["job_id"],
+                    stage,
+                    payload,
+                    position=task["position"] + position,
+                    depends_on=previous_id if chained else None,
+                    now=now,
+                )
+            self._finish_job_if_done(connection, task["job_id"])
+
+    def fail(self, task, error):
+        """Schedule a retry with backoff, or fail the job once attempts run out"""
+        now = time.time()
+        with self.transaction() as connection:
+            if task["attempts"] < task["max_attempts"]:
+                delay = self.retry_delay * 2 ** (task["attempts"] - 1)
+                connection.execute(
+                    "UPDATE tasks SET status = ?, error = ?, lease_owner = NULL,"
+                    " available_at = ?, updated_at = ? WHERE id = ?",
+                    (PENDING, error, now + delay, now, task["id"]),
+                )
+                self._insert_event(
+                    connection,
+                    task["job_id"],
+                    "notice",
+                    {"message": f"Task {task['stage']} failed ({error}). Retrying in {delay:.0f} seconds..."},
+                )
+                return
+
+            self._fail_job(connection, task, error, now)
+
+    def cancel_task(self, task):
+        with self.transaction() as connection:
+            connection.execute(
+                "UPDATE tasks SET status = ?, lease_owner = NULL, updated_at = ? WHERE id = ?",
+                (CANCELLED, time.time(), task["id"]),
+            )
+            self._finish_job_if_done(connection, task["job_id"])
+
+    def reap(self, retention=24 * 3600):
+        """
+        Cancel running jobs nobody has watched for their abandon timeout and
+        delete finished jobs older than `retention` seconds.
+        """
+        now = time.time()
+        abandoned = self.connection().execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) AND abandon_timeout IS NOT NULL"
+            " AND last_polled + abandon_timeout < ?",
+            (QUEUED, RUNNING, now),
+        ).fetchall()
+        for row in abandoned:
+            self.request_cancel(row["id"])
+
+        with self.transaction() as connection:
+            old_jobs = "SELECT id FROM jobs WHERE status IN (?, ?, ?) AND updated_at < ?"
+            args = (COMPLETED, FAILED, CANCELLED, now - retention)
+            connection.execute(f"DELETE FROM events WHERE job_id IN ({old_jobs})", args)
+            connection.execute(f"DELETE FROM tasks WHERE job_id IN ({old_jobs})", args)
+            connection.execute(old_jobs.replace("SELECT id", "DELETE"), args)
+
+    # Internals
+
+    def _insert_task(self, connection, job_id, stage, payload, position=0, depends_on=None, now=None):
+        now = now or time.time()
+        cursor = connection.execute(
+            "INSERT INTO tasks (job_id, stage, payload, position, depends_on, status,"
+            " max_attempts, available_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job_id, stage, json.dumps(payload), position, depends_on, PENDING, self.max_attempts, now, now),
+        )
+        return cursor.lastrowid
+
+    def _insert_event(self, connection, job_id, event_type, data):
+        connection.execute(
+            "INSERT INTO events (job_id, type, data, time) VALUES (?, ?, ?, ?)",
+            (job_id, event_type, json.dumps(data), time.time()),
+        )
+
+    def _set_job_status(self, connection, job_id, status, error=None):
+        connection.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+            (status, error, time.time(), job_id),
+        )
+        self._insert_event(connection, job_id, "status", {"status": status, "error": error})
+
+    def _expire_leases(self, connection, now):
+        """Release tasks of crashed workers, failing those out of attempts"""
+        expired = connection.execute(
+            "SELECT * FROM tasks WHERE status = ? AND lease_expires < ?", (CLAIMED, now)
+        ).fetchall()
+        for task in expired:
+            if task["attempts"] < task["max_attempts"]:
+                # Unless the job failed on an earlier task of this loop
+                connection.execute(
+                    "UPDATE tasks SET status = ?, lease_owner = NULL, updated_at = ? WHERE id = ? AND status = ?",
+                    (PENDING, now, task["id"], CLAIMED),
+                )
+            else:
+                self._fail_job(connection, task, "Worker lease expired", now)
+
+    def _fail_job(self, connection, task, error, now):
+        """Fail a task out of attempts and its job, cancelling the job's other tasks"""
+        connection.execute(
+            "UPDATE tasks SET status = ?, error = ?, lease_owner = NULL, updated_at = ? WHERE id = ?",
+            (FAILED, error, now, task["id"]),
+        )
+        # Pending tasks, including those chained after this one, never run;
+        # expired ones are not released again
+        connection.execute(
+            "UPDATE tasks SET status = ?, updated_at = ? WHERE job_id = ?"
+            " AND (status = ? OR (status = ? AND lease_expires < ?))",
+            (CANCELLED, now, task["job_id"], PENDING, CLAIMED, now),
+        )
+        # Stops sibling tasks still running on other workers
+        connection.execute("UPDATE jobs SET cancel_requested = 1 WHERE id = ?", (task["job_id"],))
+        self._set_job_status(connection, task["job_id"], FAILED, error)
+
+    def _finish_job_if_done(self, connection, job_id):
+        """Mark the job finished once none of its tasks can still run"""
+        job = connection.execute(
+            "SELECT status, cancel_requested FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        if job["status"] in (COMPLETED, FAILED, CANCELLED):
+            return
+        open_tasks = connection.execute(
+            "SELECT COUNT(*) FROM tasks WHERE job_id = ? AND status IN (?, ?)",
+            (job_id, PENDING, CLAIMED),
+        ).fetchone()[0]
+        if open_tasks == 0:
+            self._set_job_status(connection, job_id, CANCELLED if job["cancel_requested"] else COMPLETED)
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, so claims never race between processes"""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN IMMEDIATE")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
+        return False
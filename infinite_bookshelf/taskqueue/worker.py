@@ -0,0 +1,193 @@
+"""
+Worker processes that claim and run queued generation tasks
+"""
+
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+
+from ..inference import GenerationCancelled, RateLimitedProvider, groq_limiter
+from ..jobs import Job
+from .stages import STAGES
+
+logger = logging.getLogger(__name__)
+
+
+class EventWriter:
+    """
+    Job listener that persists events to the queue. Tokens are buffered
+    and written in batches (consecutive tokens of a section merged into
+    one event) so streaming does not turn into one transaction per token.
+    """
+
+    def __init__(self, queue, job_id, flush_interval=0.5):
+        self.queue = queue
+        self.job_id = job_id
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.last_flush = time.time()
+        self.lock = threading.Lock()
+
+    def __call__(self, event):
+        with self.lock:
+            last = self.pending[-1] if self.pending else None
+            if (
+                event["type"] == "token"
+                and last is not None
+                and last["type"] == "token"
+                and last["section"] == event["section"]
+            ):
+                last["text"] += event["text"]
+            else:
+                self.pending.append(dict(event))
+
+    def flush(self, force=False):
+        with self.lock:
+            if not self.pending or (not force and time.time() - self.last_flush < self.flush_interval):
+                return
+            events, self.pending = self.pending, []
+            self.last_flush = time.time()
+        self.queue.add_events(self.job_id, events)
+
+
+class Heartbeat(threading.Thread):
+    """
+    Keeps the lease of a running task alive, flushes its events and
+    cancels it when the job is cancelled or the lease is lost.
+    """
+
+    def __init__(self, queue, task, worker_id, job, writer, interval=None):
+        super().__init__(name=f"heartbeat-{task['id']}", daemon=True)
+        self.queue = queue
+        self.task = task
+        self.worker_id = worker_id
+        self.job = job
+        self.writer = writer
+        self.interval = interval or min(queue.lease_seconds / 3, 5)
+        self.stopped = threading.Event()
+
+    def run(self):
+        last_renewal = time.time()
+        while not self.stopped.wait(self.writer.flush_interval):
+            self.writer.flush()
+            if time.time() - last_renewal < self.interval:
+                continue
+            last_renewal = time.time()
+            if self.queue.is_cancel_requested(self.task["job_id"]):
+                self.job.cancel()
+            elif not self.queue.extend_lease(self.task["id"], self.worker_id):
+                logger.warning(f"Lost the lease on task {self.task['id']}, stopping it")
+                self.job.cancel()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        self.writer.flush(force=True)
+
+
+def run_task(queue, task, groq_provider, worker_id):
+    """Run one claimed task and record its outcome in the queue"""
+    job_row = queue.get_job_row(task["job_id"])
+    params = json.loads(job_row["params"])
+    handler = STAGES[job_row["pipeline"]][task["stage"]]
+    previous = queue.task_result(task["depends_on"]) if task["depends_on"] else None
+
+    # A job object holding the job state so far; new events go to the queue
+    job = Job(job_row["kind"], params=params, job_id=job_row["id"])
+    job.replay(event for _, event in queue.events_since(job.id))
+    writer = EventWriter(queue, job.id)
+    job.subscribe(writer)
+    heartbeat = Heartbeat(queue, task, worker_id, job, writer)
+    heartbeat.start()
+
+    try:
+        result, new_tasks = handler(job, groq_provider, params, json.loads(task["payload"]), previous)
+    except GenerationCancelled:
+        heartbeat.stop()
+        queue.cancel_task(task)
+    except Exception as e:
+        heartbeat.stop()
+        logger.error(f"Task {task['id']} ({task['stage']}) failed: {e}\n{traceback.format_exc()}")
+        queue.fail(task, str(e))
+    else:
+        heartbeat.stop()
+        if job.cancel_token.cancelled:
+            queue.cancel_task(task)
+        else:
+            queue.complete(task, result, new_tasks)
+
+
+def work(queue, groq_provider, worker_id=None, poll_interval=1.0, stop_event=None, run_once=False):
+    """
+    Claim and run tasks until `stop_event` is set. With `run_once`, return
+    as soon as the queue has nothing runnable (useful for tests and cron).
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    last_reap = 0
+    while not (stop_event and stop_event.is_set()):
+        if time.time() - last_reap > 60:
+            queue.reap()
+            last_reap = time.time()
+
+        task = queue.claim(worker_id)
+        if task is None:
+            if run_once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        logger.info(f"Worker {worker_id} running task {task['id']} ({task['stage']}) of job {task['job_id']}")
+        run_task(queue, task, groq_provider, worker_id)
+
+
+def worker_main(db_path, tokens_per_minute=None, stop_event=None):
+    """Entry point of one worker process"""
+    # Imported here so the queue can be used without groq configured
+    from dotenv import load_dotenv
+    from groq import Groq
+
+    from .store import TaskQueue
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(levelname)s %(message)s")
+    if tokens_per_minute:
+        groq_limiter.set_limit(tokens_per_minute)
+
+    try:
+        work(TaskQueue(db_path), RateLimitedProvider(Groq()), stop_event=stop_event)
+    except KeyboardInterrupt:
+        pass
+
+
+def run_pool(db_path, workers=2, tokens_per_minute=None):
+    """
+    Start `workers` worker processes and wait for them. The tokens per
+    minute budget is split evenly, as each process has its own limiter.
+    """
+    stop_event = multiprocessing.Event()
+    per_worker_tpm = tokens_per_minute // workers if tokens_per_minute else None
+    if per_worker_tpm is None:
+        per_worker_tpm = groq_limiter.tpm_limit // workers
+
+    processes = [
+        multiprocessing.Process(
+            target=worker_main,
+            args=(db_path, per_worker_tpm, stop_event),
+            name=f"bookshelf-worker-{index + 1}",
+        )
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        stop_event.set()
+        for process in processes:
+            process.join()
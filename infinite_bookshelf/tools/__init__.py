@@ -1,2 +1,2 @@
-from .markdown import create_markdown_file
+from .markdown import create_markdown_file, render_markdown_book
 from .pdf import create_pdf_file
@@ -0,0 +1,109 @@
+"""
+Multi-pattern matcher to find which characters a text mentions
+"""
+
+from collections import deque
+
+# Words of a name that do not identify a character on their own
+NAME_STOPWORDS = {
+    "the", "of", "and", "von", "van", "de", "del", "la", "le",
+    "mr", "mrs", "ms", "miss", "dr", "sir", "lady", "lord", "king", "queen",
+    "captain", "professor", "father", "mother", "aunt", "uncle",
+}
+# Profile fields the character agents use for other names
+ALIAS_FIELDS = ("aliases", "alias", "nicknames", "nickname", "also_known_as")
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton: finds all occurrences of many patterns in one
+    pass over the text, however many patterns there are. Matching is case
+    insensitive and only whole words count.
+    """
+
+    def __init__(self, patterns):
+        """`patterns` maps each pattern to the value reported when it matches"""
+        self.transitions = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+        for pattern, value in patterns.items():
+            self._add(pattern.lower(), value)
+        self._link()
+
+    def _add(self, pattern, value):
+        state = 0
+        for char in pattern:
+            if char not in self.transitions[state]:
+                self.transitions.append({})
+                self.fail.append(0)
+                self.outputs.append([])
+                self.transitions[state][char] = len(self.transitions) - 1
+            state = self.transitions[state][char]
+        self.outputs[state].append((len(pattern), value))
+
+    def _link(self):
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.transitions[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.transitions[fallback].get(char, 0)
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def find(self, text):
+        """Yields (start, end, value) for every whole-word match in `text`"""
+        lowered = text.lower()
+        state = 0
+        for index, char in enumerate(lowered):
+            while state and char not in self.transitions[state]:
+                state = self.fail[state]
+            state = self.transitions[state].get(char, 0)
+            for length, value in self.outputs[state]:
+                start, end = index - length + 1, index + 1
+                if (start == 0 or not lowered[start - 1].isalnum()) and (end == len(lowered) or not lowered[end].isalnum()):
+                    yield start, end, value
+
+
+def character_aliases(name, profile=None):
+    """
+    The ways a character may be referred to: the full name, its distinctive
+    words (first or last name) and any aliases listed in the profile.
+    """
+    full_name = name.replace("_", " ").strip()
+    aliases = {full_name}
+    for word in full_name.replace(".", " ").split():
+        if len(word) >= 3 and word.lower() not in NAME_STOPWORDS:
+            aliases.add(word)
+    if isinstance(profile, dict):
+        for field in ALIAS_FIELDS:
+            value = profile.get(field)
+            if isinstance(value, str):
+                value = value.split(",")
+            if isinstance(value, list):
+                aliases.update(alias.strip() for alias in value if isinstance(alias, str) and alias.strip())
+    return aliases
+
+
+class CharacterIndex:
+    """
+    Index of the names and aliases of a cast. `mentioned(text)` returns the
+    characters a text refers to, in order of first mention.
+    """
+
+    def __init__(self, characters):
+        patterns = {}
+        for name, profile in characters.items():
+            for alias in character_aliases(name, profile):
+                # An alias shared by two characters (a family name) identifies neither
+                patterns[alias] = None if alias in patterns and patterns[alias] != name else name
+        self.automaton = AhoCorasick({alias: name for alias, name in patterns.items() if name})
+
+    def mentioned(self, *texts):
+        found = {}
+        for text in texts:
+            for _, _, name in self.automaton.find(text or ""):
+                found.setdefault(name, None)
+        return list(found)
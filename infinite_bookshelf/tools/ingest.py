@@ -0,0 +1,133 @@
+"""
+Streaming readers turning uploaded seed files (text, markdown, PDF, HTML) into text
+"""
+
+import codecs
+import hashlib
+import os
+from html.parser import HTMLParser
+
+# Bytes read from a file at a time
+READ_BLOCK_SIZE = 64 * 1024
+
+TEXT_EXTENSIONS = (".txt", ".md", ".markdown")
+HTML_EXTENSIONS = (".html", ".htm")
+PDF_EXTENSIONS = (".pdf",)
+SEED_FILE_EXTENSIONS = TEXT_EXTENSIONS + HTML_EXTENSIONS + PDF_EXTENSIONS
+
+
+def iter_blocks(file, block_size=READ_BLOCK_SIZE):
+    """Yields the bytes of a binary file object from its start, one block at a time"""
+    file.seek(0)
+    while block := file.read(block_size):
+        yield block
+
+
+def file_sha256(file):
+    """SHA-256 of a binary file object's content, read block by block"""
+    digest = hashlib.sha256()
+    for block in iter_blocks(file):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def detect_encoding(sample):
+    """
+    The encoding of a text file, guessed from its first bytes: UTF-8 (with
+    or without BOM), else Windows-1252, the usual legacy encoding of notes.
+    """
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    try:
+        # A multi-byte character may be cut at the end of the sample
+        sample.decode("utf-8")
+        return "utf-8"
+    except UnicodeDecodeError as e:
+        if e.start >= len(sample) - 3:
+            return "utf-8"
+        return "cp1252"
+
+
+def iter_decoded(file):
+    """Yields the text of a binary text file, decoded incrementally"""
+    blocks = iter_blocks(file)
+    first = next(blocks, b"")
+    decoder = codecs.getincrementaldecoder(detect_encoding(first))(errors="replace")
+    yield decoder.decode(first)
+    for block in blocks:
+        yield decoder.decode(block)
+    yield decoder.decode(b"", final=True)
+
+
+class HTMLTextParser(HTMLParser):
+    """Collects the visible text of an HTML document fed in pieces, with paragraph breaks"""
+
+    SKIPPED_TAGS = {"script", "style", "head", "noscript", "template", "svg"}
+    BLOCK_TAGS = {
+        "p", "div", "br", "li", "tr", "section", "article", "blockquote", "pre",
+        "h1", "h2", "h3", "h4", "h5", "h6", "table", "ul", "ol", "hr",
+    }
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.skipping = 0
+        self.text = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIPPED_TAGS:
+            self.skipping += 1
+        elif tag in self.BLOCK_TAGS:
+            self.text.append("\n\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIPPED_TAGS:
+            self.skipping = max(0, self.skipping - 1)
+        elif tag in self.BLOCK_TAGS:
+            self.text.append("\n\n")
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.text.append(data)
+
+    def take_text(self):
+        """The text collected since the last call"""
+        text, self.text = "".join(self.text), []
+        return text
+
+
+def iter_html_text(file):
+    """Yields the visible text of an HTML file as it is parsed"""
+    parser = HTMLTextParser()
+    for piece in iter_decoded(file):
+        parser.feed(piece)
+        yield parser.take_text()
+    parser.close()
+    yield parser.take_text()
+
+
+def iter_pdf_text(file):
+    """Yields the text of a PDF file one page at a time"""
+    try:
+        # Imported lazily: only needed for PDF seed files
+        from pypdf import PdfReader
+    except ImportError as e:
+        raise ValueError("Reading PDF seed files needs the pypdf package (pip install pypdf)") from e
+
+    file.seek(0)
+    for page in PdfReader(file).pages:
+        yield (page.extract_text() or "") + "\n\n"
+
+
+def iter_file_text(file, name):
+    """
+    Yields the text of an uploaded seed file in pieces, read according to
+    the extension of `name`, so a large file is never held in memory whole.
+    """
+    extension = os.path.splitext(name.lower())[1]
+    if extension in TEXT_EXTENSIONS:
+        return iter_decoded(file)
+    if extension in HTML_EXTENSIONS:
+        return iter_html_text(file)
+    if extension in PDF_EXTENSIONS:
+        return iter_pdf_text(file)
+    raise ValueError(f"Unsupported seed file type '{extension}', expected one of {', '.join(SEED_FILE_EXTENSIONS)}")
@@ -0,0 +1,142 @@
+"""
+Local repair of malformed JSON returned by models
+"""
+
+import json
+import re
+
+CODE_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)(?:```|$)", re.DOTALL)
+# A key left without a value when the output was cut off: `, "key"` or `{"key":`
+DANGLING_KEY = re.compile(r'([,{])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$')
+BARE_TOKEN = re.compile(r"[A-Za-z0-9.+\-]+$")
+
+
+def repair_json(text):
+    """
+    Parse JSON written by a model, repairing what commonly goes wrong:
+    code fences and prose around the object, trailing commas, unescaped
+    quotes and raw newlines in strings, and output truncated mid-object
+    (the members written so far are kept). Raises ValueError if the text
+    cannot be recovered.
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        pass
+
+    fenced = CODE_FENCE.search(text)
+    candidate = fenced.group(1) if fenced else text
+    starts = [index for index in (candidate.find("{"), candidate.find("[")) if index >= 0]
+    if not starts:
+        raise ValueError("No JSON object found in the output")
+
+    repaired = _close_truncated(*_repair_tokens(candidate[min(starts):]))
+    try:
+        value, _ = json.JSONDecoder().raw_decode(repaired)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Could not repair the JSON output: {e}") from e
+    return value
+
+
+def _repair_tokens(text):
+    """
+    Single pass over the text that escapes stray quotes and control
+    characters in strings and drops trailing commas. Returns the repaired
+    text and the brackets still open where the text ends.
+    """
+    out = []
+    stack = []
+    in_string = False
+    index = 0
+    while index < len(text):
+        char = text[index]
+        if in_string:
+            if char == "\\":
+                # A backslash cut off at the very end is dropped
+                out.append(text[index:index + 2] if index + 1 < len(text) else "")
+                index += 2
+                continue
+            if char == '"':
+                if _closes_string(text, index + 1, stack):
+                    in_string = False
+                    out.append(char)
+                else:
+                    out.append('\\"')
+            elif char == "\n":
+                out.append("\\n")
+            elif char == "\r":
+                out.append("\\r")
+            elif char == "\t":
+                out.append("\\t")
+            else:
+                out.append(char)
+        elif char == '"':
+            in_string = True
+            out.append(char)
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+            out.append(char)
+        elif char in "}]":
+            _drop_trailing_comma(out)
+            if stack:
+                stack.pop()
+            out.append(char)
+            if not stack:
+                # The top-level value is complete; anything after it is prose
+                break
+        else:
+            out.append(char)
+        index += 1
+
+    if in_string:
+        out.append('"')
+    return "".join(out), stack
+
+
+def _closes_string(text, position, stack):
+    """
+    Whether a quote ends its string, judged by what follows it: a colon,
+    a closing bracket, the end of the text, or a comma followed by the
+    start of another member. Otherwise it is a quote inside the text.
+    """
+    rest = text[position:].lstrip()
+    if not rest or rest[0] in ":}]":
+        return True
+    if rest[0] != ",":
+        return False
+    after_comma = rest[1:].lstrip()
+    if not after_comma or after_comma[0] in '"{[]}':
+        return True
+    # Arrays may also continue with numbers and literals
+    return bool(stack) and stack[-1] == "]" and after_comma[0] in "-0123456789tfn"
+
+
+def _drop_trailing_comma(out):
+    end = len(out)
+    while end and out[end - 1].isspace():
+        end -= 1
+    if end and out[end - 1] == ",":
+        del out[end - 1]
+
+
+def _close_truncated(text, stack):
+    """Close the brackets of truncated output, dropping an incomplete last member"""
+    if not stack:
+        return text
+
+    text = text.rstrip()
+    token = BARE_TOKEN.search(text)
+    if token:
+        try:
+            json.loads(token.group())
+        except json.JSONDecodeError:
+            # A literal or number cut off halfway, e.g. `tru`
+            text = text[:token.start()].rstrip()
+    if stack[-1] == "}":
+        text = DANGLING_KEY.sub(r"\1", text)
+    text = text.rstrip()
+    if text.endswith(":"):
+        text = text[:-1]
+    if text.endswith(","):
+        text = text[:-1]
+    return text + "".join(reversed(stack))
@@ -0,0 +1,100 @@
+"""
+Incremental parser for a JSON object arriving as a token stream
+"""
+
+import json
+
+from .json_repair import repair_json
+
+
+class StreamingObjectParser:
+    """
+    Feed it the chunks of a streamed JSON object and it returns each
+    top-level member as a (key, value) pair as soon as that member is
+    complete, long before the whole object has arrived:
+
+        parser = StreamingObjectParser()
+        for chunk in stream:
+            for key, value in parser.feed(chunk):
+                ...
+        for key, value in parser.close():
+            ...
+
+    Anything before the opening brace (prose, a code fence) is skipped.
+    Malformed members are repaired where possible; those that cannot be
+    are collected in `failed` instead of raising, so the caller can decide
+    whether the output is usable.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.position = 0
+        self.started = False
+        self.finished = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.member_start = 0
+        self.members = {}
+        self.failed = []
+
+    def feed(self, chunk):
+        """Returns the top-level members completed by this chunk"""
+        self.text += chunk
+        completed = []
+        while self.position < len(self.text) and not self.finished:
+            char = self.text[self.position]
+
+            if not self.started:
+                if char == "{":
+                    self.started = True
+                    self.depth = 1
+                    self.member_start = self.position + 1
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    completed.extend(self._parse_member(self.text[self.member_start:self.position]))
+                    self.finished = True
+            elif char == "," and self.depth == 1:
+                completed.extend(self._parse_member(self.text[self.member_start:self.position]))
+                self.member_start = self.position + 1
+
+            self.position += 1
+        return completed
+
+    def close(self):
+        """
+        End of stream. If the object was truncated, returns what can be
+        recovered of the incomplete last member.
+        """
+        if not self.started or self.finished:
+            return []
+        self.finished = True
+        return self._parse_member(self.text[self.member_start:], truncated=True)
+
+    def _parse_member(self, member_text, truncated=False):
+        if not member_text.strip():
+            return []
+        try:
+            member = json.loads("{" + member_text + "}")
+        except json.JSONDecodeError:
+            try:
+                # A truncated member may end inside a string, where a closing
+                # brace would be read as text; the repair closes it instead
+                member = repair_json("{" + member_text + ("" if truncated else "}"))
+            except ValueError:
+                self.failed.append(member_text)
+                return []
+        self.members.update(member)
+        return list(member.items())
@@ -13,3 +13,19 @@ def create_markdown_file(content: str) -> BytesIO:
     markdown_file.write(content.encode("utf-8"))
     markdown_file.seek(0)
     return markdown_file
+
+
+def render_markdown_book(book_title: str, structure: dict, contents: dict, level: int = 1) -> str:
+    """
+    Returns the markdown styled book for a structure and its section contents,
+    without depending on the streamlit Book object.
+    """
+    markdown_content = f"# {book_title}\n\n" if level == 1 else ""
+
+    for title, content in structure.items():
+        section_text = contents.get(title, "")
+        if isinstance(section_text, str) and section_text.strip():
+            markdown_content += f"{'#' * level} {title}\n{section_text}\n\n"
+        if isinstance(content, dict):
+            markdown_content += render_markdown_book(book_title, content, contents, level + 1)
+    return markdown_content
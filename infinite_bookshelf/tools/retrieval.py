@@ -0,0 +1,123 @@
+"""
+Local BM25 index to retrieve the passages of a text relevant to a query
+"""
+
+import heapq
+import math
+import re
+import time
+from collections import Counter
+
+# Words too common to tell passages apart
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have",
+    "in", "into", "is", "it", "its", "of", "on", "or", "that", "the", "their", "this",
+    "to", "was", "were", "will", "with", "which", "who", "what", "how", "why",
+}
+WORD_PATTERN = re.compile(r"\w+")
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def tokenize(text):
+    """Lowercased words of `text`, without stopwords"""
+    return [word for word in WORD_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+
+
+def iter_paragraphs(pieces, max_words=150):
+    """
+    Yields the paragraphs of a text given as successive pieces, holding at
+    most one unfinished paragraph; a paragraph with no break in sight is
+    passed on in parts once it is far over `max_words`.
+    """
+    carry = ""
+    for piece in pieces:
+        carry += piece
+        paragraphs = PARAGRAPH_BREAK.split(carry)
+        carry = paragraphs.pop()
+        yield from paragraphs
+        if len(carry) > max_words * 16:
+            # Keep the last word, which may continue in the next piece
+            head, space, tail = carry.rpartition(" ")
+            yield head if space else carry
+            carry = tail if space else ""
+    yield carry
+
+
+def iter_passages(pieces, max_words=150):
+    """
+    Yields passages of up to `max_words` words from a text given as
+    successive pieces, keeping paragraphs together where they fit and
+    splitting longer ones. Memory stays bounded by a passage and a piece.
+    """
+    current, current_words = [], 0
+    for paragraph in iter_paragraphs(pieces, max_words):
+        words = paragraph.split()
+        if not words:
+            continue
+        if current and current_words + len(words) > max_words:
+            yield "\n\n".join(current)
+            current, current_words = [], 0
+        while len(words) > max_words:
+            yield " ".join(words[:max_words])
+            words = words[max_words:]
+        if words:
+            current.append(" ".join(words))
+            current_words += len(words)
+    if current:
+        yield "\n\n".join(current)
+
+
+def split_passages(text, max_words=150):
+    """`text` split into passages of up to `max_words` words; see iter_passages"""
+    return list(iter_passages([text], max_words))
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the passages of a text, with an inverted index so a
+    query only scores the passages sharing a word with it.
+
+        index = BM25Index(split_passages(text))
+        passages = index.search("topic of the section", k=4)
+
+    `build_time` is the time the index took to build, in seconds.
+    """
+
+    def __init__(self, passages, k1=1.5, b=0.75):
+        start = time.perf_counter()
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.lengths = []
+        self.postings = {}
+        for index, passage in enumerate(passages):
+            words = tokenize(passage)
+            self.lengths.append(len(words))
+            for word, count in Counter(words).items():
+                self.postings.setdefault(word, []).append((index, count))
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0
+        self.idf = {
+            word: math.log(1 + (len(passages) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for word, postings in self.postings.items()
+        }
+        self.build_time = time.perf_counter() - start
+
+    def scores(self, query):
+        """BM25 score of every passage sharing a word with `query`, by index"""
+        scores = Counter()
+        for word in set(tokenize(query)):
+            idf = self.idf.get(word)
+            if idf is None:
+                continue
+            for index, count in self.postings[word]:
+                length_norm = 1 - self.b + self.b * self.lengths[index] / (self.average_length or 1)
+                scores[index] += idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+        return scores
+
+    def search(self, query, k=4):
+        """The `k` passages most relevant to `query`, in the order of the text"""
+        if len(self.passages) <= k:
+            return list(self.passages)
+        scores = self.scores(query)
+        best = heapq.nlargest(k, scores, key=scores.get)
+        return [self.passages[index] for index in sorted(best)]
@@ -0,0 +1,54 @@
+"""
+MinHash signatures to tell how similar two prompts are, computed locally
+"""
+
+import hashlib
+import random
+
+from .retrieval import tokenize
+
+# Hash functions of a signature; the similarity estimate is off by about
+# 1 / sqrt(SIGNATURE_SIZE)
+SIGNATURE_SIZE = 64
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures are stored and compared across sessions
+_random = random.Random(1)
+_PERMUTATIONS = [(_random.randrange(1, _PRIME), _random.randrange(_PRIME)) for _ in range(SIGNATURE_SIZE)]
+
+
+def normalize_words(text):
+    """Lowercased words of `text` without stopwords or plural endings"""
+    return [word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word for word in tokenize(text)]
+
+
+def shingles(text, size=3):
+    """
+    The features of `text` compared by a signature: its normalized words
+    and their character `size`-grams, so "LLM" and "LLMs" or a misspelling
+    still share most features while word order does not matter.
+    """
+    features = set()
+    for word in normalize_words(text):
+        features.add(word)
+        padded = f" {word} "
+        features.update(padded[start:start + size] for start in range(len(padded) - size + 1))
+    return features
+
+
+def _hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(text):
+    """The MinHash signature of `text`: SIGNATURE_SIZE ints, empty for a text without words"""
+    hashes = [_hash(feature) for feature in shingles(text)]
+    if not hashes:
+        return []
+    return [min((a * value + b) % _PRIME for value in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(signature, other):
+    """Estimated Jaccard similarity (0 to 1) of the texts of two signatures"""
+    if not signature or len(signature) != len(other):
+        return 0.0
+    return sum(a == b for a, b in zip(signature, other)) / len(signature)
@@ -1,2 +1,12 @@
-from .book import Book
+from .book import Book, NovelBook
 from .initialization import load_return_env, ensure_states
+from .jobs import (
+    get_session_job,
+    get_task_queue,
+    set_session_job,
+    start_session_job,
+    is_resumable,
+    resume_session_job,
+    rewrite_session_section,
+    ABANDON_TIMEOUT,
+)
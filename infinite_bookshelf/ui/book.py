@@ -34,6 +34,14 @@ class Book:
         except TypeError as e:
             pass
 
+    def set_content(self, title, content):
+        """
+        Replace the content of a section, e.g. when syncing from a background job.
+        """
+        if title in self.contents:
+            self.contents[title] = content
+            self.display_content(title)
+
     def display_content(self, title):
         if self.contents[title].strip():
             self.placeholders[title].markdown(f"## {title}\n{self.contents[title]}")
@@ -114,3 +122,31 @@ class Book:
         
         if not found:
             print(f"Warning: Section '{title}' not found in book structure. Skipping content addition.")
+
+
+class NovelBook(Book):
+    """
+    Book that also shows the dramaturgy level and focus of each novel section
+    """
+
+    def __init__(self, book_title, structure, sections=None):
+        self.sections = sections or {}
+        super().__init__(book_title, structure)
+
+    def display_content(self, title):
+        if not self.contents[title].strip():
+            return
+
+        section = self.sections.get(title, {})
+        focus_text = ""
+        if section.get("setting_focus"):
+            focus_text += "📍 Setting Focus"
+        if section.get("character_focus"):
+            focus_text += " 👤 Character Focus"
+
+        with self.placeholders[title].container():
+            st.markdown(f"### {title} {focus_text}")
+            if section:
+                dramaturgy_level = section.get("dramaturgy_level", 5)
+                st.progress(dramaturgy_level / 10, text=f"Intensity: Level {dramaturgy_level}/10")
+            st.markdown(self.contents[title])
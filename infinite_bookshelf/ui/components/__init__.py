@@ -1,4 +1,7 @@
 from .basic_form import render_groq_form
 from .advanced_form import render_advanced_groq_form
-from .statistics import display_statistics
+from .statistics import display_statistics, render_run_estimate
 from .download import render_download_buttons
+from .job_progress import render_job_progress
+from .outline_editor import render_outline_editor
+from .section_tools import render_section_tools
@@ -75,6 +75,14 @@ def render_advanced_groq_form(on_submit, button_disabled=False, button_text="Gen
                 options=["Beginner", "Intermediate", "Advanced", "Expert"],
             )
 
+        target_pages = st.number_input(
+            "Target length in pages (0 for no target)",
+            min_value=0,
+            max_value=1000,
+            value=0,
+            help="The pages are shared among the sections, so each one is written to its share of the length",
+        )
+
         st.subheader("Seed Content")
         seed_content = st.text_area(
             "Provide any existing notes or content to be incorporated into the book",
@@ -85,9 +93,9 @@ def render_advanced_groq_form(on_submit, button_disabled=False, button_text="Gen
 
         st.subheader("File Upload")
         uploaded_file = st.file_uploader(
-            "Upload a text file with your seed content (optional)",
-            type=["txt"],
-            help="Upload a text file with your seed content (optional)",
+            "Upload a file with your seed content (optional)",
+            type=["txt", "md", "markdown", "pdf", "html", "htm"],
+            help="Text, markdown, PDF or HTML; only the passages relevant to each prompt are sent",
         )
 
         submitted = st.form_submit_button(
@@ -103,6 +111,7 @@ def render_advanced_groq_form(on_submit, button_disabled=False, button_text="Gen
         additional_instructions,
         writing_style,
         complexity_level,
+        target_pages,
         seed_content,
         uploaded_file,
         title_agent_model,
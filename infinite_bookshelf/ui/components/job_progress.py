@@ -0,0 +1,93 @@
+"""
+Component function to render and follow a background generation job
+"""
+
+import time
+import streamlit as st
+
+from ..book import Book
+from .statistics import display_statistics
+from ...jobs import COMPLETED, FAILED, CANCELLED, estimate_remaining, format_duration
+from ...jobs.metrics import load_history
+
+# Seconds between updates of the time left
+ETA_INTERVAL = 2
+
+
+def default_book_factory(snapshot):
+    return Book(snapshot["title"], snapshot["structure"])
+
+
+def render_job_progress(job, book_factory=default_book_factory, poll_interval=0.25):
+    """
+    Render the job and keep polling it until it finishes. A rerun interrupts
+    the polling loop without affecting the job; the next run reattaches.
+    Returns the Book holding the rendered contents, or None if the job has
+    not produced a structure yet. The book is redrawn whenever the structure
+    grows, as it does while a streamed structure is being generated.
+    """
+    placeholder = st.empty()
+    eta_placeholder = st.empty()
+    book_placeholder = st.empty()
+    history = load_history(job.kind, section_model=job.params.get("section_model"))
+    eta_updated = 0
+    book = None
+    book_heading = None
+    rendered_lengths = {}
+    # Only toast notices raised while this page is watching
+    notice_offset = len(job.events_since(0))
+
+    while True:
+        job.refresh()
+        job.touch()
+        snapshot = job.snapshot()
+
+        display_statistics(
+            placeholder=placeholder,
+            statistics_text=snapshot["statistics_text"] or snapshot["stage"],
+        )
+
+        # Time left, from the pace of the sections written so far
+        if snapshot["status"] not in (COMPLETED, FAILED, CANCELLED) and time.time() - eta_updated > ETA_INTERVAL:
+            eta_placeholder.caption(f"⏱️ About {format_duration(estimate_remaining(job, history))} left")
+            eta_updated = time.time()
+
+        # A streamed structure grows while sections are written, and the
+        # title may arrive after it, so the book is rebuilt with placeholders
+        # for the sections that arrived
+        heading = (snapshot["title"], snapshot["structure"])
+        if snapshot["title"] and snapshot["structure"] and heading != book_heading:
+            with book_placeholder.container():
+                book = book_factory(snapshot)
+            book_heading = heading
+            rendered_lengths = {}
+
+        if book is not None:
+            for title, text in snapshot["contents"].items():
+                if rendered_lengths.get(title) != len(text):
+                    book.set_content(title, text)
+                    rendered_lengths[title] = len(text)
+
+        new_events = job.events_since(notice_offset)
+        notice_offset += len(new_events)
+        for event in new_events:
+            if event["type"] == "notice":
+                st.toast(f"⚠️ {event['message']}")
+
+        if snapshot["status"] in (COMPLETED, FAILED, CANCELLED):
+            eta_placeholder.empty()
+            break
+        time.sleep(poll_interval)
+
+    if snapshot["status"] == FAILED:
+        st.error(f"An error occurred: {snapshot['error']}")
+    elif snapshot["status"] == CANCELLED:
+        st.info("Generation cancelled.")
+    elif snapshot["reused_sections"]:
+        reused = len(snapshot["reused_sections"])
+        st.info(
+            f"Reused {reused} unchanged sections, "
+            f"regenerated {len(snapshot['completed_sections']) - reused}."
+        )
+
+    return book
@@ -10,7 +10,7 @@ NARRATIVE_STYLES = ["First Person", "Third Person Limited", "Third Person Omnisc
 TONES = ["Dark", "Humorous", "Inspirational", "Suspenseful", "Melancholic", "Whimsical", "Serious", "Romantic"]
 LANGUAGES = ["Hungarian","English", "Spanish", "French", "German", "Italian", "Portuguese", "Japanese", "Chinese", "Russian", "Arabic"]
 
-def render_novel_form(on_submit, button_disabled=False, button_text="Generate"):
+def render_novel_form(on_submit, button_disabled=False, button_text="Generate", parallel_available=True):
     st.sidebar.title("Novel Generator Settings")
 
     # Sidebar content for model selection
@@ -79,6 +79,15 @@ def render_novel_form(on_submit, button_disabled=False, button_text="Generate"):
         with col3:
             has_romance = st.checkbox("Include Romance Subplot")
             has_twist = st.checkbox("Include Plot Twist")
+            parallel_chapters = st.checkbox(
+                "Write chapters in parallel",
+                disabled=not parallel_available,
+                help=(
+                    "Faster: chapters are written at the same time from planned hand-offs, then their transitions are smoothed"
+                    if parallel_available
+                    else "Not available when jobs run on the task queue: queued novels are written section by section"
+                ),
+            )
             
         with col4:
             complexity = st.select_slider(
@@ -89,6 +98,14 @@ def render_novel_form(on_submit, button_disabled=False, button_text="Generate"):
                 "Pacing",
                 options=["Slow-burn", "Moderate", "Fast-paced", "Dynamic"]
             )
+
+        target_pages = st.number_input(
+            "Target length in pages (0 for no target)",
+            min_value=0,
+            max_value=1000,
+            value=0,
+            help="The pages are shared among the sections, so each one is written to its share of the length",
+        )
             
         st.subheader("Additional Instructions")
         additional_instructions = st.text_area(
@@ -151,6 +168,8 @@ def render_novel_form(on_submit, button_disabled=False, button_text="Generate"):
         additional_instructions,
         character_seeds,
         narrative_arc,
+        parallel_chapters,
+        target_pages,
         language,
         title_agent_model,
         character_agent_model,
@@ -0,0 +1,36 @@
+"""
+Component function to edit the outline of a finished book and regenerate it
+"""
+
+import json
+import streamlit as st
+
+
+def render_outline_editor(outline, key, disabled=False):
+    """
+    Show the outline as editable JSON. Returns the edited outline when the
+    user asks to regenerate, otherwise None. Sections whose title,
+    description and settings are unchanged are reused, not regenerated.
+    """
+    with st.expander("Edit outline and regenerate"):
+        st.caption(
+            "Edit section titles and descriptions, add or remove sections. "
+            "Only sections that changed are generated again."
+        )
+        edited = st.text_area(
+            "Outline (JSON)",
+            value=json.dumps(outline, indent=2, ensure_ascii=False),
+            height=300,
+            key=f"{key}_outline",
+            disabled=disabled,
+        )
+        if not st.button("Regenerate Changed Sections", key=f"{key}_regenerate", disabled=disabled):
+            return None
+
+    try:
+        edited_outline = json.loads(edited)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"The outline is not valid JSON: {e}") from e
+    if not isinstance(edited_outline, dict) or not edited_outline:
+        raise ValueError("The outline must be a JSON object of sections")
+    return edited_outline
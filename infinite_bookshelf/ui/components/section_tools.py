@@ -0,0 +1,30 @@
+"""
+Component function to regenerate or continue a single section of a finished book
+"""
+
+import streamlit as st
+
+
+def render_section_tools(section_titles, key, disabled=False):
+    """
+    Let the user pick one section to regenerate or continue.
+    Returns (section_title, mode, instructions) when requested, otherwise None.
+    """
+    with st.expander("Rewrite a section"):
+        section_title = st.selectbox("Section", section_titles, key=f"{key}_section", disabled=disabled)
+        instructions = st.text_input(
+            "Instructions for this section (optional)",
+            key=f"{key}_section_instructions",
+            disabled=disabled,
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            regenerate = st.button("Regenerate Section", key=f"{key}_regenerate_section", disabled=disabled)
+        with col2:
+            extend = st.button("Continue Section", key=f"{key}_continue_section", disabled=disabled)
+
+    if regenerate:
+        return section_title, "regenerate", instructions
+    if extend:
+        return section_title, "continue", instructions
+    return None
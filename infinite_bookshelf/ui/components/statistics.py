@@ -1,9 +1,11 @@
 """
-Component function to render inference statistics
+Component functions to render inference statistics and run estimates
 """
 
 import streamlit as st
 
+from ...jobs import describe_estimate, estimate_run
+
 
 def display_statistics(placeholder, statistics_text):
     with placeholder.container():
@@ -14,3 +16,11 @@ def display_statistics(placeholder, statistics_text):
                 st.markdown(statistics_text)
         else:
             placeholder.empty()
+
+
+def render_run_estimate(kind, **params):
+    """
+    Show what a run with these settings is expected to take, from the runs
+    recorded so far. Settings changed in a form only count once submitted.
+    """
+    st.caption(f"⏱️ Estimate: {describe_estimate(estimate_run(kind, params))}")
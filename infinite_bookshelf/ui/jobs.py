@@ -0,0 +1,112 @@
+"""
+Functions to attach streamlit sessions to background generation jobs
+"""
+
+import streamlit as st
+
+from ..jobs import (
+    job_store,
+    start_job,
+    resume_job,
+    run_on_job,
+    load_journal,
+    journal_path,
+    COMPLETED,
+)
+from ..taskqueue import TaskQueue, get_queued_job
+
+# Running jobs that no page has polled for this many seconds are cancelled
+ABANDON_TIMEOUT = 600
+
+
+@st.cache_resource
+def get_task_queue():
+    """
+    Returns the shared task queue when BOOKSHELF_QUEUE_DB is set. Jobs are
+    then run by `python -m infinite_bookshelf.taskqueue` workers and pages
+    only enqueue and watch them.
+    """
+    return TaskQueue.from_env()
+
+
+def get_session_job(kind):
+    """
+    Returns the job of this kind the session is watching, if any.
+    Falls back to the job id in the URL so a reconnecting browser
+    reattaches to its running job.
+    """
+    key = f"{kind}_job_id"
+    job_id = st.session_state.get(key) or st.query_params.get("job")
+    queue = get_task_queue()
+    if queue:
+        job = get_queued_job(queue, job_id)
+    else:
+        job = job_store.get(job_id) or load_session_journal(job_id)
+    if job is None or job.kind != kind:
+        return None
+    st.session_state[key] = job.id
+    return job
+
+
+def load_session_journal(job_id):
+    """
+    Rebuild a job this server no longer has in memory (e.g. after a
+    restart) from its journal, so the page can show and resume it
+    """
+    if not job_id or not job_id.isalnum():
+        return None
+    job = load_journal(journal_path(job_id), abandon_timeout=ABANDON_TIMEOUT)
+    if job is not None:
+        job_store.add(job)
+    return job
+
+
+def set_session_job(job):
+    st.session_state[f"{job.kind}_job_id"] = job.id
+    st.query_params["job"] = job.id
+
+
+def start_session_job(kind, pipeline, groq_provider, **params):
+    """
+    Start a generation job for this session: on the task queue if one is
+    configured, otherwise on a background thread of this server. Queue
+    workers use their own GROQ_API_KEY, so `groq_provider` is only used
+    for in-process jobs.
+    """
+    queue = get_task_queue()
+    if queue:
+        job_id = queue.enqueue(kind, pipeline.__name__, params, abandon_timeout=ABANDON_TIMEOUT)
+        job = get_queued_job(queue, job_id)
+    else:
+        job = start_job(kind, pipeline, groq_provider, abandon_timeout=ABANDON_TIMEOUT, journal=True, **params)
+    set_session_job(job)
+    return job
+
+
+def is_resumable(job):
+    """Failed, cancelled and interrupted in-process jobs can be resumed"""
+    return bool(job) and job.is_finished and job.status != COMPLETED and get_task_queue() is None
+
+
+def resume_session_job(job, pipeline, groq_provider):
+    """Generate only what the job is missing, reusing its journaled stages and sections"""
+    if groq_provider is None:
+        raise ValueError("Please provide a Groq API key to resume the generation")
+    job.touch()
+    return resume_job(job, pipeline, groq_provider)
+
+
+def rewrite_session_section(job, rewrite, groq_provider, section_title, mode, instructions=""):
+    """
+    Regenerate or continue one section of a finished job in the background;
+    the page follows it like any other run and only that section changes.
+    """
+    queue = get_task_queue()
+    params = {"section_title": section_title, "mode": mode, "instructions": instructions}
+    if queue:
+        queue.add_task(job.id, "rewrite", params)
+        return get_queued_job(queue, job.id)
+    if groq_provider is None:
+        raise ValueError("Please provide a Groq API key to rewrite the section")
+    job.touch()
+    return run_on_job(job, rewrite, groq_provider, **params)
@@ -19,21 +19,25 @@ st.sidebar.markdown("[Novel Generator](/novel_generator)")
 # 1: Import libraries
 import streamlit as st
 from groq import Groq
-import json
 
-from infinite_bookshelf.agents import (
-    generate_section,
-    generate_book_structure,
-    generate_book_title,
-)
-from infinite_bookshelf.inference import GenerationStatistics
-from infinite_bookshelf.tools import create_markdown_file, create_pdf_file
+from infinite_bookshelf.pipelines import run_book_pipeline, rewrite_book_section
 from infinite_bookshelf.ui.components import (
     render_groq_form,
-    display_statistics,
     render_download_buttons,
+    render_job_progress,
+    render_outline_editor,
+    render_run_estimate,
+    render_section_tools,
+)
+from infinite_bookshelf.ui import (
+    load_return_env,
+    ensure_states,
+    get_session_job,
+    start_session_job,
+    is_resumable,
+    resume_session_job,
+    rewrite_session_section,
 )
-from infinite_bookshelf.ui import Book, load_return_env, ensure_states
 
 
 # 2: Initialize env variables and session states
@@ -84,102 +88,91 @@ def empty_st():
     st.empty()
 
 
+rerun_when_finished = False
+
 try:
+    # Generation runs in a background job; reruns and reconnects reattach to it
+    job = get_session_job("book")
+    show_downloads = False
+
     if st.button("End Generation and Download Book"):
-        if "book" in st.session_state:
-            render_download_buttons(st.session_state.get("book"))
+        if job:
+            job.cancel()
+            job.wait(timeout=10)
+        show_downloads = True
+
+    if is_resumable(job) and st.button("Resume Generation"):
+        # Only the sections the interrupted run did not finish are generated
+        job = resume_session_job(job, run_book_pipeline, st.session_state.get("groq"))
+
+    # The form stays disabled while this session's job is running
+    st.session_state.button_disabled = bool(job and job.is_running)
 
     submitted, groq_input_key, topic_text, additional_instructions = render_groq_form(
         on_submit=disable,
         button_disabled=st.session_state.button_disabled,
         button_text=st.session_state.button_text,
     )
+    render_run_estimate("book", section_model="llama-3.3-70b-specdec")
 
     if submitted:
         if len(topic_text) < 10:
             raise ValueError("Book topic must be at least 10 characters long")
 
-        st.session_state.button_disabled = True
-        st.session_state.statistics_text = (
-            "Generating book title and structure in background...."
-        )
-
-        placeholder = st.empty()
-        display_statistics(
-            placeholder=placeholder, statistics_text=st.session_state.statistics_text
-        )
-
         if not GROQ_API_KEY:
             st.session_state.groq = Groq(api_key=groq_input_key)
 
-        # Step 1: Generate book structure using structure_writer agent
-        large_model_generation_statistics, book_structure = generate_book_structure(
-            prompt=topic_text,
-            additional_instructions=additional_instructions,
-            model="llama-3.3-70b-specdec",
-            groq_provider=st.session_state.groq,
-        )
+        if job:
+            job.cancel()
 
-        # Step 2: Generate book title using title_writer agent
-        st.session_state.book_title = generate_book_title(
-            prompt=topic_text,
-            model="llama-3.3-70b-specdec",
-            groq_provider=st.session_state.groq,
+        job = start_session_job(
+            "book",
+            run_book_pipeline,
+            st.session_state.groq,
+            topic=topic_text,
+            additional_instructions=additional_instructions,
+            title_model="llama-3.3-70b-specdec",
+            structure_model="llama-3.3-70b-specdec",
+            section_model="llama-3.3-70b-specdec",
         )
 
-        st.write(f"## {st.session_state.book_title}")
-
-        total_generation_statistics = GenerationStatistics(model_name="llama-3.3-70b-specdec")
-
-        # Step 3: Generate book section content using section_writer agent
-        try:
-            book_structure_json = json.loads(book_structure)
-            book = Book(st.session_state.book_title, book_structure_json)
-
-            if "book" not in st.session_state:
-                st.session_state.book = book
-
-            # Print the book structure to the terminal to show structure
-            print(json.dumps(book_structure_json, indent=2))
-
-            st.session_state.book.display_structure()
-
-            def stream_section_content(sections):
-                for title, content in sections.items():
-                    if isinstance(content, str):
-                        content_stream = generate_section(
-                            prompt=(title + ": " + content),
-                            additional_instructions=additional_instructions,
-                            model="llama-3.3-70b-specdec",
-                            groq_provider=st.session_state.groq,
-                        )
-                        for chunk in content_stream:
-                            # Check if GenerationStatistics data is returned instead of str tokens
-                            chunk_data = chunk
-                            if type(chunk_data) == GenerationStatistics:
-                                total_generation_statistics.add(chunk_data)
-
-                                st.session_state.statistics_text = str(
-                                    total_generation_statistics
-                                )
-                                display_statistics(
-                                    placeholder=placeholder,
-                                    statistics_text=st.session_state.statistics_text,
-                                )
-
-                            elif chunk != None:
-                                st.session_state.book.update_content(title, chunk)
-                    elif isinstance(content, dict):
-                        stream_section_content(content)
-
-            stream_section_content(book_structure_json)
-
-        except json.JSONDecodeError:
-            st.error("Failed to decode the book structure. Please try again.")
+    if job:
+        rerun_when_finished = job.is_running and not show_downloads
+        book = render_job_progress(job)
+        if book:
+            st.session_state.book = book
+            st.session_state.book_title = book.book_title
+
+        if job.is_finished and job.structure:
+            edited_structure = render_outline_editor(job.structure, key="book")
+            if edited_structure:
+                job = start_session_job(
+                    "book",
+                    run_book_pipeline,
+                    st.session_state.get("groq"),
+                    **{**job.params, "structure": edited_structure, "book_title": job.title},
+                )
+                rerun_when_finished = True
+
+            rewrite_request = render_section_tools(list(job.contents), key="book")
+            if rewrite_request:
+                section_title, mode, instructions = rewrite_request
+                job = rewrite_session_section(
+                    job, rewrite_book_section, st.session_state.get("groq"), section_title, mode, instructions
+                )
+                rerun_when_finished = True
+
+    if show_downloads and "book" in st.session_state:
+        render_download_buttons(st.session_state.get("book"))
 
 except Exception as e:
+    rerun_when_finished = False
     st.session_state.button_disabled = False
     st.error(e)
 
     if st.button("Clear"):
         st.rerun()
+
+if rerun_when_finished:
+    # Re-render the form now that the job no longer keeps it disabled
+    st.rerun()
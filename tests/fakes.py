@@ -0,0 +1,81 @@
+"""
+Stand-ins for the Groq client returning scripted completions and streams
+"""
+
+from types import SimpleNamespace
+
+
+def usage(prompt_tokens=10, completion_tokens=20):
+    return SimpleNamespace(
+        prompt_time=0.1,
+        completion_time=0.2,
+        prompt_tokens=prompt_tokens,
+        completion_tokens=completion_tokens,
+        total_time=0.3,
+    )
+
+
+def completion(content, prompt_tokens=10, completion_tokens=20):
+    """A non-streaming chat completion answering `content`"""
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=usage(prompt_tokens, completion_tokens),
+    )
+
+
+class FakeStream:
+    """
+    A completion stream of `parts`, ending with a usage chunk. With
+    `fail_after`, raises ConnectionError instead of yielding that part.
+    """
+
+    def __init__(self, parts, fail_after=None, with_usage=True):
+        self.parts = parts
+        self.fail_after = fail_after
+        self.with_usage = with_usage
+        self.closed = False
+
+    def __iter__(self):
+        for index, part in enumerate(self.parts):
+            if index == self.fail_after:
+                raise ConnectionError("disconnected")
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))], x_groq=None)
+        if self.with_usage:
+            yield SimpleNamespace(
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=None))],
+                x_groq=SimpleNamespace(usage=usage(completion_tokens=len(self.parts))),
+            )
+
+    def close(self):
+        self.closed = True
+
+
+class FakeGroq:
+    """
+    Client answering calls with `responses` in order: a completion, a
+    stream, an exception to raise, or a function of the call's parameters.
+    Every call's parameters are kept in `calls`.
+    """
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **params):
+        self.calls.append(params)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        if callable(response):
+            return response(params)
+        return response
+
+
+class RateLimitError(Exception):
+    """A 429 of the API, asking to retry after 10 ms"""
+
+    headers = {"retry-after": "0.01"}
+
+    def __init__(self):
+        super().__init__("Error code: 429 - rate_limit_exceeded")
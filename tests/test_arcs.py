@@ -0,0 +1,57 @@
+from infinite_bookshelf.jobs import Job
+from infinite_bookshelf.pipelines.arcs import flush_arc_updates, new_arc_state, queue_arc_update
+from infinite_bookshelf.taskqueue.stages import STAGES
+
+
+class FakeTracker:
+    """Arc tracker patching the characters a prompt is about"""
+
+    model = "llama3-70b-8192"
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, prompt):
+        self.submitted.append(prompt)
+
+    def patch(self, prompt):
+        return {name: {"arc": f"grew in {name}'s chapter"} for name in ("Alice", "Bob") if name in prompt["characters"]}
+
+
+def chapter_state(characters, title, text):
+    state = {
+        **new_arc_state(),
+        "characters": characters,
+        "character_goals": {},
+        "completed_sections": "",
+    }
+    return queue_arc_update(state, title, "description", text)
+
+
+def test_flush_merges_the_pending_arcs_of_every_chapter():
+    characters = {"Alice": {"arc": "start"}, "Bob": {"arc": "start"}}
+    job = Job("novel")
+    tracker = FakeTracker()
+
+    state = flush_arc_updates(job, [
+        chapter_state(characters, "Chapter 1", "Alice left home."),
+        chapter_state(characters, "Chapter 2", "Bob stayed behind."),
+    ], tracker)
+
+    assert len(tracker.submitted) == 2
+    assert state["characters"] == {"Alice": {"arc": "grew in Alice's chapter"}, "Bob": {"arc": "grew in Bob's chapter"}}
+    assert state["arc_updates"] == [] and state["pending_arc_sections"] == []
+    assert job.data["character_arcs"] == state["characters"]
+
+
+def test_queued_novel_ends_with_an_arcs_stage(monkeypatch):
+    from infinite_bookshelf.taskqueue import stages
+
+    sections = [{"title": "S1"}, {"title": "S2"}]
+    monkeypatch.setattr(stages, "plan_novel", lambda job, groq_provider, **params: (sections, {"characters": {}}))
+
+    _, new_tasks = STAGES["run_novel_pipeline"]["plan"](Job("novel"), None, {}, {}, None)
+
+    assert [stage for stage, _, _ in new_tasks] == ["section", "section", "arcs"]
+    assert all(chained for _, _, chained in new_tasks)
+    assert "arcs" in STAGES["run_novel_pipeline"]
@@ -0,0 +1,46 @@
+import pytest
+
+from infinite_bookshelf.jobs import Job
+from infinite_bookshelf.pipelines import plan_cache
+from infinite_bookshelf.pipelines.book import stream_book_plan
+
+from .fakes import FakeGroq, FakeStream
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("BOOKSHELF_PLAN_CACHE", str(tmp_path / "plans.db"))
+    monkeypatch.setenv("BOOKSHELF_SECTION_STORE", str(tmp_path / "sections"))
+    plan_cache._plan_cache.cache_clear()
+    yield
+    plan_cache._plan_cache.cache_clear()
+
+
+def plan(structure_text):
+    job = Job("book")
+    groq = FakeGroq([FakeStream([structure_text[index:index + 9] for index in range(0, len(structure_text), 9)])])
+    sections = list(stream_book_plan(job, groq, "Rivers of Europe", book_title="Rivers"))
+    cached = plan_cache.get_plan_cache().lookup("book_structure", "Rivers of Europe", {
+        "instructions": "", "model": "llama-3.3-70b-specdec", "long": False,
+    })[0]
+    return sections, cached
+
+
+def test_a_whole_streamed_structure_is_cached():
+    sections, cached = plan('{"Rhine": "Source to sea", "Danube": "Ten countries"}')
+
+    assert [title for title, _ in sections] == ["Rhine", "Danube"]
+    assert cached == {"Rhine": "Source to sea", "Danube": "Ten countries"}
+
+
+def test_a_structure_with_skipped_members_is_not_cached():
+    sections, cached = plan('{"Rhine": "Source to sea", "Danube": [}, "Volga": "Longest"}')
+
+    assert "Rhine" in [title for title, _ in sections]
+    assert cached is None
+
+
+def test_a_structure_not_matching_the_schema_is_not_cached():
+    _, cached = plan('{"Rhine": "Source to sea", "Danube": 42}')
+
+    assert cached is None
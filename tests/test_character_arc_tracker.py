@@ -0,0 +1,29 @@
+import json
+
+from infinite_bookshelf.agents.character_arc_tracker import NO_CHANGES, update_character_arcs
+
+from .fakes import FakeGroq, FakeStream, RateLimitError
+
+
+def update(groq):
+    return update_character_arcs("{}", "plot point", "sections", "{}", "model", groq)
+
+
+def test_rate_limited_update_is_retried_on_the_shared_path():
+    patch = '{"Alice": {"emotional_growth": "braver"}}'
+    groq = FakeGroq([RateLimitError(), FakeStream([patch[:10], patch[10:]])])
+
+    statistics, arc_patch = update(groq)
+
+    assert json.loads(arc_patch) == {"Alice": {"emotional_growth": "braver"}}
+    assert len(groq.calls) == 2 and all(call["stream"] for call in groq.calls)
+    assert statistics.output_tokens == 2
+
+
+def test_unrepairable_update_keeps_the_arcs():
+    groq = FakeGroq([FakeStream(["no json here"]), FakeStream(["still none"])])
+
+    _, arc_patch = update(groq)
+
+    assert arc_patch == NO_CHANGES
+    assert len(groq.calls) == 2
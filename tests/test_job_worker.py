@@ -0,0 +1,37 @@
+import threading
+import time
+
+from infinite_bookshelf.jobs import CANCELLED, FAILED, Job, JobStore, run_job, run_on_job
+
+
+def test_a_failed_job_cancels_the_work_it_left_running():
+    job = Job("book")
+
+    def pipeline(job, groq_provider):
+        raise RuntimeError("boom")
+
+    run_job(job, pipeline, None)
+
+    assert job.status == FAILED
+    assert job.cancel_token.cancelled
+
+
+def test_running_a_job_again_waits_for_the_threads_of_its_last_run():
+    job = Job("book")
+    job.set_status(CANCELLED)
+    seen = []
+
+    def leftover():
+        # Work of the last run that only stops at its next cancellation check
+        time.sleep(0.2)
+        seen.append(job.cancel_token)
+
+    thread = threading.Thread(target=leftover, name=f"{job.id}-tasks_0", daemon=True)
+    thread.start()
+    old_token = job.cancel_token
+
+    run_on_job(job, lambda job, groq_provider: None, None, store=JobStore())
+
+    assert not thread.is_alive()
+    assert seen == [old_token]
+    assert job.cancel_token is not old_token
@@ -0,0 +1,67 @@
+import json
+import os
+import time
+
+import pytest
+
+from infinite_bookshelf.jobs import FAILED, RUNNING, Job, attach_journal, load_journal
+
+
+def running_journal(tmp_path):
+    path = str(tmp_path / "job.jsonl")
+    job = Job("book", params={"topic": "Rivers"})
+    attach_journal(job, path)
+    job.set_status(RUNNING)
+    job.set_title("Rivers")
+    return job, path
+
+
+def records(path):
+    with open(path, encoding="utf-8") as journal_file:
+        return [json.loads(line) for line in journal_file]
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    job, path = running_journal(tmp_path)
+    with open(path, "a", encoding="utf-8") as journal_file:
+        journal_file.write('{"type": "section_done", "sect')
+
+    loaded = load_journal(path)
+
+    assert loaded.id == job.id and loaded.title == "Rivers"
+    assert loaded.status == FAILED
+    # The interruption is journaled on a line of its own
+    assert records(path)[-1]["status"] == FAILED
+
+
+def test_corrupt_line_in_the_middle_raises(tmp_path):
+    _, path = running_journal(tmp_path)
+    with open(path, encoding="utf-8") as journal_file:
+        lines = journal_file.readlines()
+    lines.insert(1, "{not json\n")
+    with open(path, "w", encoding="utf-8") as journal_file:
+        journal_file.writelines(lines)
+
+    with pytest.raises(ValueError, match="line 2 is corrupt"):
+        load_journal(path)
+
+
+def test_recent_journal_is_only_marked_interrupted_in_memory(tmp_path):
+    _, path = running_journal(tmp_path)
+    written = len(records(path))
+
+    loaded = load_journal(path, abandon_timeout=600)
+
+    assert loaded.status == FAILED
+    assert len(records(path)) == written
+
+
+def test_abandoned_journal_records_the_interruption(tmp_path):
+    _, path = running_journal(tmp_path)
+    old = time.time() - 3600
+    os.utime(path, (old, old))
+
+    loaded = load_journal(path, abandon_timeout=600)
+
+    assert loaded.status == FAILED
+    assert records(path)[-1]["status"] == FAILED
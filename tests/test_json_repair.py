@@ -0,0 +1,40 @@
+import pytest
+
+from infinite_bookshelf.agents.schemas import BookStructure, Characters, NovelStructure, parse_json_output
+from infinite_bookshelf.tools.json_repair import repair_json
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ('{"a": 1}', {"a": 1}),
+        ('Here you go:\n```json\n{"a": 1}\n```\nEnjoy!', {"a": 1}),
+        ('{"a": [1, 2,], "b": 3,}', {"a": [1, 2], "b": 3}),
+        ('{"a": "line one\nline two"}', {"a": "line one\nline two"}),
+        ('{"a": "she said "hi" twice"}', {"a": 'she said "hi" twice'}),
+        ('{"a": "one", "b": {"c": "tw', {"a": "one", "b": {"c": "tw"}}),
+        ('{"a": "one", "b":', {"a": "one"}),
+    ],
+)
+def test_repair_json(text, expected):
+    assert repair_json(text) == expected
+
+
+def test_repair_json_without_object_raises():
+    with pytest.raises(ValueError):
+        repair_json("Sorry, I cannot help with that.")
+
+
+def test_parse_json_output_validates_and_normalises():
+    characters = parse_json_output('{"Alice": {"role": ["hero", "narrator"]}}', Characters)
+    assert characters == {"Alice": {"role": "hero, narrator"}}
+
+    structure = parse_json_output('{"Chapter 1": {"description": "x", "dramaturgy_level": "12"}}', NovelStructure)
+    assert structure["Chapter 1"]["dramaturgy_level"] == 10
+
+
+def test_parse_json_output_rejects_wrong_shape():
+    with pytest.raises(ValueError):
+        parse_json_output("{}", BookStructure)
+    with pytest.raises(ValueError):
+        parse_json_output('{"Intro": 3}', BookStructure)
@@ -0,0 +1,41 @@
+from infinite_bookshelf.tools.json_stream import StreamingObjectParser
+
+
+def feed_all(parser, chunks):
+    members = []
+    for chunk in chunks:
+        members.extend(parser.feed(chunk))
+    return members + parser.close()
+
+
+def test_members_are_returned_as_soon_as_complete():
+    parser = StreamingObjectParser()
+
+    assert parser.feed('```json\n{"Intro": "about') == []
+    assert parser.feed(' it", "Part": {"A"') == [("Intro", "about it")]
+    assert parser.feed(': "a, b", "B": "}"}') == []
+    assert parser.feed("}\n```") == [("Part", {"A": "a, b", "B": "}"})]
+    assert parser.close() == []
+
+
+def test_single_characters_stream_like_whole_text():
+    text = '{"a": "x \\" y", "b": [1, {"c": 2}], "d": null}'
+
+    members = feed_all(StreamingObjectParser(), list(text))
+
+    assert members == [("a", 'x " y'), ("b", [1, {"c": 2}]), ("d", None)]
+
+
+def test_truncated_object_recovers_last_member():
+    members = feed_all(StreamingObjectParser(), ['{"a": "one", "b": "cut of'])
+
+    assert members == [("a", "one"), ("b", "cut of")]
+
+
+def test_unrecoverable_member_is_collected_not_raised():
+    parser = StreamingObjectParser()
+
+    members = feed_all(parser, ['{"a": "one", : , "c": "three"}'])
+
+    assert ("a", "one") in members and ("c", "three") in members
+    assert parser.failed
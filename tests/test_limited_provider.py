@@ -0,0 +1,62 @@
+import pytest
+
+from infinite_bookshelf.agents.plot_writer import generate_plot_structure
+from infinite_bookshelf.inference.limited_provider import RateLimitedProvider
+from infinite_bookshelf.inference.rate_limiter import GroqRateLimiter
+
+from .fakes import FakeGroq, FakeStream, RateLimitError, completion
+
+PARAMS = {"messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 900}
+
+
+def test_completion_settles_reservation_with_actual_usage():
+    limiter = GroqRateLimiter(tokens_per_minute=10000)
+    provider = RateLimitedProvider(FakeGroq([completion("ok", prompt_tokens=100, completion_tokens=50)]), limiter)
+    provider.chat.completions.create(**PARAMS)
+
+    assert limiter.headroom() == limiter.effective_tpm_limit - 150
+
+
+def test_finished_stream_settles_reservation_once():
+    limiter = GroqRateLimiter(tokens_per_minute=10000)
+    provider = RateLimitedProvider(FakeGroq([FakeStream(["a", "b"])]), limiter)
+    stream = provider.chat.completions.create(**PARAMS, stream=True)
+    list(stream)
+    stream.close()
+
+    # The fake reports 10 prompt tokens and one completion token per part
+    assert limiter.headroom() == limiter.effective_tpm_limit - 12
+
+
+def test_stream_closed_before_usage_releases_reservation():
+    limiter = GroqRateLimiter(tokens_per_minute=10000)
+    provider = RateLimitedProvider(FakeGroq([FakeStream(["a", "b", "c"])]), limiter)
+    stream = provider.chat.completions.create(**PARAMS, stream=True)
+    assert limiter.headroom() < limiter.effective_tpm_limit
+
+    chunks = iter(stream)
+    next(chunks)
+    stream.close()
+
+    assert limiter.headroom() == limiter.effective_tpm_limit
+
+
+def test_rate_limit_error_releases_reservation_and_pauses_limiter():
+    limiter = GroqRateLimiter(tokens_per_minute=10000)
+    provider = RateLimitedProvider(FakeGroq([RateLimitError()]), limiter)
+
+    with pytest.raises(RateLimitError):
+        provider.chat.completions.create(**PARAMS)
+
+    assert limiter.paused and limiter.headroom() == 0
+    limiter.pause_until = None
+    assert limiter.headroom() == limiter.effective_tpm_limit
+
+
+def test_plot_call_is_counted_once():
+    limiter = GroqRateLimiter(tokens_per_minute=10000)
+    provider = RateLimitedProvider(FakeGroq([completion('{"Plot_Point_1": "start"}', prompt_tokens=100, completion_tokens=50)]), limiter)
+
+    generate_plot_structure("concept", "{}", "genre", "style", "", "model", provider)
+
+    assert limiter.headroom() == limiter.effective_tpm_limit - 150
@@ -0,0 +1,29 @@
+import time
+
+import pytest
+
+from infinite_bookshelf.jobs import FAILED, RUNNING, Job
+from infinite_bookshelf.jobs.metrics import estimate_remaining
+
+
+def section(title, at):
+    return [
+        {"type": "section", "time": at - 1, "section": title, "text": ""},
+        {"type": "section_done", "time": at, "section": title, "text": "words", "reused": False},
+    ]
+
+
+def test_a_resumed_job_is_paced_by_its_latest_run():
+    now = time.time()
+    job = Job("book")
+    job.replay(
+        [{"type": "status", "time": now - 4000, "status": RUNNING},
+         {"type": "structure", "time": now - 4000, "structure": {f"S{index}": "d" for index in range(6)}}]
+        + section("S0", now - 3990) + section("S1", now - 3980)
+        + [{"type": "status", "time": now - 3970, "status": FAILED, "error": "Generation was interrupted"},
+           {"type": "status", "time": now - 20, "status": RUNNING}]
+        + section("S2", now - 10) + section("S3", now - 1)
+    )
+
+    # Two sections left at the pace of the latest run: two sections 11 seconds after its first one began
+    assert estimate_remaining(job, history=[]) == pytest.approx(11, abs=1)
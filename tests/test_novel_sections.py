@@ -0,0 +1,56 @@
+import pytest
+
+from infinite_bookshelf.jobs import Job
+from infinite_bookshelf.pipelines import novel
+
+SECTION = {"title": "S1", "chapter": "C1", "description": "d", "depth": 0, "parent": None,
+           "dramaturgy_level": 5, "setting_focus": False, "character_focus": False}
+
+
+class Recorder:
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        self.closed = False
+        Recorder.instances.append(self)
+
+    def close(self):
+        self.closed = True
+
+
+def fail(*args, **kwargs):
+    raise RuntimeError("boom")
+
+
+def test_write_novel_section_closes_the_summarizer_it_made(monkeypatch):
+    Recorder.instances = []
+    monkeypatch.setattr(novel, "Summarizer", Recorder)
+    monkeypatch.setattr(novel, "advance_summaries", fail)
+
+    with pytest.raises(RuntimeError):
+        novel.write_novel_section(Job("novel"), None, SECTION, {}, "genre", "style", "tone")
+
+    assert Recorder.instances and all(instance.closed for instance in Recorder.instances)
+
+
+def test_write_novel_section_closes_the_arc_tracker_it_made(monkeypatch):
+    shared = Recorder()
+    Recorder.instances = []
+    monkeypatch.setattr(novel, "ArcTracker", Recorder)
+    monkeypatch.setattr(novel, "advance_summaries", fail)
+
+    with pytest.raises(RuntimeError):
+        novel.write_novel_section(Job("novel"), None, SECTION, {}, "genre", "style", "tone", summarizer=shared)
+
+    assert Recorder.instances and all(instance.closed for instance in Recorder.instances)
+    assert not shared.closed
+
+
+def test_write_novel_section_leaves_a_shared_summarizer_open(monkeypatch):
+    shared = Recorder()
+    monkeypatch.setattr(novel, "advance_summaries", fail)
+
+    with pytest.raises(RuntimeError):
+        novel.write_novel_section(Job("novel"), None, SECTION, {}, "genre", "style", "tone", summarizer=shared, arc_tracker=Recorder())
+
+    assert not shared.closed
@@ -0,0 +1,97 @@
+import pytest
+
+from infinite_bookshelf.agents import is_fallback_characters
+from infinite_bookshelf.agents.character_writer import FALLBACK_ROLE
+from infinite_bookshelf.jobs import Job
+from infinite_bookshelf.pipelines import plan_cache
+from infinite_bookshelf.pipelines.plan_cache import PlanCache, cached_plan
+
+ADVANCED = (
+    "Use the following parameters:\nWriting Style: Engaging and practical, with worked examples in every chapter\n"
+    "Complexity Level: Intermediate readers who know the basics of programming and want to go further"
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PlanCache(str(tmp_path / "plans.db"))
+
+
+def test_similar_topics_with_the_same_instructions_share_a_plan(cache):
+    cache.put("book_structure", "Basics of LLMs", {"instructions": ADVANCED, "model": "m"}, {"Intro": "What an LLM is"})
+
+    plan, similarity = cache.lookup("book_structure", "LLM basics", {"instructions": ADVANCED, "model": "m"})
+
+    assert plan == {"Intro": "What an LLM is"}
+    assert similarity >= cache.threshold
+
+
+def test_shared_instructions_do_not_make_unrelated_topics_similar(cache):
+    cache.put("book_structure", "Learning Python", {"instructions": ADVANCED, "model": "m"}, {"Python": "..."})
+
+    plan, similarity = cache.lookup("book_structure", "Learning Java", {"instructions": ADVANCED, "model": "m"})
+
+    assert plan is None
+    assert similarity < cache.threshold
+
+
+def test_plans_are_only_reused_with_the_same_instructions_and_params(cache):
+    cache.put("book_structure", "Learning Python", {"instructions": ADVANCED, "model": "m"}, {"Python": "..."})
+
+    assert cache.lookup("book_structure", "Learning Python", {"instructions": "Short and funny", "model": "m"})[0] is None
+    assert cache.lookup("book_structure", "Learning Python", {"instructions": ADVANCED, "model": "other"})[0] is None
+    assert cache.lookup("book_title", "Learning Python", {"instructions": ADVANCED, "model": "m"})[0] is None
+
+
+def test_hits_and_misses_are_shared_between_cache_instances(cache):
+    cache.put("book_title", "Learning Python", {"model": "m"}, "Python in Practice")
+    other = PlanCache(cache.path)
+
+    assert other.lookup("book_title", "Learning Python", {"model": "m"})[0] == "Python in Practice"
+    assert other.lookup("book_title", "Cooking for two", {"model": "m"})[0] is None
+    assert cache.hit_rates() == {"book_title": {"hits": 1, "misses": 1, "hit_rate": 0.5}}
+
+
+def test_the_least_recently_used_plans_are_evicted(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.db"), max_entries=2)
+    cache.put("book_title", "Learning Python", {}, "Python")
+    cache.put("book_title", "Growing tomatoes", {}, "Tomatoes")
+    cache.lookup("book_title", "Learning Python", {})
+    cache.put("book_title", "Sailing alone", {}, "Sailing")
+
+    assert cache.lookup("book_title", "Growing tomatoes", {})[0] is None
+    assert cache.lookup("book_title", "Learning Python", {})[0] == "Python"
+
+
+def test_cached_plan_generates_once_and_records_the_lookup(tmp_path, monkeypatch):
+    monkeypatch.setenv("BOOKSHELF_PLAN_CACHE", str(tmp_path / "plans.db"))
+    plan_cache._plan_cache.cache_clear()
+    calls = []
+
+    def generate():
+        calls.append(1)
+        return "Python in Practice"
+
+    first, second = Job("book"), Job("book")
+    assert cached_plan(first, "book_title", "Learning Python", generate, model="m") == "Python in Practice"
+    assert cached_plan(second, "book_title", "Learning Python", generate, model="m") == "Python in Practice"
+    assert cached_plan(Job("book"), "book_title", "Learning Python", generate, reuse=False, model="m") == "Python in Practice"
+
+    assert len(calls) == 2
+    assert first.data["plan_cache"]["book_title"]["reused"] is False
+    assert second.data["plan_cache"]["book_title"] == {"reused": True, "similarity": 1.0}
+
+
+def test_plans_rejected_by_cacheable_are_not_stored(tmp_path, monkeypatch):
+    monkeypatch.setenv("BOOKSHELF_PLAN_CACHE", str(tmp_path / "plans.db"))
+    plan_cache._plan_cache.cache_clear()
+    placeholders = {"Character 1": {"role": FALLBACK_ROLE}}
+
+    def cacheable(characters):
+        return not is_fallback_characters(characters)
+
+    cached_plan(Job("novel"), "characters", "A heist", lambda: placeholders, cacheable=cacheable, model="m")
+    generated = cached_plan(Job("novel"), "characters", "A heist", lambda: {"Alice": {"role": "Thief"}}, cacheable=cacheable, model="m")
+    reused = cached_plan(Job("novel"), "characters", "A heist", lambda: placeholders, cacheable=cacheable, model="m")
+
+    assert generated == reused == {"Alice": {"role": "Thief"}}
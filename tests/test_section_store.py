@@ -0,0 +1,24 @@
+from infinite_bookshelf.agents import PROMPTS
+from infinite_bookshelf.pipelines.section_store import section_key
+
+
+def test_key_changes_only_with_the_version_of_its_own_template(monkeypatch):
+    key = section_key("summary", template="summary", text="Alice left.")
+
+    monkeypatch.setattr(PROMPTS["novel_section"], "version", PROMPTS["novel_section"].version + 1)
+    assert section_key("summary", template="summary", text="Alice left.") == key
+
+    monkeypatch.setattr(PROMPTS["summary"], "version", PROMPTS["summary"].version + 1)
+    assert section_key("summary", template="summary", text="Alice left.") != key
+
+
+def test_key_depends_on_every_input():
+    assert section_key("book", title="A") == section_key("book", title="A")
+    assert section_key("book", title="A") != section_key("book", title="B")
+    assert section_key("book", title="A") != section_key("novel", title="A")
+
+
+def test_every_template_starts_with_fixed_text():
+    for template in PROMPTS.values():
+        fixed = template.user.split("{")[0].split("<")[0]
+        assert fixed.strip(), template.name
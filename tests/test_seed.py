@@ -0,0 +1,50 @@
+import io
+
+import pytest
+
+from infinite_bookshelf.api.server import BookshelfAPI
+from infinite_bookshelf.cli import build_tasks
+from infinite_bookshelf.jobs import Job
+from infinite_bookshelf.pipelines import seed
+
+
+@pytest.fixture(autouse=True)
+def section_store(tmp_path, monkeypatch):
+    monkeypatch.setenv("BOOKSHELF_SECTION_STORE", str(tmp_path / "sections"))
+
+
+def test_load_seed_file_returns_its_passages():
+    text = "\n\n".join(f"Paragraph {index} about rivers and {'water ' * 100}" for index in range(4))
+
+    passages = seed.load_seed_file(io.BytesIO(text.encode("utf-8")), "notes.txt")
+
+    assert len(passages) == 4
+    assert seed.load_seed_file(io.BytesIO(text.encode("utf-8")), "notes.txt") == passages
+
+
+def test_passages_are_indexed_as_given():
+    passages = ["Rivers carry water to the sea.", "Mountains are made of rock."]
+
+    found = seed.retrieve_seed(Job("advanced_book"), passages, "rock of mountains", k=1)
+
+    assert found == ["Mountains are made of rock."]
+    assert seed.seed_index(tuple(passages)).passages == passages
+
+
+def test_cli_seed_file_adds_its_passages_to_the_seed_content(tmp_path):
+    seed_file = tmp_path / "notes.md"
+    seed_file.write_text("Rivers carry water to the sea.", encoding="utf-8")
+
+    task = build_tasks([{"pipeline": "advanced", "topic": "Rivers", "seed_content": "Typed notes.", "seed_file": str(seed_file)}], "book")[0]
+
+    assert task["params"]["seed_content"] == ["Typed notes.", "Rivers carry water to the sea."]
+
+
+def test_cli_reports_a_missing_seed_file_as_an_invalid_row(tmp_path):
+    with pytest.raises(ValueError, match="Row 1: cannot read seed file"):
+        build_tasks([{"pipeline": "advanced", "topic": "Rivers", "seed_file": str(tmp_path / "missing.txt")}], "book")
+
+
+def test_api_does_not_read_local_seed_files():
+    with pytest.raises(ValueError, match="seed_file"):
+        BookshelfAPI().start({"pipeline": "advanced", "topic": "Rivers", "seed_file": "/etc/passwd"})
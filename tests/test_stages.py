@@ -0,0 +1,12 @@
+from infinite_bookshelf.jobs import Job
+from infinite_bookshelf.taskqueue import stages
+from infinite_bookshelf.taskqueue.stages import STAGES
+
+
+def test_queued_novel_tells_that_chapters_are_not_written_in_parallel(monkeypatch):
+    monkeypatch.setattr(stages, "plan_novel", lambda job, groq_provider, **params: ([], {"characters": {}}))
+    job = Job("novel")
+
+    STAGES["run_novel_pipeline"]["plan"](job, None, {"parallel_chapters": True}, {}, None)
+
+    assert any("section by section" in str(event.get("message", "")) for event in job.events_since(0))
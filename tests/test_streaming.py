@@ -0,0 +1,52 @@
+import pytest
+
+from infinite_bookshelf.inference import CancellationToken, GenerationCancelled, GenerationStatistics, StreamNotice
+from infinite_bookshelf.inference.streaming import stream_with_checkpoints
+
+from .fakes import FakeGroq, FakeStream
+
+PARAMS = {"messages": [{"role": "user", "content": "Write"}], "max_tokens": 1000, "stream": True}
+
+
+def text_of(chunks):
+    return "".join(chunk for chunk in chunks if isinstance(chunk, str))
+
+
+def test_interrupted_stream_resumes_from_partial_text():
+    groq = FakeGroq([FakeStream(["Once ", "upon ", "a time"], fail_after=2), FakeStream(["a time."])])
+    chunks = list(stream_with_checkpoints(groq, PARAMS, "model", base_delay=0))
+
+    assert text_of(chunks) == "Once upon a time."
+    assert any(isinstance(chunk, StreamNotice) for chunk in chunks)
+    assert any(isinstance(chunk, GenerationStatistics) for chunk in chunks)
+    continuation = groq.calls[1]["messages"]
+    assert continuation[-1] == {"role": "assistant", "content": "Once upon "}
+
+
+def test_initial_text_is_continued_but_not_yielded():
+    groq = FakeGroq([FakeStream([" and more."])])
+    chunks = list(stream_with_checkpoints(groq, PARAMS, "model", initial_text="Existing text"))
+
+    assert text_of(chunks) == " and more."
+    assert groq.calls[0]["messages"][-1] == {"role": "assistant", "content": "Existing text"}
+
+
+def test_cancelled_token_closes_stream():
+    token = CancellationToken()
+    stream = FakeStream(["a", "b", "c"])
+    chunks = stream_with_checkpoints(FakeGroq([stream]), PARAMS, "model", cancel_token=token)
+
+    assert next(chunks) == "a"
+    token.cancel()
+    with pytest.raises(GenerationCancelled):
+        list(chunks)
+    assert stream.closed
+
+
+def test_continuation_budget_counts_only_tokens_generated_in_this_call():
+    groq = FakeGroq([FakeStream(["x" * 400, "y"], fail_after=1), FakeStream(["."])])
+    list(stream_with_checkpoints(groq, PARAMS, "model", base_delay=0, initial_text="word " * 6000))
+
+    assert groq.calls[0]["max_tokens"] == 1000
+    # 400 characters were generated before the failure, about 100 tokens
+    assert groq.calls[1]["max_tokens"] == 900
@@ -0,0 +1,89 @@
+from concurrent.futures import Future
+
+from infinite_bookshelf.pipelines import summaries
+from infinite_bookshelf.pipelines.summaries import (
+    CHAPTER_SUMMARY_WORDS,
+    SECTION_SUMMARY_WORDS,
+    add_section_summary,
+    advance_summaries,
+    compose_summary,
+    new_summary_state,
+)
+
+
+class FakeSummarizer:
+    """Summarizes a text as its word count, recording every request"""
+
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, text, words):
+        self.submitted.append((text, words))
+        future = Future()
+        future.set_result(self.summary(text, words))
+        return future
+
+    def summarize(self, text, words):
+        return self.submit(text, words).result()
+
+    @staticmethod
+    def summary(text, words):
+        return f"<{words} words of {len(text.split())}>"
+
+
+def write(state, title, chapter, contents, summarizer):
+    state = advance_summaries(state, chapter, contents, summarizer)
+    contents[title] = f"{title} text " * 50
+    return add_section_summary(state, title, chapter, contents[title], summarizer)
+
+
+def test_section_summary_replaces_excerpt_one_section_later():
+    summarizer, contents = FakeSummarizer(), {}
+    state = write(new_summary_state(), "S1", "C1", contents, summarizer)
+    assert state["section_summaries"][0]["final"] is False
+    assert "S1 text" in state["summary"]
+
+    state = write(state, "S2", "C1", contents, summarizer)
+    assert state["section_summaries"][0]["final"] is False
+    state = advance_summaries(state, "C1", contents, summarizer)
+
+    first = state["section_summaries"][0]
+    assert first["final"] and first["summary"] == f"S1: <{SECTION_SUMMARY_WORDS} words of 100>"
+
+
+def test_finished_chapter_is_folded_into_a_chapter_summary():
+    summarizer, contents = FakeSummarizer(), {}
+    state = new_summary_state()
+    for title, chapter in [("S1", "C1"), ("S2", "C1"), ("S3", "C2"), ("S4", "C2"), ("S5", "C3")]:
+        state = write(state, title, chapter, contents, summarizer)
+    state = advance_summaries(state, "C3", contents, summarizer)
+
+    assert [chapter for chapter, _ in state["chapter_summaries"]] == ["C1"]
+    assert state["chapter_summaries"][0][1].startswith(f"<{CHAPTER_SUMMARY_WORDS} words")
+    assert all(entry["chapter"] != "C1" for entry in state["section_summaries"])
+    assert state["summary"].startswith("C1: ")
+
+
+def test_old_chapters_fold_into_book_summary_over_budget(monkeypatch):
+    monkeypatch.setattr(summaries, "SUMMARY_TOKEN_BUDGET", 20)
+    summarizer, contents = FakeSummarizer(), {}
+    state = new_summary_state()
+    for index in range(1, 8):
+        state = write(state, f"S{index}", f"C{index}", contents, summarizer)
+        state = advance_summaries(state, f"C{index}", contents, summarizer)
+
+    assert state["book_summary"]
+    assert state["summary"].startswith("Story so far: ")
+
+
+def test_compose_summary_drops_oldest_parts_over_budget():
+    state = {
+        **new_summary_state(),
+        "book_summary": "book",
+        "chapter_summaries": [["C1", "x" * 400], ["C2", "y" * 40]],
+    }
+
+    summary = compose_summary(state, budget=30)
+
+    assert summary.startswith("Story so far: book")
+    assert "C2: " in summary and "C1: " not in summary
@@ -0,0 +1,78 @@
+import threading
+
+import pytest
+
+from infinite_bookshelf.jobs import Job
+from infinite_bookshelf.pipelines.task_graph import TaskGraph
+
+
+def test_tasks_get_the_results_they_require():
+    graph = TaskGraph(Job("book"))
+    graph.add("characters", lambda: ["Alice"])
+    graph.add("plot", lambda characters: f"{characters[0]} leaves", requires=["characters"])
+    graph.add("title", lambda story: story.upper(), requires={"story": "plot"})
+
+    assert graph.run() == {"characters": ["Alice"], "plot": "Alice leaves", "title": "ALICE LEAVES"}
+
+
+def test_a_failed_task_fails_the_tasks_depending_on_it():
+    def fail():
+        raise RuntimeError("boom")
+
+    graph = TaskGraph(Job("book"))
+    graph.add("plot", fail)
+    graph.add("title", lambda plot: plot, requires=["plot"])
+    graph.start()
+    try:
+        with pytest.raises(RuntimeError, match="boom"):
+            graph.result("title", timeout=5)
+        with pytest.raises(RuntimeError, match="boom"):
+            graph.wait()
+    finally:
+        graph.close()
+
+
+def test_tasks_added_while_running_are_waited_for():
+    graph = TaskGraph(Job("book"), max_workers=1).start()
+    try:
+        graph.add("first", lambda: graph.add("second", lambda first: first + 1, requires=["first"]) and 1)
+        assert graph.wait() == {"first": 1, "second": 2}
+    finally:
+        graph.close()
+
+
+def test_unknown_and_cyclic_requirements_are_rejected():
+    graph = TaskGraph(Job("book"))
+    graph.add("a", lambda b: b, requires=["b"])
+    graph.add("b", lambda a: a, requires=["a"])
+    with pytest.raises(ValueError, match="depend on each other"):
+        graph.start()
+
+    graph = TaskGraph(Job("book"))
+    graph.add("a", lambda missing: missing, requires=["missing"])
+    with pytest.raises(ValueError, match="unknown task"):
+        graph.start()
+
+
+def test_close_fails_the_tasks_that_did_not_start():
+    release = threading.Event()
+    graph = TaskGraph(Job("book"), max_workers=1).start()
+    graph.add("running", release.wait)
+    graph.add("waiting", lambda: "never")
+    graph.close()
+    release.set()
+
+    assert graph.result("running", timeout=5) is True
+    with pytest.raises(RuntimeError, match="did not run"):
+        graph.result("waiting")
+
+
+def test_tasks_of_a_cancelled_job_do_not_start():
+    job = Job("book")
+    job.cancel()
+    graph = TaskGraph(job)
+    graph.add("plot", lambda: "plot")
+
+    with pytest.raises(Exception) as error:
+        graph.run()
+    assert type(error.value).__name__ == "GenerationCancelled"
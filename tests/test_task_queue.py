@@ -0,0 +1,95 @@
+from infinite_bookshelf.jobs import CANCELLED, COMPLETED, FAILED, RUNNING
+from infinite_bookshelf.taskqueue import CLAIMED, PENDING, TaskQueue
+
+
+def make_queue(tmp_path, **options):
+    return TaskQueue(str(tmp_path / "queue.db"), **options)
+
+
+def test_claim_leases_task_and_runs_job(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue("book", "book", {"topic": "x"})
+
+    task = queue.claim("worker-1")
+    assert task["stage"] == "plan"
+    assert task["status"] == CLAIMED and task["lease_owner"] == "worker-1"
+    assert queue.get_job_row(job_id)["status"] == RUNNING
+    # A leased task is not handed out twice
+    assert queue.claim("worker-2") is None
+
+
+def test_expired_lease_is_claimed_again(tmp_path):
+    queue = make_queue(tmp_path, lease_seconds=-1)
+    queue.enqueue("book", "book", {})
+    first = queue.claim("worker-1")
+
+    second = queue.claim("worker-2")
+    assert second["id"] == first["id"]
+    assert second["lease_owner"] == "worker-2" and second["attempts"] == 2
+    assert not queue.extend_lease(first["id"], "worker-1")
+
+
+def test_chained_tasks_wait_for_their_dependency(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue("book", "book", {})
+    plan = queue.claim("worker")
+    queue.complete(plan, {"sections": 2}, [("section", {"n": 1}, True), ("section", {"n": 2}, True)])
+
+    first = queue.claim("worker")
+    assert first["payload"] == '{"n": 1}'
+    assert queue.claim("worker") is None
+    queue.complete(first)
+    second = queue.claim("worker")
+    queue.complete(second)
+
+    assert queue.task_result(plan["id"]) == {"sections": 2}
+    assert queue.get_job_row(job_id)["status"] == COMPLETED
+
+
+def test_failed_task_is_retried_then_fails_job(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=2, retry_delay=0)
+    job_id = queue.enqueue("book", "book", {})
+
+    queue.fail(queue.claim("worker"), "boom")
+    retried = queue.get_task(1)
+    assert retried["status"] == PENDING and retried["error"] == "boom"
+
+    queue.fail(queue.claim("worker"), "boom again")
+    job = queue.get_job_row(job_id)
+    assert job["status"] == FAILED and job["error"] == "boom again"
+    assert queue.claim("worker") is None
+
+
+def test_cancel_drops_pending_tasks(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue("book", "book", {})
+    queue.request_cancel(job_id)
+
+    assert queue.is_cancel_requested(job_id)
+    assert queue.claim("worker") is None
+    assert queue.get_job_row(job_id)["status"] == CANCELLED
+
+
+def test_events_are_stored_in_order(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue("book", "book", {})
+    queue.add_events(job_id, [{"type": "notice", "time": 1.0, "message": "a"}, {"type": "notice", "time": 2.0, "message": "b"}])
+
+    events = [event for _, event in queue.events_since(job_id)]
+    assert [event.get("message") for event in events if event["type"] == "notice"] == ["a", "b"]
+
+
+def test_lease_expiring_on_the_last_attempt_cancels_the_other_tasks(tmp_path):
+    queue = make_queue(tmp_path, max_attempts=1)
+    job_id = queue.enqueue("book", "book", {})
+    plan = queue.claim("worker")
+    queue.complete(plan, None, [("section", {"n": 1}, False), ("section", {"n": 2}, True), ("section", {"n": 3}, False)])
+    crashed = queue.claim("worker")
+    queue.connection().execute("UPDATE tasks SET lease_expires = 0 WHERE id = ?", (crashed["id"],))
+
+    assert queue.claim("worker") is None
+    job = queue.get_job_row(job_id)
+    assert job["status"] == FAILED and job["error"] == "Worker lease expired"
+    assert job["cancel_requested"] == 1
+    assert queue.get_task(crashed["id"])["status"] == FAILED
+    assert [queue.get_task(crashed["id"] + offset)["status"] for offset in (1, 2)] == [CANCELLED, CANCELLED]